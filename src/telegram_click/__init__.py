@@ -5,13 +5,30 @@ TelegramClick - 零侵入式Click CLI到Telegram Bot轉換器
 無需修改任何現有代碼。
 """
 
-from .framework import ClickToTelegramConverter
-from .types import TelegramClickConfig, ParameterType
-from .decorators import telegram_bot
-from .factory import (
-    create_bot_from_click_group,
-    create_bot_from_cli_file,
-)
+import importlib
+from typing import Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .framework import ClickToTelegramConverter
+    from .types import TelegramClickConfig, ParameterType
+    from .decorators import telegram_bot, secure_telegram_bot, production_telegram_bot
+    from .factory import (
+        create_bot_from_click_group,
+        create_bot_from_cli_file,
+    )
+
+# 延遲匯出：名稱 -> 子模組
+# 只有真正使用時才導入，CLI模式下不需要載入 python-telegram-bot
+_LAZY_EXPORTS = {
+    "ClickToTelegramConverter": ".framework",
+    "TelegramClickConfig": ".types",
+    "ParameterType": ".types",
+    "telegram_bot": ".decorators",
+    "secure_telegram_bot": ".decorators",
+    "production_telegram_bot": ".decorators",
+    "create_bot_from_click_group": ".factory",
+    "create_bot_from_cli_file": ".factory",
+}
 
 __version__ = "0.1.0"
 __author__ = "Tung"
@@ -26,6 +43,8 @@ __all__ = [
     
     # 便利函數
     "telegram_bot",
+    "secure_telegram_bot",
+    "production_telegram_bot",
     "create_bot_from_click_group", 
     "create_bot_from_cli_file",
     
@@ -35,3 +54,17 @@ __all__ = [
     "__email__",
     "__description__",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # 快取，之後不再經過 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
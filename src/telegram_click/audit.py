@@ -0,0 +1,223 @@
+"""
+TelegramClick審計日誌模組
+記錄誰以什麼參數執行了哪個命令；寫入在背景執行緒批次提交，不阻塞處理流程
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .writer import BackgroundWriter
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BACKENDS = ("jsonl", "sqlite")
+
+
+def rotate_file(path: str, backup_count: int):
+    """path -> path.1 -> path.2 …，超過 backup_count 的最舊檔案被刪除"""
+    if backup_count <= 0:
+        os.remove(path)
+        return
+    for index in range(backup_count - 1, 0, -1):
+        source = f"{path}.{index}"
+        if os.path.exists(source):
+            os.replace(source, f"{path}.{index + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def _matches(record: Dict[str, Any], user_id: Optional[int], command: Optional[str]) -> bool:
+    return ((user_id is None or record.get("user_id") == user_id)
+            and (command is None or record.get("command") == command))
+
+
+class AuditSink:
+    """審計記錄的儲存；只追加，超過 max_bytes 時輪替"""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+
+    def write_batch(self, records: List[Dict[str, Any]]):
+        """以單次提交寫入一批記錄"""
+        raise NotImplementedError
+
+    def query(self, user_id: Optional[int] = None, command: Optional[str] = None,
+              limit: int = 20) -> List[Dict[str, Any]]:
+        """按時間倒序返回最近的記錄"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def _should_rotate(self) -> bool:
+        try:
+            return self.max_bytes > 0 and os.path.getsize(self.path) >= self.max_bytes
+        except OSError:
+            return False
+
+
+class JsonlAuditSink(AuditSink):
+    """JSONL審計日誌，每行一條記錄"""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        super().__init__(path, max_bytes, backup_count)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write_batch(self, records: List[Dict[str, Any]]):
+        payload = "".join(
+            json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records
+        )
+        with self._lock:
+            self._file.write(payload)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if self._should_rotate():
+                self._file.close()
+                rotate_file(self.path, self.backup_count)
+                self._file = open(self.path, "a", encoding="utf-8")
+
+    def query(self, user_id: Optional[int] = None, command: Optional[str] = None,
+              limit: int = 20) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        paths = [self.path] + [f"{self.path}.{i}" for i in range(1, self.backup_count + 1)]
+        with self._lock:
+            self._file.flush()
+            for path in paths:
+                if not os.path.exists(path):
+                    break
+                with open(path, encoding="utf-8") as f:
+                    lines = f.readlines()
+                for line in reversed(lines):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if _matches(record, user_id, command):
+                        results.append(record)
+                        if len(results) >= limit:
+                            return results
+        return results
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class SqliteAuditSink(AuditSink):
+    """SQLite審計日誌；輪替時整個資料庫檔案改名，查詢只涵蓋目前的檔案"""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        super().__init__(path, max_bytes, backup_count)
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS audit ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, user_id INTEGER, "
+            "chat_id INTEGER, command TEXT NOT NULL, record TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS audit_user ON audit (user_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS audit_command ON audit (command, id)")
+        conn.commit()
+        return conn
+
+    def write_batch(self, records: List[Dict[str, Any]]):
+        rows = [
+            (record["ts"], record.get("user_id"), record.get("chat_id"), record["command"],
+             json.dumps(record, ensure_ascii=False, default=str))
+            for record in records
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO audit (ts, user_id, chat_id, command, record) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+            if self._should_rotate():
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._conn.close()
+                rotate_file(self.path, self.backup_count)
+                self._conn = self._connect()
+
+    def query(self, user_id: Optional[int] = None, command: Optional[str] = None,
+              limit: int = 20) -> List[Dict[str, Any]]:
+        clauses, args = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            args.append(user_id)
+        if command is not None:
+            clauses.append("command = ?")
+            args.append(command)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT record FROM audit {where} ORDER BY id DESC LIMIT ?", (*args, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_audit_sink(backend: str, path: str, max_bytes: int = 10 * 1024 * 1024,
+                      backup_count: int = 5) -> AuditSink:
+    """根據名稱創建審計儲存"""
+    if backend == "jsonl":
+        return JsonlAuditSink(path, max_bytes, backup_count)
+    if backend == "sqlite":
+        return SqliteAuditSink(path, max_bytes, backup_count)
+    raise ValueError(f"不支援的審計後端: {backend}")
+
+
+class AuditLogger:
+    """
+    非阻塞的審計記錄器
+
+    log() 只把記錄放入佇列；背景執行緒每收集 batch_size 條或等待 flush_interval 秒
+    後以一次提交寫入（group commit），處理流程不等待磁碟。
+    """
+
+    def __init__(self, sink: AuditSink, batch_size: int = 100, flush_interval: float = 0.5):
+        self.sink = sink
+        self.written = 0
+        self.batches = 0
+        self._writer = BackgroundWriter(self._write, "audit-writer", batch_size, flush_interval)
+
+    def log(self, record: Dict[str, Any]):
+        """記錄一條審計記錄（非阻塞）"""
+        record.setdefault("ts", time.time())
+        self._writer.put(record)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            self.sink.write_batch(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            logger.error("寫入 %s 條審計記錄失敗: %s", len(batch), e)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待佇列中已有的記錄寫入（阻塞）"""
+        return self._writer.flush(timeout)
+
+    def query(self, user_id: Optional[int] = None, command: Optional[str] = None,
+              limit: int = 20) -> List[Dict[str, Any]]:
+        """先寫入待提交的記錄再查詢（阻塞，應在執行緒中調用）"""
+        self.flush()
+        return self.sink.query(user_id=user_id, command=command, limit=limit)
+
+    def close(self):
+        """寫入佇列中剩餘的記錄並關閉儲存"""
+        self._writer.close()
+        self.sink.close()
@@ -0,0 +1,530 @@
+"""
+TelegramClick負載測試模組
+以合成更新或錄製的更新和進程內假Bot驅動轉換器，測量延遲和吞吐量
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import click
+from telegram import Update
+from telegram.ext import ExtBot
+
+from .callbacks import CallbackCodec, CallbackOp
+from .markup import escape_html, escape_markdown_v2, escape_markdown_v2_code
+from .recording import read_recording
+from .testing import FAKE_BOT_TOKEN, FakeBotAPI, FakeBotAPIServer, InProcessRequest, UpdateFactory
+
+logger = logging.getLogger(__name__)
+
+# 單次命令對話最多處理的更新數，避免策略錯誤造成死循環
+MAX_STEPS_PER_COMMAND = 100
+
+# 延遲直方圖的桶上限（毫秒）
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """計算百分位數（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """進程的峰值常駐記憶體（不支援的平台返回None）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以KB為單位，macOS 以位元組為單位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class LatencyStats:
+    """延遲統計"""
+    samples: List[float] = field(default_factory=list)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        """返回毫秒為單位的統計摘要"""
+        return {
+            "count": len(self.samples),
+            "p50_ms": percentile(self.samples, 50) * 1000,
+            "p95_ms": percentile(self.samples, 95) * 1000,
+            "p99_ms": percentile(self.samples, 99) * 1000,
+            "max_ms": max(self.samples, default=0.0) * 1000,
+        }
+
+    def histogram(self, bounds_ms=HISTOGRAM_BOUNDS_MS) -> Dict[str, int]:
+        """各延遲區間的樣本數（鍵為 "<=上限ms"，最後一個為 "+Inf"）"""
+        counts = {f"<={bound}ms": 0 for bound in bounds_ms}
+        counts["+Inf"] = 0
+        for sample in self.samples:
+            sample_ms = sample * 1000
+            for bound in bounds_ms:
+                if sample_ms <= bound:
+                    counts[f"<={bound}ms"] += 1
+                    break
+            else:
+                counts["+Inf"] += 1
+        return counts
+
+
+@dataclass
+class BenchmarkReport:
+    """基準測試報告"""
+    users: int
+    commands: int = 0
+    updates: int = 0
+    api_calls: int = 0
+    errors: int = 0
+    duration: float = 0.0
+    command_latency: LatencyStats = field(default_factory=LatencyStats)
+    update_latency: LatencyStats = field(default_factory=LatencyStats)
+    per_command: Dict[str, LatencyStats] = field(default_factory=dict)
+    peak_rss: Optional[int] = None
+
+    @property
+    def throughput(self) -> float:
+        """每秒處理的更新數"""
+        return self.updates / self.duration if self.duration else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "users": self.users,
+            "commands": self.commands,
+            "updates": self.updates,
+            "api_calls": self.api_calls,
+            "errors": self.errors,
+            "duration_s": self.duration,
+            "updates_per_s": self.throughput,
+            "commands_per_s": self.commands / self.duration if self.duration else 0.0,
+            "command_latency": self.command_latency.summary(),
+            "update_latency": self.update_latency.summary(),
+            "per_command": {name: stats.summary() for name, stats in self.per_command.items()},
+            "peak_rss_bytes": self.peak_rss,
+        }
+
+    def format(self) -> str:
+        """格式化為可讀文字"""
+        cmd = self.command_latency.summary()
+        upd = self.update_latency.summary()
+        lines = [
+            f"用戶數: {self.users}  命令數: {self.commands}  更新數: {self.updates}  "
+            f"API調用: {self.api_calls}  錯誤: {self.errors}",
+            f"耗時: {self.duration:.3f}s  吞吐量: {self.throughput:.1f} updates/s",
+            f"命令延遲 p50/p95/p99: {cmd['p50_ms']:.2f} / {cmd['p95_ms']:.2f} / {cmd['p99_ms']:.2f} ms",
+            f"更新延遲 p50/p95/p99: {upd['p50_ms']:.3f} / {upd['p95_ms']:.3f} / {upd['p99_ms']:.3f} ms",
+        ]
+        for name, stats in sorted(self.per_command.items()):
+            summary = stats.summary()
+            lines.append(
+                f"  /{name}: n={summary['count']}  p50={summary['p50_ms']:.2f}ms  "
+                f"p99={summary['p99_ms']:.2f}ms"
+            )
+        if self.peak_rss is not None:
+            lines.append(f"峰值RSS: {self.peak_rss / 1024 / 1024:.1f} MiB")
+        return "\n".join(lines)
+
+
+def sample_parameter_value(param: click.Parameter, overrides: Dict[str, str]) -> str:
+    """為參數產生一個合法的文字輸入"""
+    if param.name in overrides:
+        return overrides[param.name]
+
+    if isinstance(param.type, click.Tuple):
+        return " ".join(_sample_for_type(item_type) for item_type in param.type.types)
+    if param.nargs > 1:
+        return " ".join([_sample_for_type(param.type)] * param.nargs)
+    return _sample_for_type(param.type)
+
+
+def _sample_for_type(param_type: click.ParamType) -> str:
+    if isinstance(param_type, click.Choice):
+        return str(param_type.choices[0])
+    if isinstance(param_type, (click.IntRange, click.FloatRange)) and param_type.min is not None:
+        if param_type.min_open and isinstance(param_type, click.IntRange):
+            return str(param_type.min + 1)
+        return str(param_type.min)
+    if isinstance(param_type, click.types.IntParamType):
+        return "1"
+    if isinstance(param_type, click.types.FloatParamType):
+        return "1.5"
+    if isinstance(param_type, click.types.BoolParamType):
+        return "true"
+    if isinstance(param_type, click.DateTime):
+        return datetime(2024, 1, 1).strftime(param_type.formats[0])
+    if isinstance(param_type, click.types.UUIDParameterType):
+        return "00000000-0000-0000-0000-000000000000"
+    return "bench"
+
+
+def build_bench_bot(api: FakeBotAPI) -> ExtBot:
+    """創建使用進程內假API的Bot"""
+    return ExtBot(
+        FAKE_BOT_TOKEN,
+        request=InProcessRequest(api),
+        get_updates_request=InProcessRequest(api),
+    )
+
+
+def add_synthetic_commands(converter, count: int):
+    """向轉換器註冊無參數的合成命令，用於測量命令數量對分派延遲的影響"""
+    for i in range(count):
+        name = f"bench_noop_{i}"
+        converter.click_commands[name] = click.Command(name, callback=lambda: None)
+        converter._register_command_handler(name)
+
+
+class BenchmarkDriver:
+    """模擬用戶完成完整的參數收集對話"""
+
+    def __init__(self, converter, api: FakeBotAPI, values: Optional[Dict[str, str]] = None):
+        self.converter = converter
+        self.api = api
+        self.values = values or {}
+        self.updates = UpdateFactory()
+        # 每個用戶實際執行的命令數；對話結束時沒有增加就是沒有完成的對話
+        self.executed: Dict[int, int] = {}
+        execute = converter._execute_click_command
+
+        async def counted_execute(user_id: int):
+            self.executed[user_id] = self.executed.get(user_id, 0) + 1
+            await execute(user_id)
+
+        converter._execute_click_command = counted_execute
+
+    async def send(self, payload: Dict[str, Any], report: BenchmarkReport):
+        """處理一個更新並記錄延遲"""
+        update = Update.de_json(payload, self.converter.app.bot)
+        started = time.perf_counter()
+        await self.converter.app.process_update(update)
+        report.update_latency.add(time.perf_counter() - started)
+        report.updates += 1
+
+    def _next_payload(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """根據會話狀態決定用戶的下一個動作"""
+        context = self.converter.user_contexts.get(user_id)
+        if context is None:
+            return None
+
+        buttons = [b for b in self.api.inline_buttons(user_id) if "callback_data" in b]
+        param = None
+        if context.current_param_index < len(context.required_params):
+            param = context.required_params[context.current_param_index]
+
+        if param is not None and (context.waiting_for_input or not buttons):
+            return self.updates.text(user_id, sample_parameter_value(param, self.values))
+
+        if buttons:
+            # 可選參數摘要鍵盤按「執行」接受默認值；否則按第一個按鈕：
+            # 選擇第一個選項、布林選「是」、可選文字參數選「輸入自定義值」
+            run = [b for b in buttons if getattr(CallbackCodec.peek(b["callback_data"]), "op", None) == CallbackOp.RUN]
+            message = self.api.last_message[user_id]
+            return self.updates.callback(user_id, (run or buttons)[0]["callback_data"], message)
+
+        return None
+
+    async def run_command(self, user_id: int, command_name: str, report: BenchmarkReport):
+        """執行一次完整的命令對話"""
+        started = time.perf_counter()
+        executed = self.executed.get(user_id, 0)
+        telegram_name = self.converter._normalize_command_name(command_name)
+        await self.send(self.updates.command(user_id, f"/{telegram_name}"), report)
+
+        for _ in range(MAX_STEPS_PER_COMMAND):
+            payload = self._next_payload(user_id)
+            if payload is None:
+                break
+            await self.send(payload, report)
+        else:
+            report.errors += 1
+            self.converter._end_session(user_id)
+            logger.warning("命令 %s 超過最大步數，已放棄", command_name)
+            executed = None
+
+        if executed is not None and self.executed.get(user_id, 0) == executed:
+            # 沒有處理器回應、沒有建立會話或對話中途停止：不算作成功的命令
+            report.errors += 1
+            self.converter._end_session(user_id)
+            logger.warning("命令 %s 沒有執行", command_name)
+
+        elapsed = time.perf_counter() - started
+        report.command_latency.add(elapsed)
+        report.per_command.setdefault(command_name, LatencyStats()).add(elapsed)
+        report.commands += 1
+
+
+async def run_benchmark(
+    converter,
+    users: int = 10,
+    iterations: int = 10,
+    mix: Optional[Dict[str, int]] = None,
+    values: Optional[Dict[str, str]] = None,
+    synthetic_commands: int = 0,
+    seed: int = 0,
+    api: Optional[FakeBotAPI] = None,
+    transport: str = "inprocess",
+) -> BenchmarkReport:
+    """
+    對轉換器執行負載測試
+
+    Args:
+        converter: 尚未啟動的 ClickToTelegramConverter
+        users: 並發用戶數
+        iterations: 每個用戶執行的命令數
+        mix: 命令權重，例如 {'greet': 3, 'echo': 1}；預設所有命令權重相同
+        values: 文字參數的固定輸入值
+        synthetic_commands: 額外註冊的無參數命令數量
+        seed: 隨機種子（命令選擇可重現）
+        api: 假Bot API（可設置延遲和429注入），預設創建新的實例
+        transport: inprocess（不經網路）或 http（經由本地假Bot API伺服器）
+    """
+    api = api or FakeBotAPI()
+    server = None
+    if transport == "http":
+        server = FakeBotAPIServer(api).start()
+        converter.config.bot_token = converter.config.bot_token or FAKE_BOT_TOKEN
+        converter.config.base_url = server.base_url
+        converter.build_application()
+    elif transport == "inprocess":
+        converter.build_application(bot=build_bench_bot(api))
+    else:
+        raise ValueError(f"不支援的傳輸方式: {transport}")
+    add_synthetic_commands(converter, synthetic_commands)
+
+    mix = mix or {name: 1 for name in converter.click_commands if not name.startswith("bench_noop_")}
+    unknown = [name for name in mix if name not in converter.click_commands]
+    if unknown:
+        if server is not None:
+            server.stop()
+        raise ValueError(f"未知命令: {', '.join(unknown)}")
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    rng = random.Random(seed)
+    plans = [rng.choices(names, weights, k=iterations) for _ in range(users)]
+
+    driver = BenchmarkDriver(converter, api, values)
+    report = BenchmarkReport(users=users)
+
+    async def simulate_user(user_id: int, plan: List[str]):
+        for command_name in plan:
+            await driver.run_command(user_id, command_name, report)
+
+    app = converter.app
+    await app.initialize()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            simulate_user(10_000 + index, plan) for index, plan in enumerate(plans)
+        ])
+        report.duration = time.perf_counter() - started
+    finally:
+        await app.shutdown()
+        converter.executor.shutdown()
+        if server is not None:
+            server.stop()
+
+    report.api_calls = len(api.calls)
+    report.errors += sum(
+        1 for call in api.calls_to("sendMessage")
+        if str(call.params.get("text", "")).startswith("執行錯誤")
+    )
+    report.peak_rss = peak_rss_bytes()
+    return report
+
+
+@dataclass
+class ReplayReport:
+    """重放報告"""
+    speed: Optional[float]
+    updates: int = 0
+    users: int = 0
+    errors: int = 0
+    duration: float = 0.0
+    recorded_duration: float = 0.0
+    update_latency: LatencyStats = field(default_factory=LatencyStats)
+    per_type: Dict[str, LatencyStats] = field(default_factory=dict)
+    peak_rss: Optional[int] = None
+
+    @property
+    def throughput(self) -> float:
+        return self.updates / self.duration if self.duration else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "speed": self.speed or "max",
+            "updates": self.updates,
+            "users": self.users,
+            "errors": self.errors,
+            "duration_s": self.duration,
+            "recorded_duration_s": self.recorded_duration,
+            "updates_per_s": self.throughput,
+            "update_latency": self.update_latency.summary(),
+            "histogram": self.update_latency.histogram(),
+            "per_type": {name: stats.summary() for name, stats in self.per_type.items()},
+            "peak_rss_bytes": self.peak_rss,
+        }
+
+    def format(self) -> str:
+        """格式化為可讀文字（包含延遲直方圖）"""
+        summary = self.update_latency.summary()
+        lines = [
+            f"重放速度: {f'{self.speed}x' if self.speed else 'max'}  更新數: {self.updates}  "
+            f"用戶數: {self.users}  錯誤: {self.errors}",
+            f"耗時: {self.duration:.3f}s（錄製時長 {self.recorded_duration:.3f}s）  "
+            f"吞吐量: {self.throughput:.1f} updates/s",
+            f"延遲 p50/p95/p99: {summary['p50_ms']:.3f} / {summary['p95_ms']:.3f} / "
+            f"{summary['p99_ms']:.3f} ms",
+            "延遲直方圖:",
+        ]
+        histogram = self.update_latency.histogram()
+        peak = max(histogram.values(), default=0) or 1
+        for bucket, count in histogram.items():
+            lines.append(f"  {bucket:>10} {count:>7} {'#' * round(40 * count / peak)}")
+        for name, stats in sorted(self.per_type.items()):
+            type_summary = stats.summary()
+            lines.append(
+                f"  {name}: n={type_summary['count']}  p50={type_summary['p50_ms']:.3f}ms  "
+                f"p99={type_summary['p99_ms']:.3f}ms"
+            )
+        if self.peak_rss is not None:
+            lines.append(f"峰值RSS: {self.peak_rss / 1024 / 1024:.1f} MiB")
+        return "\n".join(lines)
+
+
+def _update_type(payload: Dict[str, Any]) -> str:
+    """更新類型（message、callback_query 等）"""
+    return next((key for key in payload if key != "update_id"), "unknown")
+
+
+def _update_user_id(payload: Dict[str, Any]) -> Optional[int]:
+    body = payload.get(_update_type(payload))
+    if isinstance(body, dict):
+        sender = body.get("from") or {}
+        return sender.get("id")
+    return None
+
+
+async def run_replay(
+    converter,
+    path: str,
+    speed: Optional[float] = 1.0,
+    api: Optional[FakeBotAPI] = None,
+) -> ReplayReport:
+    """
+    將錄製的更新重放到轉換器（使用進程內假Bot）
+
+    Args:
+        converter: 尚未啟動的 ClickToTelegramConverter
+        path: UpdateRecorder 產生的錄製檔案
+        speed: 重放倍速（1.0 為原速）；None 表示盡可能快
+        api: 假Bot API，預設為寬鬆模式（允許編輯未知訊息）
+
+    延遲從更新的預定送達時間計算到處理完成，包含排隊時間。
+    同一用戶的更新按順序處理，不同用戶之間並發。
+    """
+    records = list(read_recording(path))
+    api = api or FakeBotAPI(strict=False, record=False)
+    converter.build_application(bot=build_bench_bot(api))
+    app = converter.app
+    report = ReplayReport(speed=speed)
+
+    if records:
+        report.recorded_duration = records[-1][0] - records[0][0]
+    report.users = len({_update_user_id(payload) for _, payload in records})
+
+    user_locks: Dict[Optional[int], asyncio.Lock] = {}
+
+    async def process(payload: Dict[str, Any], due: float):
+        lock = user_locks.setdefault(_update_user_id(payload), asyncio.Lock())
+        async with lock:
+            try:
+                await app.process_update(Update.de_json(payload, app.bot))
+            except Exception as e:
+                report.errors += 1
+                logger.warning("重放更新 %s 失敗: %s", payload.get('update_id'), e)
+        latency = time.perf_counter() - due
+        report.update_latency.add(latency)
+        report.per_type.setdefault(_update_type(payload), LatencyStats()).add(latency)
+        report.updates += 1
+
+    await app.initialize()
+    try:
+        started = time.perf_counter()
+        first_ts = records[0][0] if records else 0.0
+        tasks = []
+        for timestamp, payload in records:
+            due = started
+            if speed:
+                due = started + (timestamp - first_ts) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                due = time.perf_counter()
+            tasks.append(asyncio.create_task(process(payload, due)))
+        await asyncio.gather(*tasks)
+        report.duration = time.perf_counter() - started
+    finally:
+        await app.shutdown()
+        converter.executor.shutdown()
+
+    report.peak_rss = peak_rss_bytes()
+    return report
+
+
+def legacy_escape_markdown_v2(text: str) -> str:
+    """舊版逐字符 replace 的MarkdownV2轉義（僅作基準對照）"""
+    for char in r'_*[]()~`>#+-=|{}.!':
+        text = text.replace(char, f'\\{char}')
+    return text
+
+
+def sample_escape_payload(size: int, seed: int = 0) -> str:
+    """產生類似CLI輸出（日誌行、路徑、鍵值、中文訊息）的文字"""
+    rng = random.Random(seed)
+    templates = (
+        "2024-05-{day:02d} 12:{minute:02d}:07 [INFO] user_id={n} (retry={minute}) ok.\n",
+        "/var/lib/app/data_{n}.json -> 已處理 {day} 筆記錄\n",
+        "| {n:>6} | item-{minute} | `status` |\n",
+        "處理完成！共 {n} 個檔案，耗時 {day}.{minute}s\n",
+    )
+    lines = []
+    length = 0
+    while length < size:
+        line = rng.choice(templates).format(day=rng.randint(1, 28), minute=rng.randint(0, 59),
+                                            n=rng.randint(1, 99999))
+        lines.append(line)
+        length += len(line)
+    return "".join(lines)[:size]
+
+
+def benchmark_escaping(text: str, iterations: int = 1000) -> Dict[str, float]:
+    """比較各轉義實作的單次耗時（微秒）"""
+    results = {}
+    for name, escape in (
+        ("legacy_replace", legacy_escape_markdown_v2),
+        ("markdown_v2", escape_markdown_v2),
+        ("markdown_v2_code", escape_markdown_v2_code),
+        ("html", escape_html),
+    ):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            escape(text)
+        results[name] = (time.perf_counter() - started) / iterations * 1e6
+    return results
@@ -0,0 +1,138 @@
+"""
+TelegramClick批量執行模組
+上傳的 CSV / JSONL 文件每行對應一次命令執行：欄位名稱即參數名稱，
+結果匯總為一則摘要和一個可下載的結果CSV
+"""
+
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from .types import ConversionResult
+
+
+class BulkFileError(ValueError):
+    """批量文件無法解析"""
+
+
+@dataclass
+class BulkRow:
+    """批量文件的一行"""
+    line: int  # 文件中的行號，用於錯誤訊息和結果文件
+    values: Dict[str, str]  # 欄位名稱 -> 原始文字（空白欄位不包含在內）
+    params: Dict[str, Any] = field(default_factory=dict)  # 驗證轉換後的參數
+    error: Optional[str] = None  # 驗證失敗的原因；有值時不執行
+    result: Optional[ConversionResult] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and self.result is not None and self.result.success
+
+
+def detect_format(file_name: str, content: bytes) -> str:
+    """按副檔名判斷格式（csv 或 jsonl）；無法判斷時看第一個非空白字符是否為 {"""
+    suffix = file_name.rsplit(".", 1)[-1].lower() if "." in file_name else ""
+    if suffix in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    if suffix == "csv":
+        return "csv"
+    return "jsonl" if content.lstrip()[:1] == b"{" else "csv"
+
+
+def _cell_text(value: Any) -> Optional[str]:
+    """JSON值轉為輸入文字：列表每項一行（與多值參數的批量輸入相同），嵌套列表以空格連接"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return "\n".join(" ".join(map(str, item)) if isinstance(item, list) else _cell_text(item) or ""
+                         for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _csv_rows(text: str) -> Iterable[BulkRow]:
+    reader = csv.DictReader(io.StringIO(text, newline=""))
+    if not reader.fieldnames:
+        raise BulkFileError("CSV文件沒有標題行")
+    reader.fieldnames = [name.strip() for name in reader.fieldnames]
+    for record in reader:
+        if None in record:
+            raise BulkFileError(f"第 {reader.line_num} 行的欄位多於標題行")
+        values = {name: value for name, value in record.items() if value not in (None, "")}
+        if values:
+            yield BulkRow(reader.line_num, values)
+
+
+def _jsonl_rows(text: str) -> Iterable[BulkRow]:
+    for line_number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise BulkFileError(f"第 {line_number} 行不是有效的JSON") from None
+        if not isinstance(record, dict):
+            raise BulkFileError(f"第 {line_number} 行不是JSON物件")
+        values = {}
+        for name, value in record.items():
+            cell = _cell_text(value)
+            if cell not in (None, ""):
+                values[str(name)] = cell
+        yield BulkRow(line_number, values)
+
+
+def parse_rows(content: bytes, file_name: str, max_rows: int) -> List[BulkRow]:
+    """解析批量文件；格式錯誤、沒有數據或超過 max_rows 行時拋出 BulkFileError"""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise BulkFileError("文件必須是UTF-8編碼") from None
+
+    parse = _jsonl_rows if detect_format(file_name, content) == "jsonl" else _csv_rows
+    rows: List[BulkRow] = []
+    for row in parse(text):
+        if len(rows) >= max_rows:
+            raise BulkFileError(f"最多 {max_rows} 行")
+        rows.append(row)
+    if not rows:
+        raise BulkFileError("文件沒有數據行")
+    return rows
+
+
+def unknown_columns(rows: List[BulkRow], param_names: Iterable[str]) -> List[str]:
+    """不對應任何參數的欄位（按首次出現的順序）"""
+    known = set(param_names)
+    unknown: Dict[str, None] = {}
+    for row in rows:
+        unknown.update((name, None) for name in row.values if name not in known)
+    return list(unknown)
+
+
+def results_csv(rows: List[BulkRow], param_names: List[str], hidden: Iterable[str] = ()) -> bytes:
+    """
+    結果CSV：行號、狀態、原始參數、輸出和錯誤
+
+    hidden 中的參數（hide_input）以 *** 代替。以 UTF-8 BOM 開頭，試算表軟體才能正確顯示中文。
+    """
+    hidden = set(hidden)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["line", "status", *param_names, "output", "error"])
+    for row in rows:
+        if row.error is not None:
+            status, output, error = "invalid", "", row.error
+        elif row.result is None:
+            status, output, error = "skipped", "", ""
+        elif row.result.success:
+            status, output, error = "ok", "" if row.result.data is None else str(row.result.data), ""
+        else:
+            status, output, error = "failed", "", row.result.message
+        params = ["***" if name in hidden and name in row.values else row.values.get(name, "")
+                  for name in param_names]
+        writer.writerow([row.line, status, *params, output, error])
+    return ("\ufeff" + buffer.getvalue()).encode("utf-8")
@@ -0,0 +1,99 @@
+"""
+TelegramClick回調數據編解碼模組
+把按鈕動作壓縮成帶版本和簽名的短token，遠低於Telegram回調數據的64位元組限制
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Optional
+
+CALLBACK_VERSION = 1
+CALLBACK_DATA_LIMIT = 64  # Telegram對 callback_data 的限制（位元組）
+
+# 版本、操作碼、參數索引、選項索引
+_HEADER = struct.Struct(">BBBH")
+# 截斷的HMAC長度；使 token 為12位元組，base64後恰好16個字符且沒有填充
+MAC_SIZE = 12 - _HEADER.size
+TOKEN_LENGTH = 16
+
+
+class CallbackOp(IntEnum):
+    """按鈕動作"""
+    CHOICE = 1  # 選擇 click.Choice 的第 choice_index 個選項
+    BOOL = 2  # 布林值，choice_index 為 0/1
+    INPUT = 3  # 可選參數：輸入自定義值
+    DEFAULT = 4  # 可選參數：使用默認值
+    SKIP = 5  # 可選參數：跳過
+    TOGGLE = 6  # 可選參數摘要：切換布林值
+    CYCLE = 7  # 可選參數摘要：輪換選項
+    EDIT = 8  # 可選參數摘要：輸入值
+    RUN = 9  # 可選參數摘要：執行
+    PAGE = 10  # 選擇參數：翻到第 choice_index 頁
+    CLEAR_FILTER = 11  # 選擇參數：清除輸入篩選
+    RERUN = 12  # 重新執行第 choice_index 號最近執行記錄
+
+
+@dataclass(frozen=True)
+class CallbackToken:
+    """解碼後的按鈕動作"""
+    op: int
+    param_index: int = 0
+    choice_index: int = 0
+
+
+class CallbackCodec:
+    """
+    回調數據編解碼器
+
+    token = base64url(版本 | 操作碼 | 參數索引 | 選項索引 | HMAC)。HMAC 以密鑰和 scope
+    （命令名稱與命令指紋）計算，命令在熱重載後改變參數時舊按鈕自動失效；
+    長度或版本不符的數據在計算HMAC之前就被拒絕。
+    """
+
+    def __init__(self, secret: bytes):
+        self._key = hashlib.sha256(b"telegram-click/callback\0" + secret).digest()
+
+    def _mac(self, header: bytes, scope: str) -> bytes:
+        return hmac.new(self._key, header + scope.encode(), hashlib.sha256).digest()[:MAC_SIZE]
+
+    def encode(self, op: int, param_index: int = 0, choice_index: int = 0, scope: str = "") -> str:
+        """編碼一個按鈕動作"""
+        try:
+            header = _HEADER.pack(CALLBACK_VERSION, op, param_index, choice_index)
+        except struct.error:
+            raise ValueError(f"回調參數超出範圍: op={op} param={param_index} choice={choice_index}") from None
+        return base64.urlsafe_b64encode(header + self._mac(header, scope)).decode("ascii")
+
+    def decode(self, data: str, scope: str = "") -> Optional[CallbackToken]:
+        """解碼並驗證；過期、偽造或格式錯誤的數據返回None"""
+        if len(data) != TOKEN_LENGTH:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(data)
+        except (ValueError, binascii.Error):
+            return None
+        if len(raw) != _HEADER.size + MAC_SIZE:
+            return None
+        header = raw[:_HEADER.size]
+        version, op, param_index, choice_index = _HEADER.unpack(header)
+        if version != CALLBACK_VERSION:
+            return None
+        if not hmac.compare_digest(raw[_HEADER.size:], self._mac(header, scope)):
+            return None
+        return CallbackToken(op, param_index, choice_index)
+
+    @staticmethod
+    def peek(data: str) -> Optional[CallbackToken]:
+        """不驗證簽名讀取動作（僅供測試和負載測試的按鈕策略使用）"""
+        if len(data) != TOKEN_LENGTH:
+            return None
+        try:
+            _, op, param_index, choice_index = _HEADER.unpack(base64.urlsafe_b64decode(data)[:_HEADER.size])
+        except (ValueError, binascii.Error, struct.error):
+            return None
+        return CallbackToken(op, param_index, choice_index)
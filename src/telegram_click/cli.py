@@ -135,6 +135,350 @@ def script(script_file: str, token_env: str):
         click.echo(f"❌ 創建uv script失敗: {e}")
 
 
+@main.command()
+@click.argument('cli_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--token', envvar='BOT_TOKEN', show_envvar=True, help='Bot Token')
+@click.option('--admin-users', envvar='ADMIN_USERS', show_envvar=True,
+              help='管理員用戶ID，用逗號分隔')
+@click.option('--mode', type=click.Choice(['polling', 'webhook']), default='polling',
+              envvar='TELEGRAM_CLICK_MODE', show_envvar=True, help='運行模式')
+@click.option('--webhook-url', envvar='TELEGRAM_CLICK_WEBHOOK_URL', show_envvar=True,
+              help='webhook模式的公開URL')
+@click.option('--listen', default='0.0.0.0', envvar='TELEGRAM_CLICK_LISTEN', show_envvar=True,
+              help='webhook監聽地址')
+@click.option('--port', type=int, default=8443, envvar='TELEGRAM_CLICK_PORT', show_envvar=True,
+              help='webhook監聽端口')
+@click.option('--executor', 'executor_type', type=click.Choice(['inline', 'thread']),
+              default='inline', envvar='TELEGRAM_CLICK_EXECUTOR', show_envvar=True,
+              help='命令執行器類型')
+@click.option('--workers', type=int, envvar='TELEGRAM_CLICK_WORKERS', show_envvar=True,
+              help='執行緒池大小')
+@click.option('--max-concurrent-updates', type=int, envvar='TELEGRAM_CLICK_MAX_UPDATES',
+              show_envvar=True, help='同時處理的更新數量上限')
+@click.option('--max-concurrent-commands', type=int, envvar='TELEGRAM_CLICK_MAX_COMMANDS',
+              show_envvar=True, help='同時執行的命令數量上限')
+@click.option('--session-backend', type=click.Choice(['memory', 'sqlite']), default='memory',
+              envvar='TELEGRAM_CLICK_SESSION_BACKEND', show_envvar=True, help='會話後端')
+@click.option('--session-path', envvar='TELEGRAM_CLICK_SESSION_PATH', show_envvar=True,
+              help='sqlite會話資料庫路徑')
+@click.option('--hot-reload', is_flag=True, envvar='TELEGRAM_CLICK_HOT_RELOAD', show_envvar=True,
+              help='CLI檔案變更時自動重載命令')
+@click.option('--base-url', envvar='TELEGRAM_CLICK_BASE_URL', show_envvar=True,
+              help='Bot API地址，例如 fake-server 的 http://127.0.0.1:8081/bot')
+@click.option('--record-updates', envvar='TELEGRAM_CLICK_RECORD_UPDATES', show_envvar=True,
+              help='錄製所有更新到壓縮JSONL檔案（供 replay 使用）')
+@click.option('--metrics-port', type=int, envvar='TELEGRAM_CLICK_METRICS_PORT', show_envvar=True,
+              help='在此端口開啟Prometheus /metrics 端點')
+@click.option('--metrics-host', default='127.0.0.1', envvar='TELEGRAM_CLICK_METRICS_HOST',
+              show_envvar=True, help='/metrics 端點監聽地址')
+@click.option('--trace-file', envvar='TELEGRAM_CLICK_TRACE_FILE', show_envvar=True,
+              help='將每個處理階段的追蹤span寫入JSONL檔案（供 traces 分析）')
+@click.option('--log-level', type=click.Choice(['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+              case_sensitive=False), default='INFO', envvar='TELEGRAM_CLICK_LOG_LEVEL',
+              show_envvar=True, help='日誌級別')
+@click.option('--log-format', type=click.Choice(['text', 'json']), default='text',
+              envvar='TELEGRAM_CLICK_LOG_FORMAT', show_envvar=True, help='日誌格式')
+@click.option('--log-queue', is_flag=True, envvar='TELEGRAM_CLICK_LOG_QUEUE', show_envvar=True,
+              help='在背景執行緒寫出日誌，不阻塞事件循環')
+@click.option('--log-debug-sample', type=click.FloatRange(0, 1), default=1.0,
+              envvar='TELEGRAM_CLICK_LOG_DEBUG_SAMPLE', show_envvar=True,
+              help='DEBUG日誌取樣比例，例如 0.01')
+@click.option('--audit-log', envvar='TELEGRAM_CLICK_AUDIT_LOG', show_envvar=True,
+              help='審計日誌路徑（記錄每次命令執行，管理員可用 /audit 查詢）')
+@click.option('--audit-backend', type=click.Choice(['jsonl', 'sqlite']), default='jsonl',
+              envvar='TELEGRAM_CLICK_AUDIT_BACKEND', show_envvar=True, help='審計日誌後端')
+@click.option('--form-mode', is_flag=True, envvar='TELEGRAM_CLICK_FORM_MODE', show_envvar=True,
+              help='以一則持續編輯的表單訊息收集參數')
+@click.option('--optional-summary', is_flag=True, envvar='TELEGRAM_CLICK_OPTIONAL_SUMMARY',
+              show_envvar=True, help='以一個摘要鍵盤一次設置所有可選參數')
+@click.option('--schedule-db', envvar='TELEGRAM_CLICK_SCHEDULE_DB', show_envvar=True,
+              help='排程SQLite資料庫路徑（/schedule 建立的排程在重啟後恢復）')
+@click.option('--callback-secret', envvar='TELEGRAM_CLICK_CALLBACK_SECRET', show_envvar=True,
+              help='按鈕回調和深度連結的簽名密鑰（預設由Bot Token派生）')
+def serve(cli_file: str, token: Optional[str], admin_users: Optional[str], mode: str,
+          webhook_url: Optional[str], listen: str, port: int, executor_type: str,
+          workers: Optional[int], max_concurrent_updates: Optional[int],
+          max_concurrent_commands: Optional[int], session_backend: str,
+          session_path: Optional[str], hot_reload: bool, base_url: Optional[str],
+          record_updates: Optional[str], metrics_port: Optional[int], metrics_host: str,
+          trace_file: Optional[str], log_level: str, log_format: str, log_queue: bool,
+          log_debug_sample: float, audit_log: Optional[str], audit_backend: str,
+          form_mode: bool, optional_summary: bool, schedule_db: Optional[str],
+          callback_secret: Optional[str]):
+    """直接以Telegram Bot運行CLI檔案（無需生成包裝器）"""
+    if not token:
+        click.echo("❌ 請通過 --token 或環境變數 BOT_TOKEN 提供Bot Token")
+        sys.exit(1)
+    
+    admin_list = []
+    if admin_users:
+        try:
+            admin_list = [int(uid.strip()) for uid in admin_users.split(',') if uid.strip()]
+        except ValueError:
+            click.echo("❌ 管理員用戶ID格式錯誤，請使用數字，用逗號分隔")
+            sys.exit(1)
+    
+    if mode == 'webhook' and not webhook_url:
+        click.echo("❌ webhook模式需要 --webhook-url")
+        sys.exit(1)
+    
+    from .factory import create_bot_from_cli_file
+    
+    bot = create_bot_from_cli_file(
+        bot_token=token,
+        cli_file_path=cli_file,
+        admin_users=admin_list,
+        run_mode=mode,
+        webhook_url=webhook_url,
+        webhook_listen=listen,
+        webhook_port=port,
+        executor_type=executor_type,
+        executor_workers=workers,
+        max_concurrent_updates=max_concurrent_updates,
+        max_concurrent_commands=max_concurrent_commands,
+        session_backend=session_backend,
+        session_path=session_path,
+        hot_reload=hot_reload,
+        base_url=base_url,
+        record_updates_path=record_updates,
+        metrics_port=metrics_port,
+        metrics_host=metrics_host,
+        trace_path=trace_file,
+        log_level=log_level,
+        log_format=log_format,
+        log_queue=log_queue,
+        log_debug_sample_rate=log_debug_sample,
+        audit_path=audit_log,
+        audit_backend=audit_backend,
+        form_mode=form_mode,
+        optional_summary=optional_summary,
+        schedule_path=schedule_db,
+        callback_secret=callback_secret,
+    )
+    
+    click.echo(f"🚀 啟動 {Path(cli_file).stem} Telegram Bot（{mode}，執行器: {executor_type}）...")
+    bot.run()
+
+
+def _parse_key_values(text: Optional[str], value_type=str) -> dict:
+    """解析 'a=1,b=2' 格式的選項"""
+    result = {}
+    for item in (text or "").split(','):
+        if not item.strip():
+            continue
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise click.BadParameter(f"格式錯誤（應為 key=value）: {item}")
+        result[key.strip()] = value_type(value.strip())
+    return result
+
+
+@main.command()
+@click.argument('cli_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--users', type=int, default=10, show_default=True, help='並發用戶數')
+@click.option('--iterations', type=int, default=10, show_default=True, help='每個用戶執行的命令數')
+@click.option('--mix', help='命令權重，例如 greet=3,echo=1（預設平均）')
+@click.option('--value', 'values', help='文字參數的輸入值，例如 name=Alice,age=30')
+@click.option('--synthetic-commands', type=int, default=0, show_default=True,
+              help='額外註冊的無參數命令數量（測量命令數量對延遲的影響）')
+@click.option('--executor', 'executor_type', type=click.Choice(['inline', 'thread']),
+              default='inline', show_default=True, help='命令執行器類型')
+@click.option('--workers', type=int, help='執行緒池大小')
+@click.option('--seed', type=int, default=0, show_default=True, help='隨機種子')
+@click.option('--transport', type=click.Choice(['inprocess', 'http']), default='inprocess',
+              show_default=True, help='inprocess 不經網路；http 經由本地假Bot API伺服器')
+@click.option('--latency', type=float, default=0.0, show_default=True,
+              help='假Bot API每次調用的模擬延遲（秒）')
+@click.option('--form-mode', is_flag=True, help='以表單模式收集參數（比較API調用數）')
+@click.option('--optional-summary', is_flag=True, help='以摘要鍵盤設置可選參數（接受默認值）')
+@click.option('--json', 'as_json', is_flag=True, help='以JSON輸出報告')
+def bench(cli_file: str, users: int, iterations: int, mix: Optional[str], values: Optional[str],
+          synthetic_commands: int, executor_type: str, workers: Optional[int], seed: int,
+          transport: str, latency: float, form_mode: bool, optional_summary: bool, as_json: bool):
+    """以合成更新對CLI檔案的Bot進行負載測試（不連接Telegram）"""
+    import asyncio
+    import json
+    from .factory import create_bot_from_cli_file
+    from .bench import run_benchmark
+    from .testing import FAKE_BOT_TOKEN, FakeBotAPI
+    
+    converter = create_bot_from_cli_file(
+        bot_token=FAKE_BOT_TOKEN,
+        cli_file_path=cli_file,
+        enable_logging=False,
+        executor_type=executor_type,
+        executor_workers=workers,
+        form_mode=form_mode,
+        optional_summary=optional_summary,
+    )
+    
+    try:
+        report = asyncio.run(run_benchmark(
+            converter,
+            users=users,
+            iterations=iterations,
+            mix=_parse_key_values(mix, int) or None,
+            values=_parse_key_values(values),
+            synthetic_commands=synthetic_commands,
+            seed=seed,
+            api=FakeBotAPI(latency=latency),
+            transport=transport,
+        ))
+    except ValueError as e:
+        click.echo(f"❌ {e}")
+        sys.exit(1)
+    
+    if as_json:
+        click.echo(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+    else:
+        click.echo(report.format())
+
+
+def _parse_speed(value: str) -> Optional[float]:
+    """解析重放速度：'max' 或倍數（例如 1、5x、0.5）"""
+    if value.lower() == 'max':
+        return None
+    try:
+        speed = float(value.lower().rstrip('x'))
+    except ValueError:
+        raise click.BadParameter(f"無效的速度: {value}")
+    if speed <= 0:
+        raise click.BadParameter("速度必須大於0")
+    return speed
+
+
+@main.command()
+@click.argument('cli_file', type=click.Path(exists=True, dir_okay=False))
+@click.argument('recording', type=click.Path(exists=True, dir_okay=False))
+@click.option('--speed', default='1', show_default=True,
+              help='重放倍速：1（原速）、10x 或 max（盡可能快）')
+@click.option('--executor', 'executor_type', type=click.Choice(['inline', 'thread']),
+              default='inline', show_default=True, help='命令執行器類型')
+@click.option('--workers', type=int, help='執行緒池大小')
+@click.option('--json', 'as_json', is_flag=True, help='以JSON輸出報告（可用於比較版本間的直方圖）')
+def replay(cli_file: str, recording: str, speed: str, executor_type: str,
+           workers: Optional[int], as_json: bool):
+    """將錄製的更新重放到假Bot，報告延遲直方圖"""
+    import asyncio
+    import json
+    from .factory import create_bot_from_cli_file
+    from .bench import run_replay
+    from .testing import FAKE_BOT_TOKEN
+    
+    speed_value = _parse_speed(speed)
+    converter = create_bot_from_cli_file(
+        bot_token=FAKE_BOT_TOKEN,
+        cli_file_path=cli_file,
+        enable_logging=False,
+        executor_type=executor_type,
+        executor_workers=workers,
+    )
+    report = asyncio.run(run_replay(converter, recording, speed=speed_value))
+    
+    if as_json:
+        click.echo(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+    else:
+        click.echo(report.format())
+
+
+@main.command()
+@click.argument('trace_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--json', 'as_json', is_flag=True, help='以JSON輸出')
+def traces(trace_file: str, as_json: bool):
+    """按階段彙總追蹤span的延遲分佈"""
+    import json
+    from .bench import LatencyStats
+    from .tracing import read_spans
+    
+    stats = {}
+    for span in read_spans(trace_file):
+        stats.setdefault(span["name"], LatencyStats()).add(span["duration_ms"] / 1000)
+    
+    summaries = {name: stat.summary() for name, stat in stats.items()}
+    if as_json:
+        click.echo(json.dumps(summaries, ensure_ascii=False, indent=2))
+        return
+    
+    if not summaries:
+        click.echo("沒有追蹤記錄")
+        return
+    
+    click.echo(f"{'階段':<20}{'次數':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, summary in sorted(summaries.items(), key=lambda item: -item[1]["p99_ms"]):
+        click.echo(
+            f"{name:<20}{summary['count']:>8}{summary['p50_ms']:>9.2f}ms"
+            f"{summary['p95_ms']:>8.2f}ms{summary['p99_ms']:>8.2f}ms{summary['max_ms']:>8.2f}ms"
+        )
+
+
+@main.command('bench-escape')
+@click.option('--size', type=int, default=4000, show_default=True, help='測試文字長度')
+@click.option('--iterations', type=int, default=1000, show_default=True, help='每個實作的重複次數')
+def bench_escape(size: int, iterations: int):
+    """比較訊息轉義實作的耗時（舊版 replace 迴圈 vs 單次掃描）"""
+    from .bench import benchmark_escaping, sample_escape_payload
+    
+    results = benchmark_escaping(sample_escape_payload(size), iterations)
+    baseline = results["legacy_replace"]
+    for name, micros in results.items():
+        click.echo(f"{name:<18}{micros:>10.2f}µs  x{baseline / micros:.1f}")
+
+
+@main.command('deep-link')
+@click.argument('cli_file', type=click.Path(exists=True, dir_okay=False))
+@click.argument('command_name')
+@click.option('--bot-username', required=True, help='Bot的用戶名（不含@）')
+@click.option('--token', envvar='BOT_TOKEN', show_envvar=True, help='Bot Token（用於簽名）')
+@click.option('--secret', envvar='TELEGRAM_CLICK_CALLBACK_SECRET', show_envvar=True,
+              help='簽名密鑰（Bot設置了 callback_secret 時使用）')
+@click.option('--param', 'params', help='預填的參數，例如 app=api,level=error')
+def deep_link(cli_file: str, command_name: str, bot_username: str, token: Optional[str],
+              secret: Optional[str], params: Optional[str]):
+    """產生預填參數的深度連結（t.me/<bot>?start=…）"""
+    if not token and not secret:
+        click.echo("❌ 請通過 --token 或環境變數 BOT_TOKEN 提供Bot Token")
+        sys.exit(1)
+    
+    from .factory import create_bot_from_cli_file
+    
+    converter = create_bot_from_cli_file(
+        bot_token=token or "",
+        cli_file_path=cli_file,
+        enable_logging=False,
+        callback_secret=secret,
+    )
+    try:
+        click.echo(converter.create_deep_link(command_name, bot_username, **_parse_key_values(params)))
+    except ValueError as e:
+        click.echo(f"❌ {e}")
+        sys.exit(1)
+
+
+@main.command('fake-server')
+@click.option('--host', default='127.0.0.1', show_default=True, help='監聽地址')
+@click.option('--port', type=int, default=8081, show_default=True, help='監聽端口')
+@click.option('--latency', type=float, default=0.0, show_default=True, help='每次調用的模擬延遲（秒）')
+@click.option('--rate-limit-every', type=int, default=0, show_default=True,
+              help='每N次調用返回一次429（0表示不注入）')
+@click.option('--retry-after', type=int, default=1, show_default=True, help='429的retry_after秒數')
+def fake_server(host: str, port: int, latency: float, rate_limit_every: int, retry_after: int):
+    """運行本地假Bot API伺服器，用於離線端到端測試"""
+    from .testing import FakeBotAPI, FakeBotAPIServer
+    
+    server = FakeBotAPIServer(
+        FakeBotAPI(latency=latency, rate_limit_every=rate_limit_every,
+                   retry_after=retry_after, record=False),
+        host=host,
+        port=port,
+    )
+    click.echo(f"🧪 假Bot API伺服器: {server.base_url}")
+    click.echo(f"   telegram-click serve my_cli.py --token 123:abc --base-url {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        click.echo("伺服器已停止")
+
+
 @main.command()
 def info():
     """顯示TelegramClick信息"""
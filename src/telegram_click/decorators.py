@@ -5,14 +5,53 @@ TelegramClick裝飾器模組
 
 import functools
 import logging
-from typing import List, Dict, Any, Callable
+from typing import List, Dict, Any, Callable, Optional, TYPE_CHECKING
 import click
 
-from .factory import create_bot_from_click_group
+from .utils import extract_commands_from_click_group, should_include_command
+
+if TYPE_CHECKING:
+    from .framework import ClickToTelegramConverter
 
 logger = logging.getLogger(__name__)
 
 
+class DeferredConverter:
+    """
+    延遲建構的轉換器
+    
+    在首次需要時（通常是 run_telegram_bot()）才創建 ClickToTelegramConverter，
+    讓CLI模式的調用不需要載入 python-telegram-bot 或設置日誌。
+    """
+    
+    def __init__(self, **factory_kwargs):
+        self._factory_kwargs = factory_kwargs
+        self._converter: Optional["ClickToTelegramConverter"] = None
+    
+    @property
+    def is_built(self) -> bool:
+        """轉換器是否已經建構"""
+        return self._converter is not None
+    
+    @property
+    def converter(self) -> "ClickToTelegramConverter":
+        """取得（必要時建構）實際的轉換器"""
+        if self._converter is None:
+            from .factory import create_bot_from_click_group
+            self._converter = create_bot_from_click_group(**self._factory_kwargs)
+        return self._converter
+    
+    def run(self):
+        """建構轉換器並啟動Bot"""
+        self.converter.run()
+    
+    def __getattr__(self, name: str) -> Any:
+        # 只有在自身找不到屬性時才會被調用，轉發給實際的轉換器
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.converter, name)
+
+
 def telegram_bot(
     bot_token: str,
     commands_whitelist: List[str] = None,
@@ -62,8 +101,8 @@ def telegram_bot(
         if not isinstance(click_group, click.Group):
             raise TypeError("telegram_bot裝飾器只能用於Click群組")
         
-        # 創建Bot實例
-        bot = create_bot_from_click_group(
+        # 延遲創建Bot實例，直到首次運行
+        bot = DeferredConverter(
             bot_token=bot_token,
             click_group=click_group,
             commands_whitelist=commands_whitelist,
@@ -82,9 +121,15 @@ def telegram_bot(
         # 添加便利方法
         def get_bot_info():
             """獲取Bot信息"""
+            commands = [
+                name for name in extract_commands_from_click_group(click_group)
+                if should_include_command(
+                    name, commands_whitelist or [], commands_blacklist or []
+                )
+            ]
             return {
                 'token': bot_token[:10] + "..." if bot_token else None,
-                'commands_count': len(bot.click_commands),
+                'commands_count': len(commands),
                 'admin_users': admin_users or [],
                 'whitelist': commands_whitelist or [],
                 'blacklist': commands_blacklist or []
@@ -100,7 +145,7 @@ def telegram_bot(
         click_group.get_bot_info = get_bot_info
         click_group.start_bot_in_background = start_bot_in_background
         
-        logger.info(f"為Click群組 '{click_group.name}' 配置了Telegram Bot功能")
+        logger.info("為Click群組 '%s' 配置了Telegram Bot功能", click_group.name)
         
         return click_group
     
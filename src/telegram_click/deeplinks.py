@@ -0,0 +1,100 @@
+"""
+TelegramClick深度連結模組
+把命令和部分參數編碼成簽名的 /start 參數，分享連結即可直接開始（或執行）命令
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import zlib
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+DEEP_LINK_VERSION = 1
+DEEP_LINK_LIMIT = 64  # Telegram對 start 參數的限制（字符，僅限 A-Z a-z 0-9 _ -）
+MAC_SIZE = 6
+_FLAG_ZLIB = 0x80
+# 欄位分隔符；命令名稱和參數值中出現時無法編碼
+_SEPARATOR = "\x1f"
+# 解壓縮上限，避免偽造數據在驗證前消耗記憶體
+_MAX_BODY = 1024
+
+
+@dataclass
+class DeepLink:
+    """解碼後的深度連結：命令名稱和按參數位置索引的原始文字值"""
+    command: str
+    values: Dict[int, str] = field(default_factory=dict)
+
+
+class DeepLinkCodec:
+    """
+    深度連結編解碼器
+
+    payload = base64url(標記 | 主體 | HMAC)，主體為「命令、位置=值 …」，較短時以zlib壓縮。
+    HMAC 以密鑰和 scope（命令的參數簽名）計算：參數被重新排列或改名後舊連結失效，
+    只修改說明文字或實作則不影響已分享的連結。
+    """
+
+    def __init__(self, secret: bytes):
+        self._key = hashlib.sha256(b"telegram-click/deep-link\0" + secret).digest()
+
+    def _mac(self, body: bytes, scope: str) -> bytes:
+        return hmac.new(self._key, body + b"\0" + scope.encode(), hashlib.sha256).digest()[:MAC_SIZE]
+
+    def encode(self, link: DeepLink, scope: str = "") -> str:
+        """編碼深度連結；超過64個字符或含分隔符時拋出ValueError"""
+        fields = [link.command] + [f"{index}={value}" for index, value in sorted(link.values.items())]
+        if any(_SEPARATOR in item for item in fields):
+            raise ValueError("深度連結的參數值不能包含控制字符")
+        body = _SEPARATOR.join(fields).encode()
+
+        flags = DEEP_LINK_VERSION
+        packed = zlib.compress(body, 9)
+        if len(packed) < len(body):
+            flags |= _FLAG_ZLIB
+        else:
+            packed = body
+        raw = bytes([flags]) + packed + self._mac(body, scope)
+        payload = base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+        if len(payload) > DEEP_LINK_LIMIT:
+            raise ValueError(f"深度連結過長（{len(payload)} > {DEEP_LINK_LIMIT} 個字符），請減少預填的參數")
+        return payload
+
+    def decode(self, payload: str, scope: Callable[[str], Optional[str]]) -> Optional[DeepLink]:
+        """
+        解碼並驗證
+
+        scope 由命令名稱取得簽名範圍，未知命令返回None。偽造、過期或格式錯誤的連結返回None。
+        """
+        if not payload or len(payload) > DEEP_LINK_LIMIT:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        except (ValueError, binascii.Error):
+            return None
+        if len(raw) <= 1 + MAC_SIZE or raw[0] & ~_FLAG_ZLIB != DEEP_LINK_VERSION:
+            return None
+
+        packed, mac = raw[1:-MAC_SIZE], raw[-MAC_SIZE:]
+        try:
+            if raw[0] & _FLAG_ZLIB:
+                inflater = zlib.decompressobj()
+                body = inflater.decompress(packed, _MAX_BODY)
+                if inflater.unconsumed_tail:
+                    return None
+            else:
+                body = packed
+            command, *items = body.decode().split(_SEPARATOR)
+            values = {}
+            for item in items:
+                index, _, value = item.partition("=")
+                values[int(index)] = value
+        except (zlib.error, UnicodeDecodeError, ValueError):
+            return None
+
+        link_scope = scope(command)
+        if link_scope is None or not hmac.compare_digest(mac, self._mac(body, link_scope)):
+            return None
+        return DeepLink(command, values)
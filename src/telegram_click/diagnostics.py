@@ -0,0 +1,136 @@
+"""
+TelegramClick診斷模組
+快取命中統計、記憶體用量和按需啟用的tracemalloc分配追蹤
+"""
+
+import linecache
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc保存的堆疊深度
+TRACEMALLOC_FRAMES = 1
+
+
+class CacheStats:
+    """快取命中計數"""
+
+    __slots__ = ("hits", "misses")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def current_rss_bytes() -> Optional[int]:
+    """進程目前的常駐記憶體；無 /proc 的平台返回峰值，都不支援時返回None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_bytes(size: float) -> str:
+    """以人類可讀的單位顯示位元組數（保留正負號）"""
+    sign = "-" if size < 0 else ""
+    size = abs(size)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{sign}{size:.0f} {unit}" if unit == "B" else f"{sign}{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_duration(seconds: float) -> str:
+    """格式化為 1d 2h 3m 4s"""
+    seconds = int(seconds)
+    parts = []
+    for unit, length in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= length:
+            parts.append(f"{seconds // length}{unit}")
+            seconds %= length
+    parts.append(f"{seconds}s")
+    return " ".join(parts)
+
+
+class AllocationTracker:
+    """
+    tracemalloc的開關與快照比較
+
+    只有 start() 到 stop() 之間才有追蹤開銷；top_allocations() 返回
+    相對於 start() 時基準快照增長最多的分配位置。
+    """
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self.started_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self._baseline is not None
+
+    def start(self, frames: int = TRACEMALLOC_FRAMES) -> bool:
+        """開始追蹤；已由本追蹤器或其他程式啟用時返回False"""
+        if self.active or tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(frames)
+        self._baseline = self._snapshot()
+        self.started_at = time.monotonic()
+        return True
+
+    def stop(self) -> bool:
+        """停止追蹤並釋放快照"""
+        if not self.active:
+            return False
+        self._baseline = None
+        self.started_at = None
+        tracemalloc.stop()
+        return True
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def top_allocations(self, limit: int = 10) -> List[str]:
+        """相對基準快照增長最多的分配位置"""
+        if not self.active:
+            return []
+        stats = self._snapshot().compare_to(self._baseline, "lineno")
+        lines = []
+        for stat in stats[:limit]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"{format_bytes(stat.size_diff):>10} ({stat.count_diff:+}) "
+                f"{os.path.basename(frame.filename)}:{frame.lineno}"
+            )
+        return lines
+
+    def traced_memory(self) -> str:
+        current, peak = tracemalloc.get_traced_memory()
+        return f"{format_bytes(current)}（峰值 {format_bytes(peak)}）"
@@ -0,0 +1,125 @@
+"""
+TelegramClick命令執行器模組
+控制命令回調的執行方式（事件循環內或執行緒池）與並發上限
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from .types import ConversionResult
+from .utils import safe_call_function
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_TYPES = ("inline", "thread")
+
+
+class CommandExecutor:
+    """
+    命令執行器
+
+    - inline: 在事件循環中直接調用同步回調（原有行為）
+    - thread: 同步回調交給執行緒池，避免阻塞事件循環
+
+    max_concurrency 限制同時執行的命令數量，超出的命令在信號量上排隊。
+    """
+
+    def __init__(
+        self,
+        executor_type: str = "inline",
+        max_workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        if executor_type not in EXECUTOR_TYPES:
+            raise ValueError(f"不支援的執行器類型: {executor_type}")
+
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.busy_seconds = 0.0  # 命令回調累計執行時間
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._offload_pool: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def pool(self) -> Optional[ThreadPoolExecutor]:
+        """執行緒池（首次使用時創建）"""
+        if self.executor_type == "thread" and self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="telegram-click"
+            )
+        return self._pool
+
+    def offload_pool(self, max_workers: int) -> ThreadPoolExecutor:
+        """
+        必須並行執行的命令（例如批量執行）使用的執行緒池
+
+        thread 執行器直接使用自己的池；inline 執行器另建一個最多 max_workers 個執行緒的池，
+        同步回調不會逐一阻塞事件循環。
+        """
+        if self.executor_type == "thread":
+            return self.pool
+        if self._offload_pool is None:
+            self._offload_pool = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="telegram-click-offload"
+            )
+        return self._offload_pool
+
+    @property
+    def capacity(self) -> Optional[int]:
+        """同時執行命令數的上限；inline 執行器沒有並發上限時返回None"""
+        limits = [self.max_concurrency] if self.max_concurrency else []
+        if self.executor_type == "thread":
+            # 與 ThreadPoolExecutor 的預設大小一致
+            limits.append(self.max_workers or min(32, (os.cpu_count() or 1) + 4))
+        return min(limits) if limits else None
+
+    def _get_semaphore(self) -> Optional[asyncio.Semaphore]:
+        if self.max_concurrency and self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, func: Any, params: Dict[str, Any],
+                  pool: Optional[Executor] = None) -> ConversionResult:
+        """執行命令回調，返回包含排隊時間的結果；pool 指定同步回調使用的執行緒池"""
+        semaphore = self._get_semaphore()
+        enqueued = time.perf_counter()
+
+        if semaphore is not None:
+            self.waiting += 1
+            try:
+                await semaphore.acquire()
+            finally:
+                self.waiting -= 1
+
+        queue_wait = time.perf_counter() - enqueued
+        self.active += 1
+        try:
+            result = await safe_call_function(func, params, executor=pool or self.pool)
+        finally:
+            self.active -= 1
+            self.completed += 1
+            if semaphore is not None:
+                semaphore.release()
+
+        result.queue_wait = queue_wait
+        self.busy_seconds += result.elapsed
+        return result
+
+    def shutdown(self, wait: bool = False):
+        """關閉執行緒池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+        if self._offload_pool is not None:
+            self._offload_pool.shutdown(wait=wait)
+            self._offload_pool = None
@@ -2,12 +2,20 @@
 TelegramClick核心框架模組
 """
 
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+import shlex
+import time
+from urllib.parse import urlparse
+from typing import Dict, FrozenSet, List, Any, Optional, Set, Tuple
 import click
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
-from telegram.constants import ParseMode
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+)
+from telegram.error import BadRequest
+from telegram.ext import (
+    Application, CommandHandler, CallbackQueryHandler, InlineQueryHandler, MessageHandler, TypeHandler, filters
+)
 
 from .types import (
     TelegramClickConfig, 
@@ -19,19 +27,61 @@ from .utils import (
     setup_logging,
     load_module_from_path,
     convert_click_param_to_telegram,
-    validate_and_convert_parameter_value,
     format_output_message,
     extract_commands_from_click_group,
     find_click_objects_in_module,
     is_user_authorized,
+    is_user_admin,
     should_include_command,
     safe_call_function,
-    format_command_help
+    format_command_help,
+    get_parameter_default,
+    truncate_text
 )
+from .reload import CliModuleWatcher, compute_command_fingerprint, diff_command_sets, CommandSetDiff
+from .executor import CommandExecutor
+from .sessions import InvocationHistory, create_session_backend
+from .recording import UpdateRecorder
+from .metrics import MetricsRegistry, MetricsServer, NullRegistry
+from .tracing import JsonlSpanExporter, Tracer
+from .profiling import PROFILE_MODES, CommandProfiler
+from .audit import AuditLogger, create_audit_sink
+from .diagnostics import AllocationTracker, CacheStats, current_rss_bytes, format_bytes, format_duration
+from .markup import get_renderer
+from .callbacks import CallbackCodec, CallbackOp, CallbackToken
+from .keyboards import ChoiceKeyboard
+from .search import CommandIndex
+from .deeplinks import DeepLink, DeepLinkCodec
+from .validation import BATCH_HINT, Validator, accepts_batch, compile_validator
+from .uploads import BOT_API_DOWNLOAD_LIMIT, UploadTooLarge, accepts_upload, receive_upload
+from .bulk import BulkFileError, BulkRow, parse_rows, results_csv, unknown_columns
+from .scheduler import MISFIRE_POLICIES, Schedule, Scheduler, ScheduleStore, format_interval, parse_interval
 
 logger = logging.getLogger(__name__)
 
 
+def _deep_link_text(value: Any) -> str:
+    """預填值的文字形式；多值參數每個值（或每組值）一行"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (tuple, list)):
+        return "\n".join(_deep_link_text(item) if not isinstance(item, (tuple, list))
+                         else " ".join(map(_deep_link_text, item)) for item in value)
+    return str(value)
+
+
+def _restore_batch_values(params: Dict[str, Any], plan: List[click.Parameter]) -> Dict[str, Any]:
+    """JSON往返會把多值參數的元組變成列表；按參數計劃還原為（嵌套的）元組"""
+    def as_tuple(value: list) -> tuple:
+        return tuple(as_tuple(item) if isinstance(item, list) else item for item in value)
+    
+    restored = dict(params)
+    for param in plan:
+        if accepts_batch(param) and isinstance(restored.get(param.name), list):
+            restored[param.name] = as_tuple(restored[param.name])
+    return restored
+
+
 class ClickToTelegramConverter:
     """Click CLI到Telegram Bot的轉換器"""
     
@@ -41,9 +91,102 @@ class ClickToTelegramConverter:
         self.click_commands: Dict[str, click.Command] = {}
         self.command_name_mapping: Dict[str, str] = {}  # telegram_name -> original_name
         self.user_contexts: Dict[int, TelegramClickContext] = {}
+        self.command_fingerprints: Dict[str, str] = {}  # 用於熱重載比對
+        self._command_handlers: Dict[str, CommandHandler] = {}
+        self._help_cache: Dict[str, str] = {}  # 每個命令的幫助文字快取
+        # 選擇參數的鍵盤：(命令, 參數索引) -> 鍵盤；未篩選的頁面按 (命令, 參數索引, 頁碼) 快取
+        self._choice_keyboards: Dict[Tuple[str, int], ChoiceKeyboard] = {}
+        self._choice_pages: Dict[Tuple[str, int, int], InlineKeyboardMarkup] = {}
+        self._validators: Dict[Tuple[str, str], Validator] = {}  # (命令, 參數) -> 編譯後的驗證函數
+        self._hidden_params: Dict[str, FrozenSet[str]] = {}  # 命令 -> hide_input 的參數名稱
+        self.command_index: Optional[CommandIndex] = None  # 內聯搜尋索引，鍵為Telegram命令名
+        self._watcher: Optional[CliModuleWatcher] = None
+        self.executor = CommandExecutor(
+            config.executor_type,
+            max_workers=config.executor_workers,
+            max_concurrency=config.max_concurrent_commands
+        )
+        self.sessions = create_session_backend(config.session_backend, config.session_path)
+        self.history = InvocationHistory(self.sessions, config.history_size)
+        self.scheduler = Scheduler(
+            ScheduleStore(config.schedule_path), self._run_schedule,
+            misfire_grace=config.schedule_misfire_grace
+        )
+        self.recorder: Optional[UpdateRecorder] = None
+        self.metrics = (
+            MetricsRegistry() if config.enable_metrics or config.metrics_port is not None
+            else NullRegistry()
+        )
+        self._metrics_server: Optional[MetricsServer] = None
+        self._outbox_depth = 0  # 正在發送中的訊息數量
+        self._init_metrics()
+        self.tracer = Tracer(config.trace_exporter)
+        self.renderer = get_renderer(config.message_format)
+        self.callbacks = CallbackCodec((config.callback_secret or config.bot_token).encode())
+        self.deep_links = DeepLinkCodec((config.callback_secret or config.bot_token).encode())
+        # 操作碼 -> 處理函數
+        self._callback_handlers = {
+            CallbackOp.CHOICE: self._on_choice_callback,
+            CallbackOp.BOOL: self._on_bool_callback,
+            CallbackOp.INPUT: self._on_input_callback,
+            CallbackOp.DEFAULT: self._on_default_callback,
+            CallbackOp.SKIP: self._on_skip_callback,
+            CallbackOp.TOGGLE: self._handle_summary_callback,
+            CallbackOp.CYCLE: self._handle_summary_callback,
+            CallbackOp.EDIT: self._handle_summary_callback,
+            CallbackOp.RUN: self._handle_summary_callback,
+            CallbackOp.PAGE: self._on_page_callback,
+            CallbackOp.CLEAR_FILTER: self._on_clear_filter_callback,
+        }
+        self._profile_requests: Dict[int, Tuple[str, str]] = {}  # user_id -> (命令, 分析模式)
+        self._bulk_tasks: Set[asyncio.Task] = set()  # 背景執行中的 /bulk 批次
+        self.started_at = time.monotonic()
+        self.cache_stats: Dict[str, CacheStats] = {
+            "help": CacheStats(), "choice_keyboard": CacheStats(), "inline_search": CacheStats()
+        }
+        self.allocations = AllocationTracker()
+        self.audit: Optional[AuditLogger] = None
         
         # 設置日誌
-        setup_logging(config.enable_logging)
+        setup_logging(
+            config.enable_logging,
+            config.log_level,
+            config.log_format,
+            config.log_queue,
+            config.log_debug_sample_rate
+        )
+    
+    def _init_metrics(self):
+        """註冊框架指標；停用時全部是空操作"""
+        m = self.metrics
+        self._m_invocations = m.counter("command_invocations_total", "命令執行次數", ["command"])
+        self._m_errors = m.counter("command_errors_total", "命令執行失敗次數", ["command"])
+        self._m_duration = m.histogram("command_duration_seconds", "命令執行耗時", ["command"])
+        self._m_collection = m.histogram(
+            "parameter_collection_seconds", "從命令開始到參數收集完成的耗時", ["command"]
+        )
+        self._m_queue_wait = m.histogram("executor_queue_wait_seconds", "命令在執行器排隊等待的時間")
+        self._m_send = m.histogram("send_duration_seconds", "發送Telegram訊息的延遲", ["method"])
+        self._m_send_errors = m.counter("send_errors_total", "發送Telegram訊息失敗次數", ["method"])
+        m.gauge("active_sessions", "進行中的會話數量", function=lambda: len(self.user_contexts))
+        m.gauge("outbox_depth", "正在發送中的訊息數量", function=lambda: self._outbox_depth)
+        m.gauge("executor_active", "正在執行的命令數量", function=lambda: self.executor.active)
+        m.gauge("executor_waiting", "等待執行的命令數量", function=lambda: self.executor.waiting)
+    
+    async def _send(self, call, *args, **kwargs):
+        """所有發往Telegram的訊息都經過這裡，統一統計發送延遲和排隊深度"""
+        method = getattr(call, "__name__", "send")
+        self._outbox_depth += 1
+        started = time.perf_counter()
+        try:
+            with self.tracer.span("send", method=method):
+                return await call(*args, **kwargs)
+        except Exception:
+            self._m_send_errors.labels(method).inc()
+            raise
+        finally:
+            self._outbox_depth -= 1
+            self._m_send.labels(method).observe(time.perf_counter() - started)
     
     def _discover_click_commands(self):
         """自動發現Click命令"""
@@ -57,38 +200,149 @@ class ClickToTelegramConverter:
             else:
                 raise ValueError("必須提供 cli_group 或 cli_module_path")
                 
-            logger.info(f"成功註冊 {len(self.click_commands)} 個命令")
+            logger.info("成功註冊 %s 個命令", len(self.click_commands))
+            self._rebuild_command_index()
             
         except Exception as e:
-            logger.error(f"命令發現失敗: {e}")
+            logger.error("命令發現失敗: %s", e)
             raise
     
-    def _extract_commands_from_group(self, group: click.Group):
-        """從Click群組提取命令"""
-        commands = extract_commands_from_click_group(group)
-        
-        for name, command in commands.items():
+    def _filter_commands(self, commands: Dict[str, click.Command]) -> Dict[str, click.Command]:
+        """依白名單和黑名單過濾命令"""
+        return {
+            name: command
+            for name, command in commands.items()
             if should_include_command(
-                name, 
-                self.config.commands_whitelist, 
+                name,
+                self.config.commands_whitelist,
                 self.config.commands_blacklist
-            ):
-                self.click_commands[name] = command
-                logger.debug(f"註冊命令: {name}")
+            )
+        }
+    
+    def _register_commands(self, commands: Dict[str, click.Command]):
+        """註冊命令並記錄指紋"""
+        for name, command in self._filter_commands(commands).items():
+            self.click_commands[name] = command
+            self.command_fingerprints[name] = compute_command_fingerprint(command)
+            logger.debug("註冊命令: %s", name)
+    
+    def _extract_commands_from_group(self, group: click.Group):
+        """從Click群組提取命令"""
+        self._register_commands(extract_commands_from_click_group(group))
     
     def _load_commands_from_module(self):
         """從模組載入Click命令"""
         module = load_module_from_path(self.config.cli_module_path)
-        commands = find_click_objects_in_module(module)
+        self._register_commands(find_click_objects_in_module(module))
+    
+    async def reload_cli_module(self) -> CommandSetDiff:
+        """
+        重新載入CLI模組並增量更新命令註冊表
         
-        for name, command in commands.items():
-            if should_include_command(
-                name,
-                self.config.commands_whitelist,
-                self.config.commands_blacklist
-            ):
-                self.click_commands[name] = command
-                logger.debug(f"註冊命令: {name}")
+        只有新增、刪除或變更的命令會重建處理器和快取，並結束使用它們的會話。
+        指紋只涵蓋命令本身，回調用到的輔助函數和模組常數不在其中，所以所有命令
+        都換成新載入的命令對象；未變更命令的會話只保存命令名稱和指紋相同的參數，不受影響。
+        """
+        module = load_module_from_path(self.config.cli_module_path)
+        new_commands = self._filter_commands(find_click_objects_in_module(module))
+        new_fingerprints = {
+            name: compute_command_fingerprint(command)
+            for name, command in new_commands.items()
+        }
+        
+        diff = diff_command_sets(self.command_fingerprints, new_fingerprints)
+        for name in diff.unchanged:
+            self.click_commands[name] = new_commands[name]
+        # 驗證函數引用參數回調，回調可能用到已變更的模組內容
+        self._drop_validators(diff.unchanged)
+        if not diff.has_changes:
+            logger.info("CLI模組已重載，命令定義無變更")
+            return diff
+        
+        for name in diff.removed:
+            self._unregister_command_handler(name)
+            del self.click_commands[name]
+            del self.command_fingerprints[name]
+        
+        for name in diff.added + diff.changed:
+            self.click_commands[name] = new_commands[name]
+            self.command_fingerprints[name] = new_fingerprints[name]
+        
+        for name in diff.added:
+            self._register_command_handler(name)
+        
+        self._invalidate_command_caches(diff.affected)
+        self._rebuild_command_index()
+        await self._drop_stale_sessions(diff.removed + diff.changed)
+        
+        logger.info(
+            "CLI模組已重載：新增 %s，變更 %s，刪除 %s",
+            len(diff.added), len(diff.changed), len(diff.removed)
+        )
+        return diff
+    
+    def _invalidate_command_caches(self, command_names: List[str]):
+        """清除指定命令的快取（幫助文字等）"""
+        for name in command_names:
+            self._help_cache.pop(name, None)
+        stale = set(command_names)
+        for key in [key for key in self._choice_keyboards if key[0] in stale]:
+            del self._choice_keyboards[key]
+        for key in [key for key in self._choice_pages if key[0] in stale]:
+            del self._choice_pages[key]
+        self._drop_validators(command_names)
+    
+    def _drop_validators(self, command_names: List[str]):
+        """清除指定命令編譯後的驗證函數和隱藏參數集合"""
+        stale = set(command_names)
+        for key in [key for key in self._validators if key[0] in stale]:
+            del self._validators[key]
+        for name in stale:
+            self._hidden_params.pop(name, None)
+    
+    def _hidden_param_names(self, command_name: str) -> FrozenSet[str]:
+        """命令中 hide_input 的參數名稱；按命令快取，未知命令返回空集合"""
+        hidden = self._hidden_params.get(command_name)
+        if hidden is None:
+            command = self.click_commands.get(command_name)
+            if command is None:
+                return frozenset()
+            hidden = self._hidden_params[command_name] = frozenset(
+                param.name for param in command.params if getattr(param, "hide_input", False)
+            )
+        return hidden
+    
+    def _command_description(self, name: str) -> str:
+        """命令說明的第一行"""
+        command = self.click_commands[name]
+        description = self.config.custom_help.get(name) or command.short_help or command.help or ""
+        return description.strip().split("\n", 1)[0]
+    
+    def _rebuild_command_index(self):
+        """依目前的命令註冊表重建內聯搜尋索引（同時清空查詢快取）"""
+        self.command_index = CommandIndex(
+            {self._normalize_command_name(name): self._command_description(name) for name in self.click_commands},
+            stats=self.cache_stats["inline_search"]
+        )
+    
+    async def _drop_stale_sessions(self, command_names: List[str]):
+        """結束使用已變更或已刪除命令的會話"""
+        stale_names = set(command_names)
+        stale_users = [
+            user_id for user_id, ctx in self.user_contexts.items()
+            if ctx.command_name in stale_names
+        ]
+        
+        for user_id in stale_users:
+            ctx = self.user_contexts.pop(user_id)
+            ctx.release_uploads()
+            try:
+                await self._send(
+                    ctx.update.effective_chat.send_message,
+                    f"⚠️ 命令 /{ctx.command_name} 已更新，請重新開始"
+                )
+            except Exception as e:
+                logger.warning("無法通知用戶 %s 會話結束: %s", user_id, e)
     
     def _normalize_command_name(self, cmd_name: str) -> str:
         """將Click命令名轉換為有效的Telegram命令名"""
@@ -102,85 +356,489 @@ class ClickToTelegramConverter:
     
     def _setup_telegram_handlers(self):
         """設置Telegram處理器"""
+        if self.config.record_updates_path:
+            if self.recorder is None:
+                self.recorder = UpdateRecorder(self.config.record_updates_path)
+            # group -1 在所有處理器之前看到每個更新
+            self.app.add_handler(TypeHandler(Update, self._record_update), group=-1)
+        
+        if self.config.trace_path and not self.tracer.enabled:
+            self.tracer = Tracer(JsonlSpanExporter(self.config.trace_path))
+        
+        if self.config.audit_path and self.audit is None:
+            self.audit = AuditLogger(create_audit_sink(
+                self.config.audit_backend,
+                self.config.audit_path,
+                max_bytes=self.config.audit_max_bytes,
+                backup_count=self.config.audit_backup_count
+            ))
+        
         self.app.add_handler(CommandHandler("start", self._handle_start))
         self.app.add_handler(CommandHandler("help", self._handle_help))
+        self._register_builtin_handler("profile", self._handle_profile)
+        self._register_builtin_handler("stats", self._handle_stats)
+        if self.audit is not None:
+            self._register_builtin_handler("audit", self._handle_audit)
+        if self.config.history_size > 0:
+            self._register_builtin_handler("recent", self._handle_recent)
+        self._register_builtin_handler("bulk", self._handle_bulk)
+        self._register_builtin_handler("schedule", self._handle_schedule)
+        self._register_builtin_handler("schedules", self._handle_schedules)
+        self._register_builtin_handler("unschedule", self._handle_unschedule)
         self.app.add_handler(CallbackQueryHandler(self._handle_callback))
+        if self.config.inline_search:
+            self.app.add_handler(InlineQueryHandler(self._handle_inline_query))
         self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self._handle_text))
+        self.app.add_handler(MessageHandler(filters.Document.ALL, self._handle_document))
         
         # 為每個Click命令創建Telegram命令處理器
         for cmd_name in self.click_commands:
-            telegram_cmd_name = self._normalize_command_name(cmd_name)
-            self.command_name_mapping[telegram_cmd_name] = cmd_name
-            self.app.add_handler(CommandHandler(telegram_cmd_name, self._handle_click_command))
+            self._register_command_handler(cmd_name)
         
         logger.info("Telegram處理器設置完成")
     
+    def _register_builtin_handler(self, name: str, callback):
+        """
+        註冊框架內建命令；與CLI命令同名時讓位給CLI命令
+        
+        權限由各處理函數檢查：/profile、/stats、/audit、/bulk 和排程命令僅限管理員（is_user_admin），
+        其餘內建命令對所有已授權用戶開放（is_user_authorized）。
+        """
+        if name in self.click_commands or name in self.command_name_mapping:
+            logger.warning("內建命令 /%s 與CLI命令同名，已停用", name)
+            return
+        self.app.add_handler(CommandHandler(name, callback))
+    
+    def _register_command_handler(self, cmd_name: str):
+        """為單個Click命令註冊Telegram命令處理器"""
+        telegram_cmd_name = self._normalize_command_name(cmd_name)
+        self.command_name_mapping[telegram_cmd_name] = cmd_name
+        
+        if self.app is None:
+            return
+        
+        handler = CommandHandler(telegram_cmd_name, self._handle_click_command)
+        self._command_handlers[cmd_name] = handler
+        self.app.add_handler(handler)
+    
+    def _unregister_command_handler(self, cmd_name: str):
+        """移除單個Click命令的Telegram命令處理器"""
+        telegram_cmd_name = self._normalize_command_name(cmd_name)
+        self.command_name_mapping.pop(telegram_cmd_name, None)
+        
+        handler = self._command_handlers.pop(cmd_name, None)
+        if handler is not None and self.app is not None:
+            self.app.remove_handler(handler)
+    
+    async def _post_init(self, application: Application):
+        """Application初始化後的鉤子：啟動背景任務"""
+        if self.config.hot_reload and self.config.cli_module_path:
+            self._watcher = CliModuleWatcher(
+                self.config.cli_module_path,
+                self.reload_cli_module,
+                interval=self.config.hot_reload_interval
+            )
+            self._watcher.start()
+            logger.info("已啟用熱重載: %s", self.config.cli_module_path)
+        
+        if self.metrics.enabled and self.config.metrics_port is not None:
+            self._metrics_server = MetricsServer(
+                self.metrics, self.config.metrics_host, self.config.metrics_port
+            ).start()
+        
+        self.scheduler.start()
+    
+    async def _post_shutdown(self, application: Application):
+        """Application關閉後的鉤子：停止背景任務"""
+        if self._watcher is not None:
+            await self._watcher.stop()
+            self._watcher = None
+        if self._metrics_server is not None:
+            self._metrics_server.stop()
+            self._metrics_server = None
+        await self.scheduler.stop()
+        self.scheduler.close()
+        if self._bulk_tasks:
+            await asyncio.wait(list(self._bulk_tasks))
+        self.executor.shutdown()
+        self.sessions.close()
+        if self.recorder is not None:
+            self.recorder.close()
+            logger.info("已錄製 %s 個更新到 %s", self.recorder.recorded, self.recorder.path)
+            self.recorder = None
+        self.tracer.close()
+        self.allocations.stop()
+        if self.audit is not None:
+            self.audit.close()
+            self.audit = None
+    
+    async def _record_update(self, update: Update, context):
+        """將收到的更新交給錄製器（非阻塞）"""
+        self.recorder.record(update.to_dict())
+    
     async def _handle_start(self, update: Update, context):
         """處理/start命令"""
         user_id = update.effective_user.id
         
         if not is_user_authorized(user_id, self.config.admin_users):
-            await update.message.reply_text("❌ 您沒有使用此機器人的權限")
+            await self._send(update.message.reply_text, "❌ 您沒有使用此機器人的權限")
             return
         
-        commands_list = "\n".join([f"🔹 /{name}" for name in self.click_commands.keys()])
+        if context.args:
+            await self._start_deep_link(update, context.args[0])
+            return
+        
+        render = self.renderer
+        commands_list = "\n".join([f"🔹 {render.escape('/' + name)}" for name in self.click_commands.keys()])
         
         welcome_msg = (
-            f"🤖 **CLI Bot 已啟動！**\n\n"
-            f"這個機器人將您的CLI命令轉換為互動式界面。\n\n"
-            f"**可用命令：**\n{commands_list}\n\n"
-            f"使用 /help 獲取詳細說明"
+            f"🤖 {render.bold('CLI Bot 已啟動！')}\n\n"
+            f"{render.escape('這個機器人將您的CLI命令轉換為互動式界面。')}\n\n"
+            f"{render.bold('可用命令：')}\n{commands_list}\n\n"
+            f"{render.escape('使用 /help 獲取詳細說明')}"
         )
         
-        await update.message.reply_text(welcome_msg, parse_mode=ParseMode.MARKDOWN)
-        logger.info(f"用戶 {user_id} 啟動了機器人")
+        await self._send(update.message.reply_text, welcome_msg, parse_mode=render.parse_mode)
+        logger.info("用戶 %s 啟動了機器人", user_id)
+    
+    def _deep_link_scope(self, name: str) -> Optional[str]:
+        """深度連結簽名綁定命令的參數簽名（參數名稱和順序），未知命令返回None"""
+        command = self.click_commands.get(name)
+        if command is None:
+            return None
+        return f"{name}:{','.join(param.name for param in command.params)}"
+    
+    def deep_link_payload(self, command_name: str, **params) -> str:
+        """
+        產生預填參數的 /start 參數
+        
+        Args:
+            command_name: Click命令名稱
+            **params: 預填的參數值（按參數名稱）；其餘參數在打開連結後照常詢問
+        """
+        if not self.click_commands:
+            self._discover_click_commands()
+        command = self.click_commands.get(command_name)
+        if command is None:
+            raise ValueError(f"未知命令: {command_name}")
+        
+        positions = {param.name: index for index, param in enumerate(command.params)}
+        values = {}
+        for name, value in params.items():
+            if name not in positions:
+                raise ValueError(f"命令 {command_name} 沒有參數: {name}")
+            values[positions[name]] = _deep_link_text(value)
+        return self.deep_links.encode(DeepLink(command_name, values), self._deep_link_scope(command_name))
+    
+    def create_deep_link(self, command_name: str, bot_username: Optional[str] = None, **params) -> str:
+        """產生 https://t.me/<bot>?start=<payload> 連結；未指定 bot_username 時使用已初始化的Bot"""
+        payload = self.deep_link_payload(command_name, **params)
+        if bot_username is None:
+            try:
+                bot_username = self.app.bot.username
+            except (AttributeError, RuntimeError):
+                raise ValueError("Bot尚未初始化，請提供 bot_username") from None
+        return f"https://t.me/{bot_username.lstrip('@')}?start={payload}"
+    
+    async def _start_deep_link(self, update: Update, payload: str):
+        """從深度連結開始命令：預填的參數照常驗證，只詢問其餘參數；全部已知時直接執行"""
+        user_id = update.effective_user.id
+        link = self.deep_links.decode(payload, self._deep_link_scope)
+        if link is None:
+            await self._send(update.message.reply_text, "❌ 連結無效或已過期")
+            return
+        
+        command = self.click_commands[link.command]
+        collected = {}
+        for index, text in link.values.items():
+            if index >= len(command.params):
+                await self._send(update.message.reply_text, "❌ 連結無效或已過期")
+                return
+            param = command.params[index]
+            result = self._validate(link.command, param, text, collected)
+            if not result.success:
+                await self._send(update.message.reply_text, f"❌ 連結中的參數 {param.name} 無效：{result.message}")
+                return
+            collected[param.name] = result.data
+        
+        self._end_session(user_id)
+        context = TelegramClickContext(update, user_id, update.effective_chat.id)
+        context.command_name = link.command
+        context.collected_params = collected
+        self.user_contexts[user_id] = context
+        logger.info("用戶 %s 從深度連結開始命令: %s（預填 %s 個參數）", user_id, link.command, len(collected))
+        await self._start_parameter_collection(user_id)
     
     async def _handle_help(self, update: Update, context):
         """處理/help命令"""
         user_id = update.effective_user.id
         
         if not is_user_authorized(user_id, self.config.admin_users):
-            await update.message.reply_text("❌ 您沒有使用此機器人的權限")
+            await self._send(update.message.reply_text, "❌ 您沒有使用此機器人的權限")
             return
         
-        help_text = "📋 **命令說明：**\n\n"
+        help_text = f"📋 {self.renderer.bold('命令說明：')}\n\n"
         
+        help_cache_stats = self.cache_stats["help"]
         for name, cmd in self.click_commands.items():
-            help_text += format_command_help(cmd, self.config.custom_help)
-            help_text += "\n"
+            cached = name in self._help_cache
+            help_cache_stats.record(cached)
+            if not cached:
+                self._help_cache[name] = format_command_help(cmd, self.config.custom_help, self.renderer) + "\n"
+            help_text += self._help_cache[name]
         
-        await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
+        await self._send(update.message.reply_text, help_text, parse_mode=self.renderer.parse_mode)
     
-    async def _handle_click_command(self, update: Update, context):
-        """處理Click命令"""
+    async def _handle_inline_query(self, update: Update, context):
+        """處理內聯查詢：按名稱前綴和說明文字搜尋命令，選中結果即在聊天中送出該命令"""
+        query = update.inline_query
+        if not is_user_authorized(query.from_user.id, self.config.admin_users):
+            await self._send(query.answer, [], cache_time=self.config.inline_cache_time, is_personal=True)
+            return
+        
+        if self.command_index is None:
+            self._rebuild_command_index()
+        results = []
+        for telegram_name in self.command_index.search(query.query, limit=50):
+            name = self.command_name_mapping.get(telegram_name)
+            if name not in self.click_commands:
+                continue
+            results.append(InlineQueryResultArticle(
+                id=telegram_name,
+                title=f"/{telegram_name}",
+                description=self._command_description(name) or None,
+                input_message_content=InputTextMessageContent(f"/{telegram_name}"),
+            ))
+        
+        # 結果依授權名單而定，不能讓Telegram在用戶之間共用快取
+        await self._send(query.answer, results, cache_time=self.config.inline_cache_time, is_personal=True)
+    
+    async def _handle_profile(self, update: Update, context):
+        """處理/profile命令：分析指定命令的下一次執行"""
         user_id = update.effective_user.id
         
-        if not is_user_authorized(user_id, self.config.admin_users):
-            await update.message.reply_text("❌ 您沒有使用此機器人的權限")
+        if not is_user_admin(user_id, self.config.admin_users):
+            await self._send(update.message.reply_text, "❌ 此命令僅限管理員使用")
             return
         
-        command_name = update.message.text[1:].split()[0]
+        args = context.args or []
+        if not args:
+            await self._send(
+                update.message.reply_text,
+                f"用法：/profile <命令> [{'|'.join(PROFILE_MODES)}]"
+            )
+            return
         
+        command_name = args[0].lstrip("/")
+        mode = args[1] if len(args) > 1 else PROFILE_MODES[0]
         if command_name not in self.click_commands:
-            await update.message.reply_text("❌ 未知命令")
+            await self._send(update.message.reply_text, f"❌ 未知命令: {command_name}")
+            return
+        if mode not in PROFILE_MODES:
+            await self._send(update.message.reply_text, f"❌ 不支援的分析模式: {mode}")
             return
         
-        # 創建用戶上下文
-        chat_id = update.effective_chat.id
-        self.user_contexts[user_id] = TelegramClickContext(update, user_id, chat_id)
-        self.user_contexts[user_id].command_name = command_name
+        self._profile_requests[user_id] = (command_name, mode)
+        await self._send(
+            update.message.reply_text,
+            f"🔬 您下一次執行 /{command_name} 時將以 {mode} 進行分析"
+        )
+    
+    def _take_profile_request(self, user_id: int, command_name: str) -> Optional[CommandProfiler]:
+        """取出此用戶對該命令的分析請求"""
+        request = self._profile_requests.get(user_id)
+        if request is None or request[0] != command_name:
+            return None
+        del self._profile_requests[user_id]
+        return CommandProfiler(request[1])
+    
+    async def _send_profile(self, context: TelegramClickContext, profiler: CommandProfiler):
+        """發送分析摘要和完整分析檔案"""
+        chat = context.update.effective_chat
+        report = profiler.format_report(context.command_name)
+        await self._send(chat.send_message, truncate_text(report, self.config.max_message_length))
+        await self._send(
+            chat.send_document,
+            document=profiler.dump(),
+            filename=f"{context.command_name}_{profiler.filename}"
+        )
+    
+    async def _handle_stats(self, update: Update, context):
+        """處理/stats命令：顯示運行狀態；/stats mem start|stop 開關記憶體分配追蹤"""
+        user_id = update.effective_user.id
         
-        logger.info(f"用戶 {user_id} 執行命令: {command_name}")
+        if not is_user_admin(user_id, self.config.admin_users):
+            await self._send(update.message.reply_text, "❌ 此命令僅限管理員使用")
+            return
         
-        # 開始參數收集
-        await self._start_parameter_collection(user_id)
+        args = [arg.lower() for arg in (context.args or [])]
+        if args[:2] == ["mem", "start"]:
+            if self.allocations.start():
+                message = "🧠 已開始追蹤記憶體分配，使用 /stats 查看增長最多的位置"
+            else:
+                message = "⚠️ tracemalloc 已在運行"
+        elif args[:2] == ["mem", "stop"]:
+            message = "🧠 已停止追蹤記憶體分配" if self.allocations.stop() else "⚠️ 記憶體分配追蹤未啟用"
+        elif args:
+            message = "用法：/stats [mem start|mem stop]"
+        else:
+            message = self._format_stats()
+        
+        await self._send(
+            update.message.reply_text,
+            truncate_text(message, self.config.max_message_length)
+        )
+    
+    def _format_stats(self) -> str:
+        """運行狀態報告（純文字）"""
+        uptime = time.monotonic() - self.started_at
+        executor = self.executor
+        capacity = executor.capacity
+        executor_line = f"{executor.executor_type}，執行中 {executor.active}"
+        if capacity:
+            executor_line += f" / {capacity}"
+            busy = executor.busy_seconds / (uptime * capacity) if uptime > 0 else 0.0
+            executor_line += f"（累計使用率 {busy:.1%}）"
+        executor_line += f"，等待 {executor.waiting}，已完成 {executor.completed}"
+        
+        rss = current_rss_bytes()
+        lines = [
+            "📈 Bot 狀態",
+            f"運行時間: {format_duration(uptime)}",
+            f"命令數: {len(self.click_commands)}",
+            f"進行中會話: {len(self.user_contexts)}",
+            f"執行器: {executor_line}",
+            f"發送中訊息: {self._outbox_depth}",
+            f"排程: {len(self.scheduler.schedules)}，已執行 {self.scheduler.fired}，錯過 {self.scheduler.missed}",
+            f"記憶體 RSS: {format_bytes(rss) if rss is not None else '不可用'}",
+        ]
+        
+        for name, stats in self.cache_stats.items():
+            total = stats.hits + stats.misses
+            lines.append(f"快取 {name}: 命中率 {stats.hit_rate:.1%}（{stats.hits}/{total}）")
+        
+        if self.allocations.active:
+            lines.append("")
+            lines.append(
+                f"🧠 tracemalloc 已運行 {format_duration(time.monotonic() - self.allocations.started_at)}，"
+                f"追蹤中 {self.allocations.traced_memory()}"
+            )
+            lines.append("增長最多的分配位置：")
+            lines.extend(self.allocations.top_allocations())
+        else:
+            lines.append("tracemalloc: 未啟用（/stats mem start）")
+        
+        return "\n".join(lines)
+    
+    def _audit_execution(self, context: TelegramClickContext, result: ConversionResult,
+                         params: Optional[Dict[str, Any]] = None):
+        """把一次命令執行放入審計佇列；hide_input 的參數值不記錄；params 預設為上下文已收集的參數"""
+        hidden = self._hidden_param_names(context.command_name)
+        self.audit.log({
+            "user_id": context.user_id,
+            "chat_id": context.chat_id,
+            "command": context.command_name,
+            "params": {
+                name: "***" if name in hidden else value
+                for name, value in (context.collected_params if params is None else params).items()
+            },
+            "success": result.success,
+            "duration_ms": round(result.elapsed * 1000, 3),
+            "queue_wait_ms": round(result.queue_wait * 1000, 3),
+            "error": str(result.error) if result.error else None,
+        })
+    
+    async def _handle_audit(self, update: Update, context):
+        """處理/audit命令：/audit [user=ID] [command=名稱] [limit=N]"""
+        user_id = update.effective_user.id
+        
+        if not is_user_admin(user_id, self.config.admin_users):
+            await self._send(update.message.reply_text, "❌ 此命令僅限管理員使用")
+            return
+        
+        filters_ = {}
+        for arg in context.args or []:
+            key, sep, value = arg.partition("=")
+            if not sep or key not in ("user", "command", "limit"):
+                await self._send(
+                    update.message.reply_text,
+                    "用法：/audit [user=ID] [command=名稱] [limit=N]"
+                )
+                return
+            filters_[key] = value
+        
+        try:
+            query_user = int(filters_["user"]) if "user" in filters_ else None
+            limit = min(int(filters_.get("limit", 20)), 100)
+        except ValueError:
+            await self._send(update.message.reply_text, "❌ user 和 limit 必須是數字")
+            return
+        
+        records = await asyncio.to_thread(
+            self.audit.query, user_id=query_user, command=filters_.get("command"), limit=limit
+        )
+        if not records:
+            await self._send(update.message.reply_text, "📜 沒有符合條件的審計記錄")
+            return
+        
+        lines = [f"📜 最近 {len(records)} 條審計記錄"]
+        for record in records:
+            params = " ".join(f"{key}={value}" for key, value in record["params"].items())
+            lines.append(
+                f"{time.strftime('%m-%d %H:%M:%S', time.localtime(record['ts']))} "
+                f"{'✅' if record['success'] else '❌'} {record['user_id']} "
+                f"/{record['command']} {params} ({record['duration_ms']:.0f}ms)"
+            )
+        await self._send(
+            update.message.reply_text,
+            truncate_text("\n".join(lines), self.config.max_message_length)
+        )
+    
+    async def _handle_click_command(self, update: Update, context):
+        """處理Click命令"""
+        user_id = update.effective_user.id
+        telegram_name = update.message.text[1:].split()[0].split("@")[0]
+        command_name = self.command_name_mapping.get(telegram_name, telegram_name)
+        
+        with self.tracer.span("handle_command", user_id=user_id, command=command_name):
+            with self.tracer.span("authorize"):
+                authorized = is_user_authorized(user_id, self.config.admin_users)
+            if not authorized:
+                await self._send(update.message.reply_text, "❌ 您沒有使用此機器人的權限")
+                return
+            
+            if command_name not in self.click_commands:
+                await self._send(update.message.reply_text, "❌ 未知命令")
+                return
+            
+            # 創建用戶上下文
+            chat_id = update.effective_chat.id
+            with self.tracer.span("session_start"):
+                self._end_session(user_id)
+                self.user_contexts[user_id] = TelegramClickContext(update, user_id, chat_id)
+                self.user_contexts[user_id].command_name = command_name
+            
+            logger.info("用戶 %s 執行命令: %s", user_id, command_name)
+            
+            # 開始參數收集
+            await self._start_parameter_collection(user_id)
     
     async def _start_parameter_collection(self, user_id: int):
         """開始參數收集流程"""
         context = self.user_contexts[user_id]
         command = self.click_commands[context.command_name]
+        all_params = self._build_parameter_plan(command)
         
-        # 分離必需和可選參數
+        if not all_params:
+            # 沒有參數，直接執行
+            await self._execute_click_command(user_id)
+            return
+        
+        context.required_params = all_params
+        await self._collect_next_parameter(user_id)
+    
+    def _build_parameter_plan(self, command: click.Command) -> List[click.Parameter]:
+        """建立參數收集順序：必需參數在前，可選參數在後"""
         required_params = []
         optional_params = []
         if hasattr(command, 'params'):
@@ -191,109 +849,248 @@ class ClickToTelegramConverter:
                     else:
                         optional_params.append(param)
         
-        # 將所有參數合併，但保留分離信息
-        all_params = required_params + optional_params
-        
-        if not all_params:
-            # 沒有參數，直接執行
-            await self._execute_click_command(user_id)
+        return required_params + optional_params
+    
+    def _save_session(self, user_id: int):
+        """將進行中的會話快照寫入持久化會話後端"""
+        if not self.sessions.persistent or user_id not in self.user_contexts:
             return
         
-        context.required_params = all_params
-        await self._collect_next_parameter(user_id)
+        context = self.user_contexts[user_id]
+        snapshot = {
+            "command_name": context.command_name,
+            "chat_id": context.chat_id,
+            "collected_params": context.collected_params,
+            "current_param_index": context.current_param_index,
+            "waiting_for_input": context.waiting_for_input,
+            "form_message_id": context.form_message_id,
+            "editing_param": context.editing_param,
+            "choice_filter": context.choice_filter,
+        }
+        try:
+            self.sessions.set(f"session:{user_id}", snapshot)
+        except (TypeError, ValueError) as e:
+            # 參數值無法序列化（例如檔案）時只保留記憶體中的會話；刪除舊快照，重啟後不會恢復到過時的狀態
+            logger.debug("會話 %s 無法持久化: %s", user_id, e)
+            self.sessions.delete(f"session:{user_id}")
+    
+    def _end_session(self, user_id: int):
+        """結束會話並清理持久化快照和上傳的暫存檔案"""
+        context = self.user_contexts.pop(user_id, None)
+        if context is not None:
+            context.release_uploads()
+        if self.sessions.persistent:
+            self.sessions.delete(f"session:{user_id}")
+    
+    def _get_user_context(self, user_id: int, update: Update) -> Optional[TelegramClickContext]:
+        """取得用戶上下文，必要時從持久化會話後端恢復"""
+        context = self.user_contexts.get(user_id)
+        if context is not None or not self.sessions.persistent:
+            return context
+        
+        with self.tracer.span("session_restore", user_id=user_id):
+            snapshot = self.sessions.get(f"session:{user_id}")
+        if not snapshot or snapshot.get("command_name") not in self.click_commands:
+            return None
+        
+        context = TelegramClickContext(update, user_id, snapshot["chat_id"])
+        context.command_name = snapshot["command_name"]
+        context.required_params = self._build_parameter_plan(
+            self.click_commands[context.command_name]
+        )
+        context.collected_params = _restore_batch_values(snapshot["collected_params"], context.required_params)
+        context.current_param_index = snapshot["current_param_index"]
+        context.waiting_for_input = snapshot["waiting_for_input"]
+        context.form_message_id = snapshot.get("form_message_id")
+        context.editing_param = snapshot.get("editing_param")
+        context.choice_filter = snapshot.get("choice_filter")
+        self.user_contexts[user_id] = context
+        logger.info("已從會話後端恢復用戶 %s 的會話", user_id)
+        return context
     
     async def _collect_next_parameter(self, user_id: int):
         """收集下一個參數"""
         context = self.user_contexts[user_id]
         required_params = context.required_params
+        context.choice_filter = None
+        # 已有值的參數（深度連結預填）不再詢問
+        while (context.current_param_index < len(required_params)
+               and required_params[context.current_param_index].name in context.collected_params):
+            context.current_param_index += 1
         
         if context.current_param_index >= len(required_params):
             # 參數收集完成
+            if context.form_message_id is not None:
+                await self._show_prompt(user_id, self.renderer.escape("⏳ 執行中…"))
             await self._execute_click_command(user_id)
             return
         
         param = required_params[context.current_param_index]
-        
-        # 根據參數類型生成UI
-        if isinstance(param.type, click.Choice):
-            await self._show_choice_parameter(user_id, param)
-        elif param.type is click.BOOL:
-            await self._show_boolean_parameter(user_id, param)
-        else:
-            await self._show_text_parameter(user_id, param)
+        with self.tracer.span("collect_parameter", param=param.name):
+            self._save_session(user_id)
+            
+            # 根據參數類型生成UI
+            if self.config.optional_summary and not param.required:
+                await self._show_optional_summary(user_id)
+            elif isinstance(param.type, click.Choice) and not accepts_batch(param):
+                await self._show_choice_parameter(user_id, param)
+            elif param.type is click.BOOL:
+                await self._show_boolean_parameter(user_id, param)
+            else:
+                await self._show_text_parameter(user_id, param)
+    
+    def _validate(self, command_name: str, param: click.Parameter, text: str,
+                  params: Dict[str, Any]) -> ConversionResult:
+        """以快取的驗證函數轉換輸入；params 為已收集的參數（參數回調的 ctx.params）"""
+        key = (command_name, param.name)
+        validator = self._validators.get(key)
+        if validator is None:
+            validator = self._validators[key] = compile_validator(param, self.click_commands[command_name])
+        return validator(text, params)
     
-    async def _show_choice_parameter(self, user_id: int, param: click.Parameter):
-        """顯示選擇參數"""
+    def _callback_data(self, context: TelegramClickContext, op: CallbackOp,
+                       param_index: Optional[int] = None, choice_index: int = 0) -> str:
+        """編碼按鈕的回調數據；param_index 預設為正在收集的參數"""
+        if param_index is None:
+            param_index = context.current_param_index
+        return self.callbacks.encode(op, param_index, choice_index, self._callback_scope(context))
+    
+    def _callback_scope(self, context: TelegramClickContext) -> str:
+        """按鈕簽名綁定命令及其指紋，命令重載後舊按鈕失效"""
+        name = context.command_name
+        return f"{name}:{self.command_fingerprints.get(name, '')}"
+    
+    def _optional_param_buttons(self, context: TelegramClickContext,
+                                param: click.Parameter) -> List[List[InlineKeyboardButton]]:
+        """可選參數的「使用默認值」和「跳過」按鈕；默認值與摘要鍵盤一樣取自 get_parameter_default"""
+        keyboard = []
+        default = get_parameter_default(self.click_commands[context.command_name], param)
+        if default is not None:
+            if isinstance(default, bool):
+                default_text = "是" if default else "否"
+            else:
+                default_text = str(default)[:20] + ("..." if len(str(default)) > 20 else "")
+            keyboard.append([InlineKeyboardButton(
+                f"📋 使用默認值 ({default_text})",
+                callback_data=self._callback_data(context, CallbackOp.DEFAULT)
+            )])
+        keyboard.append([InlineKeyboardButton(
+            "⏭️ 跳過", callback_data=self._callback_data(context, CallbackOp.SKIP)
+        )])
+        return keyboard
+    
+    def _choice_keyboard(self, context: TelegramClickContext) -> ChoiceKeyboard:
+        """正在收集的選擇參數的鍵盤（每個命令參數只建立一次）"""
+        key = (context.command_name, context.current_param_index)
+        keyboard = self._choice_keyboards.get(key)
+        if keyboard is None:
+            param = context.required_params[context.current_param_index]
+            keyboard = ChoiceKeyboard(
+                param.type.choices, self.config.choice_page_size, self.config.choice_columns
+            )
+            self._choice_keyboards[key] = keyboard
+        return keyboard
+    
+    async def _show_choice_parameter(self, user_id: int, param: click.Parameter, page: int = 0,
+                                     query=None):
+        """
+        顯示選擇參數
+        
+        選項多於一頁時分頁顯示，翻頁編輯同一則訊息；未篩選的頁面在各用戶間共用快取。
+        """
         context = self.user_contexts[user_id]
+        keyboard = self._choice_keyboard(context)
         
-        keyboard = []
-        for choice in param.type.choices:
-            callback_data = f"param:{param.name}:{choice}"
-            keyboard.append([InlineKeyboardButton(choice, callback_data=callback_data)])
+        def encode(op: CallbackOp, choice_index: int) -> str:
+            return self._callback_data(context, op, choice_index=choice_index)
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        if context.choice_filter:
+            indices = keyboard.prefix_index.search(context.choice_filter)
+            reply_markup = keyboard.build(page, encode, indices, filtered=True)
+        else:
+            page = min(max(page, 0), keyboard.page_count() - 1)
+            key = (context.command_name, context.current_param_index, page)
+            reply_markup = self._choice_pages.get(key)
+            self.cache_stats["choice_keyboard"].record(reply_markup is not None)
+            if reply_markup is None:
+                reply_markup = keyboard.build(page, encode)
+                self._choice_pages[key] = reply_markup
         
         param_desc = param.help or f"選擇 {param.name}"
-        message = f"🔸 **{param.name}**\n{param_desc}\n\n請選擇："
+        message = f"🔸 {self.renderer.bold(param.name)}\n{self.renderer.escape(param_desc)}\n\n"
+        if context.choice_filter:
+            message += self.renderer.escape(f"篩選：{context.choice_filter}…") + "\n"
+        elif self.config.choice_filter and keyboard.page_count() > 1:
+            message += self.renderer.escape("（可輸入文字篩選選項）") + "\n"
+        message += "請選擇："
         
-        await context.update.effective_chat.send_message(
-            message,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
+        await self._show_prompt(user_id, message, reply_markup, query=query)
+    
+    async def _filter_choices(self, update: Update, user_id: int, context: TelegramClickContext,
+                              param: click.Parameter):
+        """選擇參數等待中時輸入的文字：完全符合則接受，否則按前綴篩選鍵盤"""
+        text = update.message.text.strip()
+        with self.tracer.span("validate", param=param.name):
+            result = self._validate(context.command_name, param, text, context.collected_params)
+        if result.success:
+            value = result.data
+        else:
+            matches = self._choice_keyboard(context).prefix_index.search(text)
+            if not matches:
+                await self._send(update.message.reply_text, f"❌ 沒有以「{text}」開頭的選項")
+                return
+            if len(matches) > 1:
+                context.choice_filter = text
+                self._save_session(user_id)
+                await self._show_choice_parameter(user_id, param)
+                return
+            value = list(param.type.choices)[matches[0]]
+        
+        context.collected_params[param.name] = value
+        context.current_param_index += 1
+        await self._confirm_value(update.message.reply_text, f"✅ {param.name} = {value}")
+        await self._collect_next_parameter(user_id)
     
     async def _show_boolean_parameter(self, user_id: int, param: click.Parameter):
         """顯示布林參數"""
         context = self.user_contexts[user_id]
+        yes_no = [
+            InlineKeyboardButton("✅ 是", callback_data=self._callback_data(context, CallbackOp.BOOL, choice_index=1)),
+            InlineKeyboardButton("❌ 否", callback_data=self._callback_data(context, CallbackOp.BOOL, choice_index=0))
+        ]
         
         # 如果是可選參數，提供三選一界面
         if not param.required:
-            keyboard = []
+            keyboard = [yes_no]
             
-            # 是/否選項
-            keyboard.append([
-                InlineKeyboardButton("✅ 是", callback_data=f"param:{param.name}:true"),
-                InlineKeyboardButton("❌ 否", callback_data=f"param:{param.name}:false")
-            ])
-            
-            # 使用默認值按鈕（如果有默認值）
-            if param.default is not None:
-                default_text = "是" if param.default else "否"
-                keyboard.append([InlineKeyboardButton(f"📋 使用默認值 ({default_text})", callback_data=f"default:{param.name}")])
-            
-            # 跳過按鈕
-            keyboard.append([InlineKeyboardButton("⏭️ 跳過", callback_data=f"skip:{param.name}")])
+            # 使用默認值、跳過按鈕
+            keyboard += self._optional_param_buttons(context, param)
             
             param_desc = param.help or f"設置 {param.name}"
-            message = f"🔸 {param.name} (可選)\n{param_desc}\n\n請選擇："
+            message = f"🔸 {self.renderer.bold(param.name)} {self.renderer.escape('(可選)')}\n{self.renderer.escape(param_desc)}\n\n請選擇："
         else:
             # 必需參數，只提供是/否選項
-            keyboard = [
-                [
-                    InlineKeyboardButton("✅ 是", callback_data=f"param:{param.name}:true"),
-                    InlineKeyboardButton("❌ 否", callback_data=f"param:{param.name}:false")
-                ]
-            ]
+            keyboard = [yes_no]
             
             param_desc = param.help or f"設置 {param.name}"
-            message = f"🔸 {param.name} (必需)\n{param_desc}\n\n請選擇："
+            message = f"🔸 {self.renderer.bold(param.name)} {self.renderer.escape('(必需)')}\n{self.renderer.escape(param_desc)}\n\n請選擇："
         
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await context.update.effective_chat.send_message(
-            message,
-            reply_markup=reply_markup
-        )
+        await self._show_prompt(user_id, message, reply_markup)
     
     async def _show_text_parameter(self, user_id: int, param: click.Parameter):
         """顯示文字參數"""
         context = self.user_contexts[user_id]
-        
         param_type_hint = "文字"
         if param.type in (click.INT, click.FLOAT):
             param_type_hint = "數字"
         elif isinstance(param.type, click.File):
-            param_type_hint = "檔案"
+            param_type_hint = "檔案（上傳文件或貼上內容）" if accepts_upload(param) else "檔案"
+        elif accepts_upload(param):
+            param_type_hint = "路徑（或上傳文件）"
+        if accepts_batch(param):
+            param_type_hint += f"（{BATCH_HINT}）"
         
         param_desc = param.help or f"請輸入 {param.name}"
         
@@ -302,181 +1099,972 @@ class ClickToTelegramConverter:
             keyboard = []
             
             # 輸入自定義值按鈕
-            keyboard.append([InlineKeyboardButton("✏️ 輸入自定義值", callback_data=f"input:{param.name}")])
-            
-            # 使用默認值按鈕（如果有默認值）
-            if param.default is not None:
-                default_text = str(param.default)[:20] + ("..." if len(str(param.default)) > 20 else "")
-                keyboard.append([InlineKeyboardButton(f"📋 使用默認值 ({default_text})", callback_data=f"default:{param.name}")])
+            keyboard.append([InlineKeyboardButton(
+                "✏️ 輸入自定義值", callback_data=self._callback_data(context, CallbackOp.INPUT)
+            )])
             
-            # 跳過按鈕
-            keyboard.append([InlineKeyboardButton("⏭️ 跳過", callback_data=f"skip:{param.name}")])
+            # 使用默認值、跳過按鈕
+            keyboard += self._optional_param_buttons(context, param)
             
             reply_markup = InlineKeyboardMarkup(keyboard)
-            message = f"🔸 **{param.name}** (可選)\n{param_desc}\n\n請選擇："
+            message = f"🔸 {self.renderer.bold(param.name)} {self.renderer.escape('(可選)')}\n{self.renderer.escape(param_desc)}\n\n請選擇："
             
-            await context.update.effective_chat.send_message(
-                message,
-                reply_markup=reply_markup,
-                parse_mode=ParseMode.MARKDOWN
-            )
+            await self._show_prompt(user_id, message, reply_markup)
         else:
             # 必需參數，直接要求輸入
-            message = f"🔸 **{param.name}** (必需)\n{param_desc}\n\n請輸入{param_type_hint}："
-            await context.update.effective_chat.send_message(
+            message = f"🔸 {self.renderer.bold(param.name)} {self.renderer.escape('(必需)')}\n{self.renderer.escape(param_desc)}\n\n請輸入{param_type_hint}："
+            await self._show_prompt(user_id, message)
+    
+    async def _show_prompt(self, user_id: int, message: str, reply_markup=None, query=None):
+        """
+        顯示參數提示
+        
+        經典模式每個提示發送一則新訊息（給出 query 時改為編輯按鈕所在的訊息）；
+        表單模式（form_mode）第一個提示發送表單訊息，之後以 edit_message_text
+        把已收集的值和新提示更新到同一則訊息。
+        """
+        context = self.user_contexts[user_id]
+        if not self.config.form_mode:
+            if query is not None:
+                await self._edit_prompt(query.edit_message_text, message, reply_markup=reply_markup)
+                return
+            await self._send(
+                context.update.effective_chat.send_message,
                 message,
-                parse_mode=ParseMode.MARKDOWN
+                reply_markup=reply_markup,
+                parse_mode=self.renderer.parse_mode
             )
-    
-    async def _handle_callback(self, update: Update, context):
-        """處理按鈕回調"""
-        query = update.callback_query
-        await query.answer()
+            return
         
-        if (query.data.startswith("param:") or 
-            query.data.startswith("input:") or 
-            query.data.startswith("default:") or 
-            query.data.startswith("skip:")):
-            await self._handle_parameter_callback(query)
+        text = self._render_form(context, message)
+        if context.form_message_id is None:
+            sent = await self._send(
+                context.update.effective_chat.send_message,
+                text,
+                reply_markup=reply_markup,
+                parse_mode=self.renderer.parse_mode
+            )
+            context.form_message_id = sent.message_id
+            self._save_session(user_id)
+            return
+        
+        await self._edit_prompt(
+            context.update.get_bot().edit_message_text,
+            text,
+            chat_id=context.chat_id,
+            message_id=context.form_message_id,
+            reply_markup=reply_markup
+        )
     
-    async def _handle_parameter_callback(self, query):
-        """處理參數按鈕回調"""
-        user_id = query.from_user.id
+    async def _edit_prompt(self, call, text: str, **kwargs):
+        """編輯提示訊息"""
+        try:
+            await self._send(call, text, parse_mode=self.renderer.parse_mode, **kwargs)
+        except BadRequest as e:
+            # 內容沒有變化（例如重複按下同一個按鈕）時Telegram拒絕編輯，可以忽略
+            if "not modified" not in str(e).lower():
+                raise
+    
+    def _optional_params(self, context: TelegramClickContext) -> List[click.Parameter]:
+        """參數計劃中的可選參數"""
+        return [param for param in context.required_params if not param.required]
+    
+    async def _show_optional_summary(self, user_id: int, query=None):
+        """
+        顯示可選參數摘要鍵盤
         
-        if user_id not in self.user_contexts:
-            await query.edit_message_text("❌ 會話已過期，請重新開始")
+        每個可選參數一個按鈕並顯示當前值：布林參數就地切換、選擇參數就地輪換、
+        其他參數點擊後輸入；按「執行」以當前的值執行命令。
+        """
+        context = self.user_contexts[user_id]
+        command = self.click_commands[context.command_name]
+        hidden = self._hidden_param_names(context.command_name)
+        
+        keyboard = []
+        for index, param in enumerate(context.required_params):
+            if param.required:
+                continue
+            if param.name not in context.collected_params:
+                context.collected_params[param.name] = get_parameter_default(command, param)
+            value = context.collected_params[param.name]
+            
+            if isinstance(param.type, click.types.BoolParamType) and not accepts_batch(param):
+                label = f"{'☑️' if value else '⬜'} {param.name}"
+                op = CallbackOp.TOGGLE
+            elif isinstance(param.type, click.Choice) and not accepts_batch(param):
+                label = f"🔁 {param.name}: {'—' if value is None else value}"
+                op = CallbackOp.CYCLE
+            else:
+                if value is None or value == ():
+                    shown = "—"
+                elif param.name in hidden:
+                    shown = "***"
+                else:
+                    shown = truncate_text(self._format_value(value), 20)
+                label = f"✏️ {param.name}: {shown}"
+                op = CallbackOp.EDIT
+            keyboard.append([InlineKeyboardButton(
+                label, callback_data=self._callback_data(context, op, index)
+            )])
+        keyboard.append([InlineKeyboardButton(
+            "▶️ 執行", callback_data=self._callback_data(context, CallbackOp.RUN)
+        )])
+        
+        message = (
+            f"⚙️ {self.renderer.bold('可選參數')}\n"
+            f"{self.renderer.escape('點擊按鈕修改，完成後按「執行」：')}"
+        )
+        self._save_session(user_id)
+        await self._show_prompt(user_id, message, InlineKeyboardMarkup(keyboard), query=query)
+    
+    async def _handle_summary_callback(self, query, user_id: int, context: TelegramClickContext,
+                                       token: CallbackToken):
+        """處理可選參數摘要鍵盤的按鈕"""
+        if token.op == CallbackOp.RUN:
+            context.current_param_index = len(context.required_params)
+            context.editing_param = None
+            context.waiting_for_input = False
+            await self._confirm_value(query.edit_message_text, f"▶️ 執行 /{context.command_name}")
+            await self._collect_next_parameter(user_id)
             return
         
-        context = self.user_contexts[user_id]
-        callback_data = query.data
+        param = context.required_params[token.param_index]
+        if param.required:
+            await self._reject_callback(query)
+            return
         
-        if callback_data.startswith("input:"):
-            # 用戶選擇輸入自定義值
-            param_name = callback_data.split(":", 1)[1]
-            await query.edit_message_text(f"✏️ 請輸入 {param_name} 的值：")
-            # 設置狀態等待用戶輸入
+        value = context.collected_params.get(param.name)
+        if token.op == CallbackOp.TOGGLE:
+            context.collected_params[param.name] = not value
+        elif token.op == CallbackOp.CYCLE:
+            options = list(param.type.choices)
+            command = self.click_commands[context.command_name]
+            if get_parameter_default(command, param) is None:
+                options.append(None)  # 沒有默認值時可以輪換回未設置
+            position = options.index(value) if value in options else -1
+            context.collected_params[param.name] = options[(position + 1) % len(options)]
+        else:
+            context.editing_param = param.name
             context.waiting_for_input = True
+            self._save_session(user_id)
+            prompt = f"✏️ 請輸入 {param.name} 的值"
+            if accepts_batch(param):
+                prompt += f"（{BATCH_HINT}）"
+            await self._show_prompt(user_id, self.renderer.escape(prompt + "："), query=query)
+            return
+        
+        await self._show_optional_summary(user_id, query=query)
+    
+    @staticmethod
+    def _format_value(value: Any) -> str:
+        """參數值的顯示文字：多值以逗號連接，檔案顯示為📎"""
+        if hasattr(value, "read"):
+            return "📎"
+        if isinstance(value, (tuple, list)):
+            return ", ".join(map(str, value))
+        return str(value)
+    
+    def _render_form(self, context: TelegramClickContext, prompt: str) -> str:
+        """表單訊息：命令、已收集的值和當前提示"""
+        render = self.renderer
+        hidden = self._hidden_param_names(context.command_name)
+        lines = [f"📝 {render.bold('/' + context.command_name)}"]
+        for param in context.required_params[:context.current_param_index]:
+            value = context.collected_params.get(param.name)
+            if value is None:
+                lines.append(render.escape(f"⏭️ {param.name}"))
+            else:
+                shown = "***" if param.name in hidden else self._format_value(value)
+                lines.append(render.escape(f"✅ {param.name} = {shown}"))
+        return "\n".join(lines) + "\n\n" + prompt
+    
+    async def _confirm_value(self, call, text: str):
+        """經典模式下確認已收到的值；表單模式下由下一次表單更新顯示"""
+        if not self.config.form_mode:
+            await self._send(call, text)
+    
+    async def _handle_callback(self, update: Update, context):
+        """處理按鈕回調：驗證token後按操作碼查表分派"""
+        query = update.callback_query
+        with self.tracer.span("handle_callback", user_id=query.from_user.id):
+            user_id = query.from_user.id
+            peeked = CallbackCodec.peek(query.data or "")
+            if peeked is not None and peeked.op == CallbackOp.RERUN:
+                await self._handle_rerun_callback(update, query)
+                return
             
-        elif callback_data.startswith("default:"):
-            # 用戶選擇使用默認值
-            param_name = callback_data.split(":", 1)[1]
-            param = context.required_params[context.current_param_index]
-            context.collected_params[param_name] = param.default
-            context.current_param_index += 1
-            await query.edit_message_text(f"📋 {param_name} = {param.default} (默認值)")
-            await self._collect_next_parameter(user_id)
+            await self._send(query.answer)
+            user_context = self._get_user_context(user_id, update)
+            if user_context is None:
+                await self._send(query.edit_message_text, "❌ 會話已過期，請重新開始")
+                return
             
-        elif callback_data.startswith("skip:"):
-            # 用戶選擇跳過
-            param_name = callback_data.split(":", 1)[1]
-            context.collected_params[param_name] = None
-            context.current_param_index += 1
-            await query.edit_message_text(f"⏭️ 跳過 {param_name}")
-            await self._collect_next_parameter(user_id)
+            token = self.callbacks.decode(query.data or "", self._callback_scope(user_context))
+            handler = self._callback_handlers.get(token.op) if token is not None else None
+            if handler is None or token.param_index >= len(user_context.required_params):
+                await self._reject_callback(query)
+                return
+            await handler(query, user_id, user_context, token)
+    
+    async def _reject_callback(self, query):
+        """過期或偽造的按鈕"""
+        logger.debug("拒絕回調數據: %r", query.data)
+        await self._send(query.edit_message_text, "❌ 按鈕已過期，請重新開始")
+    
+    async def _take_current_param(self, query, context: TelegramClickContext,
+                                  token: CallbackToken) -> Optional[click.Parameter]:
+        """按鈕必須屬於正在收集的參數，否則是舊訊息上的按鈕"""
+        if token.param_index != context.current_param_index:
+            await self._reject_callback(query)
+            return None
+        return context.required_params[token.param_index]
+    
+    async def _on_choice_callback(self, query, user_id: int, context: TelegramClickContext,
+                                  token: CallbackToken):
+        """選擇參數的選項"""
+        param = await self._take_current_param(query, context, token)
+        if param is None:
+            return
+        choices = list(getattr(param.type, "choices", ()))
+        if token.choice_index >= len(choices):
+            await self._reject_callback(query)
+            return
+        await self._accept_value(query, user_id, context, param, choices[token.choice_index])
+    
+    async def _on_page_callback(self, query, user_id: int, context: TelegramClickContext,
+                                token: CallbackToken):
+        """選擇參數翻頁"""
+        param = await self._take_current_param(query, context, token)
+        if param is not None:
+            await self._show_choice_parameter(user_id, param, page=token.choice_index, query=query)
+    
+    async def _on_clear_filter_callback(self, query, user_id: int, context: TelegramClickContext,
+                                        token: CallbackToken):
+        """清除選擇參數的篩選"""
+        param = await self._take_current_param(query, context, token)
+        if param is not None:
+            context.choice_filter = None
+            self._save_session(user_id)
+            await self._show_choice_parameter(user_id, param, query=query)
+    
+    async def _on_bool_callback(self, query, user_id: int, context: TelegramClickContext,
+                                token: CallbackToken):
+        """布林參數的是/否"""
+        param = await self._take_current_param(query, context, token)
+        if param is not None:
+            await self._accept_value(query, user_id, context, param, bool(token.choice_index))
+    
+    async def _accept_value(self, query, user_id: int, context: TelegramClickContext,
+                            param: click.Parameter, value: Any):
+        context.collected_params[param.name] = value
+        context.current_param_index += 1
+        await self._confirm_value(query.edit_message_text, f"✅ {param.name} = {value}")
+        await self._collect_next_parameter(user_id)
+    
+    async def _on_input_callback(self, query, user_id: int, context: TelegramClickContext,
+                                 token: CallbackToken):
+        """用戶選擇輸入自定義值"""
+        param = await self._take_current_param(query, context, token)
+        if param is None:
+            return
+        # 設置狀態等待用戶輸入
+        context.waiting_for_input = True
+        prompt = f"✏️ 請輸入 {param.name} 的值"
+        if accepts_batch(param):
+            prompt += f"（{BATCH_HINT}）"
+        if self.config.form_mode:
+            await self._show_prompt(user_id, self.renderer.escape(prompt + "："))
+        else:
+            await self._send(query.edit_message_text, prompt + "：")
+        self._save_session(user_id)
+    
+    async def _on_default_callback(self, query, user_id: int, context: TelegramClickContext,
+                                   token: CallbackToken):
+        """用戶選擇使用默認值"""
+        param = await self._take_current_param(query, context, token)
+        if param is None:
+            return
+        default = get_parameter_default(self.click_commands[context.command_name], param)
+        context.collected_params[param.name] = default
+        context.current_param_index += 1
+        await self._confirm_value(query.edit_message_text, f"📋 {param.name} = {default} (默認值)")
+        await self._collect_next_parameter(user_id)
+    
+    async def _on_skip_callback(self, query, user_id: int, context: TelegramClickContext,
+                                token: CallbackToken):
+        """用戶選擇跳過"""
+        param = await self._take_current_param(query, context, token)
+        if param is None:
+            return
+        context.collected_params[param.name] = None
+        context.current_param_index += 1
+        await self._confirm_value(query.edit_message_text, f"⏭️ 跳過 {param.name}")
+        await self._collect_next_parameter(user_id)
+    
+    async def _handle_text(self, update: Update, context):
+        """處理文字輸入"""
+        with self.tracer.span("handle_text", user_id=update.effective_user.id):
+            user_id = update.effective_user.id
+            user_context = self._get_user_context(user_id, update)
             
-        elif callback_data.startswith("param:"):
-            # 處理原有的選擇和布林參數回調
-            try:
-                _, param_name, value = callback_data.split(":", 2)
-            except ValueError:
-                await query.edit_message_text("❌ 無效的回調數據")
+            if user_context is None:
+                return
+            
+            if user_context.bulk:
+                await self._send(update.message.reply_text, "📄 請上傳 CSV 或 JSONL 文件")
                 return
             
-            # 轉換值
-            if value == "true":
-                value = True
-            elif value == "false":
-                value = False
+            if user_context.editing_param is not None:
+                await self._handle_summary_input(update, user_id, user_context)
+                return
             
-            context.collected_params[param_name] = value
-            context.current_param_index += 1
+            required_params = user_context.required_params
             
-            await query.edit_message_text(f"✅ {param_name} = {value}")
-            await self._collect_next_parameter(user_id)
+            if user_context.current_param_index < len(required_params):
+                param = required_params[user_context.current_param_index]
+                
+                if (self.config.choice_filter and isinstance(param.type, click.Choice)
+                        and not accepts_batch(param) and not user_context.waiting_for_input
+                        and (param.required or not self.config.optional_summary)):
+                    await self._filter_choices(update, user_id, user_context, param)
+                    return
+                
+                # 檢查是否正在等待輸入（可選參數選擇了輸入自定義值）
+                if user_context.waiting_for_input:
+                    # 驗證和轉換輸入
+                    with self.tracer.span("validate", param=param.name):
+                        result = self._validate(
+                            user_context.command_name, param, update.message.text, user_context.collected_params
+                        )
+                    
+                    if result.success:
+                        user_context.collected_params[param.name] = result.data
+                        user_context.current_param_index += 1
+                        user_context.waiting_for_input = False
+                        
+                        await self._confirm_value(update.message.reply_text, f"✅ {param.name} = {self._format_value(result.data)}")
+                        await self._collect_next_parameter(user_id)
+                    else:
+                        await self._send(update.message.reply_text, f"❌ {result.message}")
+                elif param.required:
+                    # 必需參數的直接輸入
+                    with self.tracer.span("validate", param=param.name):
+                        result = self._validate(
+                            user_context.command_name, param, update.message.text, user_context.collected_params
+                        )
+                    
+                    if result.success:
+                        user_context.collected_params[param.name] = result.data
+                        user_context.current_param_index += 1
+                        
+                        await self._confirm_value(update.message.reply_text, f"✅ {param.name} = {self._format_value(result.data)}")
+                        await self._collect_next_parameter(user_id)
+                    else:
+                        await self._send(update.message.reply_text, f"❌ {result.message}")
     
-    async def _handle_text(self, update: Update, context):
-        """處理文字輸入"""
+    async def _handle_document(self, update: Update, context):
+        """處理上傳的文件：交給正在收集的 click.File / click.Path 參數"""
         user_id = update.effective_user.id
+        user_context = self._get_user_context(user_id, update)
+        if user_context is None:
+            return
         
-        if user_id not in self.user_contexts:
+        if user_context.bulk:
+            await self._handle_bulk_upload(update, user_context)
             return
         
-        user_context = self.user_contexts[user_id]
-        required_params = user_context.required_params
+        if user_context.editing_param is not None:
+            param = next((p for p in self._optional_params(user_context)
+                          if p.name == user_context.editing_param), None)
+        elif user_context.current_param_index < len(user_context.required_params):
+            param = user_context.required_params[user_context.current_param_index]
+        else:
+            param = None
+        if param is None or accepts_batch(param) or not accepts_upload(param):
+            await self._send(update.message.reply_text, "❌ 目前的參數不接受文件")
+            return
         
-        if user_context.current_param_index < len(required_params):
-            param = required_params[user_context.current_param_index]
-            
-            # 檢查是否正在等待輸入（可選參數選擇了輸入自定義值）
-            if user_context.waiting_for_input:
-                # 驗證和轉換輸入
-                result = validate_and_convert_parameter_value(update.message.text, param)
-                
-                if result.success:
-                    user_context.collected_params[param.name] = result.data
-                    user_context.current_param_index += 1
-                    user_context.waiting_for_input = False
-                    
-                    await update.message.reply_text(f"✅ {param.name} = {result.data}")
-                    await self._collect_next_parameter(user_id)
-                else:
-                    await update.message.reply_text(f"❌ {result.message}")
-            elif param.required:
-                # 必需參數的直接輸入
-                result = validate_and_convert_parameter_value(update.message.text, param)
-                
-                if result.success:
-                    user_context.collected_params[param.name] = result.data
-                    user_context.current_param_index += 1
-                    
-                    await update.message.reply_text(f"✅ {param.name} = {result.data}")
-                    await self._collect_next_parameter(user_id)
-                else:
-                    await update.message.reply_text(f"❌ {result.message}")
+        document = update.message.document
+        limit = min(self.config.max_upload_bytes, BOT_API_DOWNLOAD_LIMIT)
+        if document.file_size and document.file_size > limit:
+            await self._send(update.message.reply_text, f"❌ 文件過大（上限 {format_bytes(limit)}）")
+            return
+        
+        file_name = document.file_name or "upload"
+        with self.tracer.span("upload", param=param.name):
+            try:
+                telegram_file = await self._send(update.get_bot().get_file, document.file_id)
+                value, resource = await receive_upload(
+                    telegram_file, param, file_name, limit, self.config.upload_spool_bytes
+                )
+            except UploadTooLarge:
+                await self._send(update.message.reply_text, f"❌ 文件過大（上限 {format_bytes(limit)}）")
+                return
+            except click.BadParameter as e:
+                await self._send(update.message.reply_text, f"❌ {e.message}")
+                return
+            except Exception as e:
+                logger.warning("下載用戶 %s 上傳的文件失敗: %s", user_id, e)
+                await self._send(update.message.reply_text, "❌ 文件下載失敗，請重試")
+                return
+        
+        user_context.uploads.append(resource)
+        user_context.collected_params[param.name] = value
+        user_context.waiting_for_input = False
+        if user_context.editing_param is not None:
+            user_context.editing_param = None
+            await self._show_optional_summary(user_id)
+            return
+        
+        user_context.current_param_index += 1
+        await self._confirm_value(update.message.reply_text, f"✅ {param.name} = 📎 {file_name}")
+        await self._collect_next_parameter(user_id)
+    
+    async def _handle_summary_input(self, update: Update, user_id: int, context: TelegramClickContext):
+        """可選參數摘要中輸入的值；成功後回到摘要鍵盤"""
+        param = next(
+            (p for p in self._optional_params(context) if p.name == context.editing_param), None
+        )
+        if param is None:
+            context.editing_param = None
+            context.waiting_for_input = False
+            return
+        
+        with self.tracer.span("validate", param=param.name):
+            result = self._validate(context.command_name, param, update.message.text, context.collected_params)
+        if not result.success:
+            await self._send(update.message.reply_text, f"❌ {result.message}")
+            return
+        
+        context.collected_params[param.name] = result.data
+        context.editing_param = None
+        context.waiting_for_input = False
+        await self._show_optional_summary(user_id)
     
     async def _execute_click_command(self, user_id: int):
         """執行Click命令"""
         context = self.user_contexts[user_id]
         command = self.click_commands[context.command_name]
         
-        logger.info(f"執行命令 {context.command_name}，參數: {context.collected_params}")
+        logger.info("執行命令 %s，參數: %s", context.command_name, context.collected_params)
         
-        # 調用命令函數
-        result = await safe_call_function(command.callback, context.collected_params)
+        if self.metrics.enabled:
+            self._m_invocations.labels(context.command_name).inc()
+            self._m_collection.labels(context.command_name).observe(
+                time.monotonic() - context.started_at
+            )
         
-        if result.success:
-            output_msg = format_output_message(result.data, self.config.max_message_length)
-            await context.update.effective_chat.send_message(
-                output_msg, 
-                parse_mode=ParseMode.MARKDOWN
+        with self.tracer.span("execute", command=context.command_name):
+            callback = command.callback
+            profiler = self._take_profile_request(user_id, context.command_name)
+            if profiler is not None:
+                callback = profiler.wrap(callback)
+            
+            # 調用命令函數
+            with self.tracer.span("executor") as span:
+                result = await self.executor.run(callback, context.collected_params)
+                span.set_attribute("queue_wait_ms", result.queue_wait * 1000)
+                span.set_attribute("callback_ms", result.elapsed * 1000)
+                span.set_attribute("success", result.success)
+            
+            self._observe_execution(context.command_name, result)
+            
+            if self.audit is not None:
+                self._audit_execution(context, result)
+            
+            rerun_markup = self._record_history(context)
+            if result.success:
+                with self.tracer.span("format_output"):
+                    output_msg = format_output_message(result.data, self.config.max_message_length, self.renderer)
+                await self._send(
+                    context.update.effective_chat.send_message,
+                    output_msg, 
+                    parse_mode=self.renderer.parse_mode,
+                    reply_markup=rerun_markup
+                )
+                logger.info("命令 %s 執行成功", context.command_name)
+            else:
+                await self._send(context.update.effective_chat.send_message, result.message,
+                                 reply_markup=rerun_markup)
+                logger.error("命令 %s 執行失敗: %s", context.command_name, result.error)
+            
+            if profiler is not None:
+                await self._send_profile(context, profiler)
+            
+            # 清理上下文
+            self._end_session(user_id)
+    
+    def _observe_execution(self, command_name: str, result: ConversionResult):
+        """記錄一次命令執行的耗時、排隊時間和失敗次數"""
+        if not self.metrics.enabled:
+            return
+        self._m_duration.labels(command_name).observe(result.elapsed)
+        self._m_queue_wait.observe(result.queue_wait)
+        if not result.success:
+            self._m_errors.labels(command_name).inc()
+    
+    def _record_history(self, context: TelegramClickContext) -> Optional[InlineKeyboardMarkup]:
+        """記錄到最近執行歷史，返回結果訊息上的重新執行按鈕；含隱藏輸入的參數不記錄"""
+        if context.uploads or not self._hidden_param_names(context.command_name).isdisjoint(
+                context.collected_params):
+            return None
+        entry_id = self.history.record(
+            context.user_id, context.command_name, context.collected_params,
+            self.command_fingerprints.get(context.command_name, "")
+        )
+        if entry_id is None:
+            return None
+        return InlineKeyboardMarkup([[InlineKeyboardButton(
+            "🔁 重新執行", callback_data=self._rerun_callback_data(context.user_id, entry_id)
+        )]])
+    
+    def _rerun_callback_data(self, user_id: int, entry_id: int) -> str:
+        """重新執行按鈕綁定用戶：記錄屬於個人，其他人轉發的按鈕無效"""
+        return self.callbacks.encode(CallbackOp.RERUN, 0, entry_id, f"history:{user_id}")
+    
+    def _history_label(self, entry: Dict) -> str:
+        """最近執行記錄的按鈕文字"""
+        args = " ".join(f"{name}={value}" for name, value in entry["params"].items() if value is not None)
+        label = f"/{self._normalize_command_name(entry['command'])} {args}".rstrip()
+        return truncate_text(label, 60)
+    
+    async def _handle_recent(self, update: Update, context):
+        """處理/recent命令：列出最近執行的命令，點擊即以相同參數重新執行"""
+        user_id = update.effective_user.id
+        
+        if not is_user_authorized(user_id, self.config.admin_users):
+            await self._send(update.message.reply_text, "❌ 您沒有使用此機器人的權限")
+            return
+        
+        entries = [entry for entry in self.history.entries(user_id) if entry["command"] in self.click_commands]
+        if not entries:
+            await self._send(update.message.reply_text, "📭 沒有最近執行的命令")
+            return
+        
+        keyboard = [
+            [InlineKeyboardButton(f"🔁 {self._history_label(entry)}",
+                                  callback_data=self._rerun_callback_data(user_id, entry["id"]))]
+            for entry in entries
+        ]
+        await self._send(update.message.reply_text, "🕘 最近執行的命令：",
+                         reply_markup=InlineKeyboardMarkup(keyboard))
+    
+    async def _handle_rerun_callback(self, update: Update, query):
+        """
+        以歷史記錄中的參數直接執行命令，不經過參數收集
+        
+        無法執行時以提示框回答回調：按鈕所在的舊訊息可能已無法存取（query.message 為None
+        或 is_accessible 為False），不能回覆到該訊息。
+        """
+        user_id = query.from_user.id
+        token = self.callbacks.decode(query.data, f"history:{user_id}")
+        entry = self.history.get(user_id, token.choice_index) if token is not None else None
+        if entry is None or not is_user_authorized(user_id, self.config.admin_users):
+            await self._send(query.answer, "❌ 此記錄已過期", show_alert=True)
+            return
+        
+        name = entry["command"]
+        if name not in self.click_commands or entry.get("fingerprint") != self.command_fingerprints.get(name):
+            await self._send(
+                query.answer, f"⚠️ 命令 /{self._normalize_command_name(name)} 已更新，請重新開始", show_alert=True
+            )
+            return
+        
+        if query.message is None or not getattr(query.message, "is_accessible", True):
+            await self._send(query.answer, "❌ 原訊息已無法存取，請使用 /recent 重新執行", show_alert=True)
+            return
+        
+        await self._send(query.answer)
+        self._end_session(user_id)
+        rerun = TelegramClickContext(update, user_id, update.effective_chat.id)
+        rerun.command_name = name
+        rerun.required_params = self._build_parameter_plan(self.click_commands[name])
+        rerun.collected_params = _restore_batch_values(entry["params"], rerun.required_params)
+        rerun.current_param_index = len(rerun.required_params)
+        self.user_contexts[user_id] = rerun
+        logger.info("用戶 %s 重新執行命令: %s", user_id, name)
+        await self._execute_click_command(user_id)
+    
+    async def _handle_bulk(self, update: Update, context):
+        """處理/bulk命令：/bulk <命令>，之後上傳的 CSV 或 JSONL 文件每行執行一次命令（僅限管理員）"""
+        user_id = update.effective_user.id
+        
+        if not is_user_admin(user_id, self.config.admin_users):
+            await self._send(update.message.reply_text, "❌ 此命令僅限管理員使用")
+            return
+        
+        if not context.args:
+            await self._send(update.message.reply_text, "用法: /bulk <命令>，然後上傳 CSV 或 JSONL 文件")
+            return
+        
+        name = context.args[0].lstrip("/")
+        name = self.command_name_mapping.get(name, name)
+        command = self.click_commands.get(name)
+        if command is None:
+            await self._send(update.message.reply_text, "❌ 未知命令")
+            return
+        
+        self._end_session(user_id)
+        bulk = TelegramClickContext(update, user_id, update.effective_chat.id)
+        bulk.command_name = name
+        bulk.bulk = True
+        self.user_contexts[user_id] = bulk
+        
+        columns = ", ".join(
+            f"{param.name}（必需）" if param.required else param.name
+            for param in self._build_parameter_plan(command)
+        )
+        await self._send(
+            update.message.reply_text,
+            f"📄 請上傳 CSV 或 JSONL 文件，每行執行一次 /{self._normalize_command_name(name)}\n"
+            f"欄位：{columns or '（無）'}\n最多 {self.config.bulk_max_rows} 行"
+        )
+    
+    async def _handle_bulk_upload(self, update: Update, context: TelegramClickContext):
+        """下載並解析批量文件；文件有誤時保留會話，可以修正後重新上傳"""
+        document = update.message.document
+        limit = min(self.config.max_upload_bytes, BOT_API_DOWNLOAD_LIMIT)
+        if document.file_size and document.file_size > limit:
+            await self._send(update.message.reply_text, f"❌ 文件過大（上限 {format_bytes(limit)}）")
+            return
+        
+        try:
+            telegram_file = await self._send(update.get_bot().get_file, document.file_id)
+            content = bytes(await telegram_file.download_as_bytearray())
+        except Exception as e:
+            logger.warning("下載用戶 %s 的批量文件失敗: %s", context.user_id, e)
+            await self._send(update.message.reply_text, "❌ 文件下載失敗，請重試")
+            return
+        if len(content) > limit:
+            await self._send(update.message.reply_text, f"❌ 文件過大（上限 {format_bytes(limit)}）")
+            return
+        
+        plan = self._build_parameter_plan(self.click_commands[context.command_name])
+        try:
+            rows = parse_rows(content, document.file_name or "", self.config.bulk_max_rows)
+            unknown = unknown_columns(rows, [param.name for param in plan])
+            if unknown:
+                raise BulkFileError(f"未知的欄位: {', '.join(unknown)}")
+        except BulkFileError as e:
+            await self._send(update.message.reply_text, f"❌ {e}")
+            return
+        
+        self._end_session(context.user_id)
+        # 在背景執行，批量執行期間Bot仍然回應其他更新
+        task = asyncio.create_task(self._run_bulk(update, context, plan, rows))
+        self._bulk_tasks.add(task)
+        task.add_done_callback(self._on_bulk_done)
+    
+    def _on_bulk_done(self, task: asyncio.Task):
+        self._bulk_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("批量執行失敗", exc_info=task.exception())
+    
+    def _convert_text_params(self, command_name: str, plan: List[click.Parameter],
+                             values: Dict[str, str]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        以參數計劃轉換按名稱給出的文字值（批量文件的一行、排程的參數）
+        
+        沒有給出的可選參數使用默認值；返回 (參數, 錯誤訊息列表)。
+        """
+        command = self.click_commands[command_name]
+        params: Dict[str, Any] = {}
+        errors = []
+        for param in plan:
+            text = values.get(param.name)
+            if text is None:
+                if param.required:
+                    errors.append(f"{param.name}：缺少必需參數")
+                else:
+                    params[param.name] = get_parameter_default(command, param)
+                continue
+            result = self._validate(command_name, param, text, params)
+            if result.success:
+                params[param.name] = result.data
+            else:
+                errors.append(f"{param.name}：{result.message}")
+        return params, errors
+    
+    async def _run_bulk(self, update: Update, context: TelegramClickContext,
+                        plan: List[click.Parameter], rows: List[BulkRow]):
+        """
+        驗證並執行批量文件的每一行，回覆一則摘要和結果CSV
+        
+        驗證失敗的行不執行；其餘的行經由執行器並發執行，同時執行的行數不超過 bulk_concurrency。
+        同步回調在執行緒池中執行（inline 執行器時使用 offload_pool），各行真正並行且不阻塞事件循環。
+        """
+        name = context.command_name
+        command = self.click_commands[name]
+        started = time.perf_counter()
+        
+        with self.tracer.span("bulk", command=name, rows=len(rows)):
+            with self.tracer.span("validate"):
+                for row in rows:
+                    row.params, errors = self._convert_text_params(name, plan, row.values)
+                    if errors:
+                        row.error = "；".join(errors)
+            valid = [row for row in rows if row.error is None]
+            await self._send(update.message.reply_text, f"⏳ 正在執行 {len(valid)} 行（共 {len(rows)} 行）…")
+            logger.info("用戶 %s 批量執行命令 %s: %s 行", context.user_id, name, len(valid))
+            
+            concurrency = max(1, self.config.bulk_concurrency)
+            semaphore = asyncio.Semaphore(concurrency)
+            pool = self.executor.offload_pool(concurrency)
+            
+            async def run_row(row: BulkRow):
+                async with semaphore:
+                    with self.tracer.span("executor", line=row.line):
+                        row.result = await self.executor.run(command.callback, row.params, pool)
+                if self.metrics.enabled:
+                    self._m_invocations.labels(name).inc()
+                self._observe_execution(name, row.result)
+                if self.audit is not None:
+                    self._audit_execution(context, row.result, row.params)
+            
+            await asyncio.gather(*(run_row(row) for row in valid))
+        
+        failed = [row for row in rows if not row.success]
+        invalid = sum(1 for row in failed if row.error is not None)
+        lines = [
+            f"📊 /{self._normalize_command_name(name)} 批量執行完成（耗時 "
+            f"{format_duration(time.perf_counter() - started)}）",
+            f"✅ 成功 {len(rows) - len(failed)}",
+            f"❌ 執行失敗 {len(failed) - invalid}",
+            f"⚠️ 驗證失敗 {invalid}",
+        ]
+        for row in failed[:5]:
+            error = row.error if row.error is not None else row.result.message
+            lines.append(truncate_text(f"第 {row.line} 行：{error}", 200))
+        if len(failed) > 5:
+            lines.append(f"…其餘 {len(failed) - 5} 行見結果文件")
+        await self._send(
+            update.effective_chat.send_message,
+            truncate_text("\n".join(lines), self.config.max_message_length)
+        )
+        
+        hidden = self._hidden_param_names(name)
+        await self._send(
+            update.effective_chat.send_document,
+            results_csv(rows, [param.name for param in plan], hidden),
+            filename=f"{name}-results.csv"
+        )
+    
+    async def _handle_schedule(self, update: Update, context):
+        """處理/schedule命令：/schedule <命令> every <間隔> [catchup|skip] [參數=值 ...]"""
+        user_id = update.effective_user.id
+        
+        if not is_user_admin(user_id, self.config.admin_users):
+            await self._send(update.message.reply_text, "❌ 此命令僅限管理員使用")
+            return
+        
+        usage = "用法: /schedule <命令> every <間隔> [catchup|skip] [參數=值 ...]\n例如: /schedule healthcheck every 5m url=https://example.com"
+        try:
+            args = shlex.split(update.message.text)[1:]
+        except ValueError as e:
+            await self._send(update.message.reply_text, f"❌ {e}")
+            return
+        if len(args) < 3 or args[1].lower() != "every":
+            await self._send(update.message.reply_text, usage)
+            return
+        
+        name = args[0].lstrip("/")
+        name = self.command_name_mapping.get(name, name)
+        if name not in self.click_commands:
+            await self._send(update.message.reply_text, "❌ 未知命令")
+            return
+        try:
+            interval = parse_interval(args[2])
+        except ValueError as e:
+            await self._send(update.message.reply_text, f"❌ {e}")
+            return
+        if interval < self.config.schedule_min_interval:
+            await self._send(
+                update.message.reply_text,
+                f"❌ 間隔不能小於 {format_interval(self.config.schedule_min_interval)}"
+            )
+            return
+        if len(self.scheduler.for_user(user_id)) >= self.config.schedule_max_per_user:
+            await self._send(update.message.reply_text, f"❌ 每個用戶最多 {self.config.schedule_max_per_user} 個排程")
+            return
+        
+        plan = self._build_parameter_plan(self.click_commands[name])
+        names = {param.name for param in plan}
+        misfire = "skip"
+        values: Dict[str, str] = {}
+        for arg in args[3:]:
+            key, sep, value = arg.partition("=")
+            if not sep and arg.lower() in MISFIRE_POLICIES:
+                misfire = arg.lower()
+            elif sep and key.replace("-", "_") in names:
+                values[key.replace("-", "_")] = value
+            else:
+                await self._send(update.message.reply_text, f"❌ 無法識別「{arg}」；可用參數: {', '.join(param.name for param in plan)}")
+                return
+        
+        # 建立時先驗證一次；執行時會以當時的命令定義重新驗證
+        _, errors = self._convert_text_params(name, plan, values)
+        if errors:
+            await self._send(update.message.reply_text, "❌ " + "\n".join(errors))
+            return
+        
+        schedule = self.scheduler.add(user_id, update.effective_chat.id, name, values, interval, misfire)
+        logger.info("用戶 %s 新增排程 #%s: %s 每 %ss", user_id, schedule.id, name, interval)
+        await self._send(
+            update.message.reply_text,
+            f"⏰ 已新增排程 #{schedule.id}：{self._schedule_label(schedule)}\n"
+            f"取消：/unschedule {schedule.id}"
+        )
+    
+    def _schedule_label(self, schedule: Schedule) -> str:
+        """排程的說明文字；hide_input 的參數值不顯示"""
+        hidden = self._hidden_param_names(schedule.command)
+        args = " ".join(
+            f"{name}={'***' if name in hidden else value}" for name, value in schedule.values.items()
+        )
+        policy = "補執行" if schedule.misfire == "catchup" else "略過"
+        return truncate_text(
+            f"/{self._normalize_command_name(schedule.command)} {args}".rstrip()
+            + f"，每 {format_interval(schedule.interval)}（錯過時{policy}）",
+            200
+        )
+    
+    async def _handle_schedules(self, update: Update, context):
+        """處理/schedules命令：列出自己的排程"""
+        user_id = update.effective_user.id
+        
+        if not is_user_admin(user_id, self.config.admin_users):
+            await self._send(update.message.reply_text, "❌ 此命令僅限管理員使用")
+            return
+        
+        schedules = self.scheduler.for_user(user_id)
+        if not schedules:
+            await self._send(update.message.reply_text, "📭 沒有排程")
+            return
+        now = time.time()
+        lines = ["⏰ 排程："]
+        for schedule in schedules:
+            lines.append(
+                f"#{schedule.id} {self._schedule_label(schedule)}，"
+                f"{format_duration(max(0.0, schedule.next_run - now))} 後執行"
             )
-            logger.info(f"命令 {context.command_name} 執行成功")
+        await self._send(
+            update.message.reply_text,
+            truncate_text("\n".join(lines), self.config.max_message_length)
+        )
+    
+    async def _handle_unschedule(self, update: Update, context):
+        """處理/unschedule命令：/unschedule <編號>"""
+        user_id = update.effective_user.id
+        
+        if not is_user_admin(user_id, self.config.admin_users):
+            await self._send(update.message.reply_text, "❌ 此命令僅限管理員使用")
+            return
+        
+        try:
+            schedule_id = int(context.args[0].lstrip("#"))
+        except (IndexError, ValueError):
+            await self._send(update.message.reply_text, "用法: /unschedule <編號>")
+            return
+        
+        schedule = self.scheduler.schedules.get(schedule_id)
+        if schedule is None:
+            await self._send(update.message.reply_text, f"❌ 找不到排程 #{schedule_id}")
+            return
+        self.scheduler.remove(schedule_id)
+        await self._send(update.message.reply_text, f"🗑️ 已取消排程 #{schedule_id}")
+    
+    async def _run_schedule(self, schedule: Schedule, missed: int):
+        """執行到期的排程：參數以目前的命令定義重新驗證，結果發送到建立排程的聊天"""
+        name = schedule.command
+        header = f"⏰ #{schedule.id} /{self._normalize_command_name(name)}"
+        if missed:
+            header += f"（補執行，錯過 {missed} 次）"
+        
+        async def notify(text: str, parse_mode=None):
+            await self._send(self.app.bot.send_message, schedule.chat_id, text, parse_mode=parse_mode)
+        
+        if name not in self.click_commands or not is_user_admin(schedule.user_id, self.config.admin_users):
+            self.scheduler.remove(schedule.id)
+            await notify(f"{header}\n⚠️ 命令已不存在或已無權限，排程已取消")
+            return
+        
+        command = self.click_commands[name]
+        params, errors = self._convert_text_params(name, self._build_parameter_plan(command), schedule.values)
+        if errors:
+            await notify(f"{header}\n❌ 參數無效：\n" + "\n".join(errors))
+            return
+        
+        context = TelegramClickContext(None, schedule.user_id, schedule.chat_id)
+        context.command_name = name
+        context.collected_params = params
+        with self.tracer.span("scheduled", command=name, schedule=schedule.id):
+            with self.tracer.span("executor"):
+                result = await self.executor.run(command.callback, params)
+        if self.metrics.enabled:
+            self._m_invocations.labels(name).inc()
+        self._observe_execution(name, result)
+        if self.audit is not None:
+            self._audit_execution(context, result)
+        
+        if result.success:
+            output = format_output_message(result.data, self.config.max_message_length - 100, self.renderer)
+            await notify(f"{self.renderer.escape(header)}\n{output}", self.renderer.parse_mode)
         else:
-            await context.update.effective_chat.send_message(result.message)
-            logger.error(f"命令 {context.command_name} 執行失敗: {result.error}")
+            await notify(f"{header}\n{result.message}")
+    
+    def build_application(self, bot=None) -> Application:
+        """
+        創建 Telegram Application 並註冊所有處理器
+        
+        Args:
+            bot: 可選的Bot實例（測試或基準測試時注入），預設使用 bot_token 創建
+        """
+        builder = Application.builder()
+        if bot is not None:
+            builder.bot(bot)
+        else:
+            builder.token(self.config.bot_token)
+            if self.config.base_url:
+                builder.base_url(self.config.base_url)
+            if self.config.base_file_url:
+                builder.base_file_url(self.config.base_file_url)
+        
+        builder.post_init(self._post_init).post_shutdown(self._post_shutdown)
+        if self.config.max_concurrent_updates:
+            builder.concurrent_updates(self.config.max_concurrent_updates)
         
-        # 清理上下文
-        del self.user_contexts[user_id]
+        self.app = builder.build()
+        
+        # 在運行時才發現和註冊命令
+        self._discover_click_commands()
+        self._setup_telegram_handlers()
+        return self.app
     
     def run(self):
         """啟動Bot"""
         if not self.config.bot_token:
             raise ValueError("必須提供有效的 bot_token 才能啟動 Telegram Bot")
         
-        # 創建 Telegram Application
-        self.app = Application.builder().token(self.config.bot_token).build()
-        
-        # 在運行時才發現和註冊命令
-        self._discover_click_commands()
-        self._setup_telegram_handlers()
+        self.build_application()
         
         logger.info("🚀 TelegramClick轉換器啟動中...")
-        logger.info(f"📝 已註冊 {len(self.click_commands)} 個命令")
+        logger.info("📝 已註冊 %s 個命令", len(self.click_commands))
         
         try:
-            self.app.run_polling()
+            if self.config.run_mode == "webhook":
+                if not self.config.webhook_url:
+                    raise ValueError("webhook模式必須提供 webhook_url")
+                self.app.run_webhook(
+                    listen=self.config.webhook_listen,
+                    port=self.config.webhook_port,
+                    url_path=urlparse(self.config.webhook_url).path.lstrip("/"),
+                    webhook_url=self.config.webhook_url,
+                    secret_token=self.config.webhook_secret
+                )
+            else:
+                self.app.run_polling()
         except KeyboardInterrupt:
             logger.info("機器人已停止")
         except Exception as e:
-            logger.error(f"機器人運行錯誤: {e}")
+            logger.error("機器人運行錯誤: %s", e)
             raise
@@ -0,0 +1,84 @@
+"""
+TelegramClick鍵盤模組
+click.Choice 選項的分頁多欄鍵盤，以及用於輸入篩選的前綴索引
+"""
+
+from bisect import bisect_left
+from typing import Callable, List, Optional, Sequence
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from .callbacks import CallbackOp
+
+# 按鈕回調數據的產生函數：(操作碼, 選項索引) -> callback_data
+EncodeCallback = Callable[[CallbackOp, int], str]
+
+
+class PrefixIndex:
+    """不分大小寫的前綴索引；查詢為二分搜尋，結果按選項原本的順序返回"""
+
+    def __init__(self, values: Sequence[str]):
+        entries = sorted((value.casefold(), index) for index, value in enumerate(values))
+        self._keys = [key for key, _ in entries]
+        self._indices = [index for _, index in entries]
+
+    def search(self, prefix: str) -> List[int]:
+        """返回以 prefix 開頭的選項索引"""
+        folded = prefix.casefold()
+        low = bisect_left(self._keys, folded)
+        high = bisect_left(self._keys, folded + "\U0010ffff", low)
+        return sorted(self._indices[low:high])
+
+
+class ChoiceKeyboard:
+    """
+    一個 click.Choice 參數的分頁鍵盤
+
+    選項按 columns 欄排列，每頁 page_size 個；超過一頁時附加「上一頁 / 頁碼 / 下一頁」列。
+    indices 為篩選後的選項索引（None 表示全部），按鈕的回調數據使用原始選項索引。
+    """
+
+    def __init__(self, choices: Sequence, page_size: int = 20, columns: int = 2):
+        self.labels = [str(choice) for choice in choices]
+        self.page_size = max(1, page_size)
+        self.columns = max(1, columns)
+        self._prefix_index: Optional[PrefixIndex] = None
+
+    @property
+    def prefix_index(self) -> PrefixIndex:
+        if self._prefix_index is None:
+            self._prefix_index = PrefixIndex(self.labels)
+        return self._prefix_index
+
+    def page_count(self, indices: Optional[Sequence[int]] = None) -> int:
+        total = len(self.labels) if indices is None else len(indices)
+        return max(1, -(-total // self.page_size))
+
+    def build(self, page: int, encode: EncodeCallback,
+              indices: Optional[Sequence[int]] = None, filtered: bool = False) -> InlineKeyboardMarkup:
+        """建立指定頁的鍵盤；頁碼超出範圍時取最近的一頁"""
+        if indices is None:
+            indices = range(len(self.labels))
+        pages = self.page_count(indices)
+        page = min(max(page, 0), pages - 1)
+        start = page * self.page_size
+        visible = indices[start:start + self.page_size]
+
+        keyboard = []
+        for row_start in range(0, len(visible), self.columns):
+            keyboard.append([
+                InlineKeyboardButton(self.labels[index], callback_data=encode(CallbackOp.CHOICE, index))
+                for index in visible[row_start:row_start + self.columns]
+            ])
+
+        if pages > 1:
+            keyboard.append([
+                InlineKeyboardButton("◀️", callback_data=encode(CallbackOp.PAGE, (page - 1) % pages)),
+                InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=encode(CallbackOp.PAGE, page)),
+                InlineKeyboardButton("▶️", callback_data=encode(CallbackOp.PAGE, (page + 1) % pages)),
+            ])
+        if filtered:
+            keyboard.append([
+                InlineKeyboardButton("✖️ 清除篩選", callback_data=encode(CallbackOp.CLEAR_FILTER, 0))
+            ])
+        return InlineKeyboardMarkup(keyboard)
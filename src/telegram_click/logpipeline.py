@@ -0,0 +1,138 @@
+"""
+TelegramClick日誌管線模組
+JSON格式化、除錯日誌取樣，以及經由佇列在背景執行緒寫出日誌
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, TextIO, Tuple
+
+LOG_FORMATS = ("text", "json")
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# LogRecord的標準屬性；其餘屬性視為 extra 欄位輸出
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """每條記錄輸出一行JSON；extra 傳入的欄位會一併輸出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    按呼叫位置取樣DEBUG記錄
+
+    rate=0.1 時每個 logger.debug 呼叫位置保留第1、11、21…條；
+    INFO及以上的記錄不受影響。
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if self.every == 0:
+            return False
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+class LogPipeline:
+    """已安裝到日誌器的處理器及（佇列模式下的）背景監聽器"""
+
+    def __init__(self, logger: logging.Logger, handler: logging.Handler,
+                 listener: Optional[logging.handlers.QueueListener] = None):
+        self.logger = logger
+        self.handler = handler
+        self.listener = listener
+
+    def close(self):
+        """移除處理器；佇列模式下寫完剩餘記錄後停止監聽執行緒"""
+        self.logger.removeHandler(self.handler)
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "text",
+    use_queue: bool = False,
+    debug_sample_rate: float = 1.0,
+    logger: Optional[logging.Logger] = None,
+    stream: Optional[TextIO] = None,
+) -> LogPipeline:
+    """
+    安裝日誌管線
+
+    use_queue 時呼叫端只把記錄放入佇列（QueueHandler），格式化輸出和寫入都在
+    QueueListener 的背景執行緒完成，標準輸出或磁碟阻塞不會卡住事件循環。
+    重複調用會先移除上一次安裝的管線。
+    """
+    global _pipeline
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"不支援的日誌格式: {log_format}")
+
+    logger = logger or logging.getLogger()
+    if _pipeline is not None and _pipeline.logger is logger:
+        _pipeline.close()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    listener = None
+    if use_queue:
+        records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        handler: logging.Handler = logging.handlers.QueueHandler(records)
+        listener = logging.handlers.QueueListener(records, output)
+        listener.start()
+    else:
+        handler = output
+    handler.addFilter(DebugSamplingFilter(debug_sample_rate))
+
+    logger.addHandler(handler)
+    logger.setLevel(getattr(logging, level.upper()))
+
+    pipeline = LogPipeline(logger, handler, listener)
+    if logger is logging.getLogger():
+        _pipeline = pipeline
+    return pipeline
+
+
+@atexit.register
+def _close_pipeline():
+    if _pipeline is not None:
+        _pipeline.close()
@@ -0,0 +1,146 @@
+"""
+TelegramClick訊息標記模組
+MarkdownV2/HTML轉義，以及依解析模式渲染框架訊息
+"""
+
+from typing import Callable, Dict, Sequence, Tuple
+
+# MarkdownV2 中所有需要轉義的字符；反斜線必須最先處理
+MARKDOWN_V2_SPECIAL_CHARS = '\\_*[]()~`>#+-=|{}.!'
+
+
+def _compile_escaper(pairs: Sequence[Tuple[str, str]]) -> Callable[[str], str]:
+    """
+    預先建立替換表，返回轉義函數
+
+    只對文字中實際出現的字符執行 replace：`in` 檢查是C層的記憶體掃描，一般命令輸出
+    只含少數幾種特殊字符，比對每個字符都 replace 或 str.translate（非ASCII文字會走
+    逐字符的慢路徑）快得多，見 `telegram-click bench-escape`。
+    """
+    pairs = tuple(pairs)
+
+    def escape(text: str) -> str:
+        for char, replacement in pairs:
+            if char in text:
+                text = text.replace(char, replacement)
+        return text
+
+    return escape
+
+
+_escape_markdown_v2 = _compile_escaper([(char, f"\\{char}") for char in MARKDOWN_V2_SPECIAL_CHARS])
+# pre/code 實體內只需轉義 \ 和 `
+_escape_markdown_v2_code = _compile_escaper([("\\", "\\\\"), ("`", "\\`")])
+_escape_html = _compile_escaper([("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;")])
+
+
+def escape_markdown_v2(text: str) -> str:
+    """轉義MarkdownV2特殊字符"""
+    return _escape_markdown_v2(text)
+
+
+def escape_markdown_v2_code(text: str) -> str:
+    """轉義MarkdownV2 code/pre 實體內的文字"""
+    return _escape_markdown_v2_code(text)
+
+
+def escape_html(text: str) -> str:
+    """轉義HTML特殊字符"""
+    return _escape_html(text)
+
+
+def truncate_escaped(text: str, budget: int, escape: Callable[[str], str]) -> str:
+    """返回轉義後長度不超過 budget 的最長前綴（已轉義）"""
+    escaped = escape(text)
+    if len(escaped) <= budget:
+        return escaped
+    low, high = 0, min(len(text), budget)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if len(escape(text[:middle])) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return escape(text[:low])
+
+
+class Renderer:
+    """依解析模式產生安全的訊息片段；所有動態文字都必須經過 escape/code/pre"""
+
+    name = ""
+    parse_mode = ""
+    # pre() 包裝本身佔用的字符數，用於截斷時預留空間
+    pre_overhead = 0
+
+    def escape(self, text: str) -> str:
+        """轉義一般文字"""
+        raise NotImplementedError
+
+    def escape_code(self, text: str) -> str:
+        """轉義 code/pre 實體內的文字"""
+        raise NotImplementedError
+
+    def bold(self, text: str) -> str:
+        raise NotImplementedError
+
+    def code(self, text: str) -> str:
+        raise NotImplementedError
+
+    def pre(self, text: str, escaped: bool = False) -> str:
+        """程式碼區塊；escaped=True 表示 text 已經過 escape_code"""
+        raise NotImplementedError
+
+
+class HtmlRenderer(Renderer):
+    name = "html"
+    parse_mode = "HTML"
+    pre_overhead = len("<pre></pre>")
+
+    def escape(self, text: str) -> str:
+        return escape_html(text)
+
+    def escape_code(self, text: str) -> str:
+        return escape_html(text)
+
+    def bold(self, text: str) -> str:
+        return f"<b>{escape_html(text)}</b>"
+
+    def code(self, text: str) -> str:
+        return f"<code>{escape_html(text)}</code>"
+
+    def pre(self, text: str, escaped: bool = False) -> str:
+        return f"<pre>{text if escaped else escape_html(text)}</pre>"
+
+
+class MarkdownV2Renderer(Renderer):
+    name = "markdown_v2"
+    parse_mode = "MarkdownV2"
+    pre_overhead = len("```\n\n```")
+
+    def escape(self, text: str) -> str:
+        return escape_markdown_v2(text)
+
+    def escape_code(self, text: str) -> str:
+        return escape_markdown_v2_code(text)
+
+    def bold(self, text: str) -> str:
+        return f"*{escape_markdown_v2(text)}*"
+
+    def code(self, text: str) -> str:
+        return f"`{escape_markdown_v2_code(text)}`"
+
+    def pre(self, text: str, escaped: bool = False) -> str:
+        return f"```\n{text if escaped else escape_markdown_v2_code(text)}\n```"
+
+
+RENDERERS: Dict[str, Renderer] = {
+    renderer.name: renderer for renderer in (HtmlRenderer(), MarkdownV2Renderer())
+}
+
+
+def get_renderer(name: str = "html") -> Renderer:
+    """根據名稱取得渲染器"""
+    try:
+        return RENDERERS[name]
+    except KeyError:
+        raise ValueError(f"不支援的訊息格式: {name}") from None
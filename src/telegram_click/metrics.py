@@ -0,0 +1,330 @@
+"""
+TelegramClick指標模組
+輕量的進程內指標註冊表，以Prometheus文字格式輸出
+"""
+
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 預設的延遲桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label_value(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """指標基類：管理標籤子指標"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, *values: str) -> "_Metric":
+        """取得指定標籤值的子指標"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要標籤 {self.labelnames}")
+            child = self._new_child()
+            self._children[values] = child
+        return child
+
+    def _new_child(self) -> "_Metric":
+        raise NotImplementedError
+
+    def _samples(self, labels: Sequence[str]) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        if self.labelnames:
+            for values, child in list(self._children.items()):
+                lines.extend(child._samples(values))
+        else:
+            lines.extend(self._samples(()))
+        return lines
+
+
+class Counter(_Metric):
+    """單調遞增計數器"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _new_child(self) -> "Counter":
+        child = Counter(self.name, self.documentation)
+        child.labelnames = self.labelnames
+        return child
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def _samples(self, labels: Sequence[str]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """可增可減的量表；可設置回調在輸出時取值"""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+        self.function = function
+
+    def _new_child(self) -> "Gauge":
+        child = Gauge(self.name, self.documentation)
+        child.labelnames = self.labelnames
+        return child
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+    def _samples(self, labels: Sequence[str]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(self.get())}"]
+
+
+class Histogram(_Metric):
+    """固定桶直方圖"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後一個是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self) -> "Histogram":
+        child = Histogram(self.name, self.documentation, buckets=self.buckets)
+        child.labelnames = self.labelnames
+        return child
+
+    def observe(self, value: float):
+        # 所有觀測都在事件循環執行緒中發生，不需要鎖
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def _samples(self, labels: Sequence[str]) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            )
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count{label_text} {self.count}")
+        return lines
+
+
+class _NullMetric:
+    """停用時使用的空指標，所有操作都是空操作"""
+
+    __slots__ = ()
+
+    def labels(self, *values: str) -> "_NullMetric":
+        return self
+
+    def inc(self, amount: float = 1.0):
+        pass
+
+    def dec(self, amount: float = 1.0):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+
+NULL_METRIC = _NullMetric()
+
+
+class MetricsRegistry:
+    """指標註冊表"""
+
+    enabled = True
+
+    def __init__(self, namespace: str = "telegram_click"):
+        self.namespace = namespace
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _full_name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self._full_name(name), documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        return self._register(Gauge(self._full_name(name), documentation, labelnames, function))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(self._full_name(name), documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """依完整名稱取得指標"""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """輸出Prometheus文字格式"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class NullRegistry:
+    """停用指標時的註冊表：返回空指標，記錄成本接近零"""
+
+    enabled = False
+
+    def counter(self, *args, **kwargs) -> _NullMetric:
+        return NULL_METRIC
+
+    def gauge(self, *args, **kwargs) -> _NullMetric:
+        return NULL_METRIC
+
+    def histogram(self, *args, **kwargs) -> _NullMetric:
+        return NULL_METRIC
+
+    def get(self, name: str) -> None:
+        return None
+
+    def render(self) -> str:
+        return ""
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    server: "_MetricsHTTPServer"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _MetricsHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], registry: MetricsRegistry):
+        super().__init__(address, _MetricsHandler)
+        self.registry = registry
+
+
+class MetricsServer:
+    """在背景執行緒提供 /metrics 端點"""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[_MetricsHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "MetricsServer":
+        self._server = _MetricsHTTPServer((self.host, self.port), self.registry)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="metrics-server", daemon=True
+        )
+        self._thread.start()
+        logger.info("指標端點: http://%s:%s/metrics", self.host, self.port)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,172 @@
+"""
+TelegramClick效能分析模組
+以cProfile或低開銷的取樣執行緒分析單次命令執行
+"""
+
+import cProfile
+import functools
+import inspect
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, List, Optional, Tuple
+
+PROFILE_MODES = ("cprofile", "sample")
+
+# 結果訊息中列出的函數數量
+PROFILE_TOP_FUNCTIONS = 15
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler:
+    """每隔 interval 秒取樣目標執行緒的呼叫堆疊"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class CommandProfiler:
+    """
+    單次命令執行的分析器
+
+    wrap() 返回與原函數同為同步或異步的包裝函數，分析在實際執行命令的執行緒中啟停，
+    因此可直接交給 safe_call_function / CommandExecutor。
+    異步命令在事件循環中執行，期間其他任務的活動也會被計入。
+    """
+
+    def __init__(self, mode: str = "cprofile", interval: float = 0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"不支援的分析模式: {mode}")
+        self.mode = mode
+        self.interval = interval
+        self.elapsed = 0.0
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_StackSampler] = None
+
+    def _start(self):
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _StackSampler(threading.get_ident(), self.interval)
+            self._sampler.start()
+
+    def _stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+
+    def wrap(self, func: Callable) -> Callable:
+        """返回在分析器下執行 func 的包裝函數"""
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                self._start()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self._stop()
+                    self.elapsed = time.perf_counter() - started
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            self._start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._stop()
+                self.elapsed = time.perf_counter() - started
+        return wrapper
+
+    def top_functions(self, limit: int = PROFILE_TOP_FUNCTIONS) -> List[Tuple[str, float, float, int]]:
+        """返回 (函數, 累計秒數, 自身秒數, 呼叫次數)，按累計時間排序"""
+        if self._profile is not None:
+            stats = pstats.Stats(self._profile).stats
+            rows = [
+                (f"{name} ({os.path.basename(filename)}:{line})", cumulative, total, calls)
+                for (filename, line, name), (_, calls, total, cumulative, _) in stats.items()
+            ]
+        elif self._sampler is not None:
+            # 取樣模式以樣本數估算時間：累計=出現在堆疊中，自身=位於堆疊頂端
+            cumulative: Counter = Counter()
+            own: Counter = Counter()
+            for stack, count in self._sampler.stacks.items():
+                frames = stack.split(";")
+                for frame in set(frames):
+                    cumulative[frame] += count
+                own[frames[-1]] += count
+            rows = [
+                (frame, count * self.interval, own[frame] * self.interval, count)
+                for frame, count in cumulative.items()
+            ]
+        else:
+            return []
+        rows.sort(key=lambda row: (-row[1], -row[2]))
+        return rows[:limit]
+
+    def format_report(self, command_name: str, limit: int = PROFILE_TOP_FUNCTIONS) -> str:
+        """格式化為純文字訊息"""
+        lines = [f"📊 /{command_name} 分析結果（{self.mode}，耗時 {self.elapsed * 1000:.1f}ms）", ""]
+        if self.mode == "sample":
+            lines.append(f"取樣間隔 {self.interval * 1000:.1f}ms，共 {self.sample_count} 個樣本")
+            lines.append("")
+        lines.append("累計ms   自身ms   次數  函數")
+        for label, cumulative, own, calls in self.top_functions(limit):
+            lines.append(f"{cumulative * 1000:>7.1f} {own * 1000:>7.1f} {calls:>6}  {label}")
+        return "\n".join(lines)
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self._sampler.stacks.values()) if self._sampler is not None else 0
+
+    @property
+    def filename(self) -> str:
+        return "profile.pstats" if self.mode == "cprofile" else "profile.folded"
+
+    def dump(self) -> bytes:
+        """
+        完整的分析資料
+
+        cprofile 模式為可用 pstats.Stats 載入的 .pstats 檔；
+        sample 模式為 flamegraph 可用的摺疊堆疊（每行 "a;b;c 次數"）。
+        """
+        if self._profile is not None:
+            stats = pstats.Stats(self._profile)
+            return marshal.dumps(stats.stats)
+        if self._sampler is not None:
+            lines = [f"{stack} {count}" for stack, count in self._sampler.stacks.most_common()]
+            return ("\n".join(lines) + "\n").encode("utf-8")
+        return b""
+
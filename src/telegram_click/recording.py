@@ -0,0 +1,67 @@
+"""
+TelegramClick更新錄製模組
+將收到的更新寫入壓縮JSONL檔案，供重放和效能回歸測試使用
+"""
+
+import gzip
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .writer import BackgroundWriter
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateRecorder:
+    """
+    非阻塞的更新錄製器
+
+    record() 只把更新放入佇列；序列化、壓縮和寫檔都在背景執行緒完成，
+    不會阻塞事件循環。每行格式為 {"ts": 接收時間戳, "update": 更新JSON}。
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.recorded = 0
+        # 以追加模式打開：每次啟動形成一個新的gzip成員，讀取時可連續解壓
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self._writer = BackgroundWriter(self._write, "update-recorder", flush_interval=flush_interval)
+
+    def record(self, update: Dict[str, Any], timestamp: Optional[float] = None):
+        """記錄一個更新（非阻塞）"""
+        self._writer.put((timestamp if timestamp is not None else time.time(), update))
+
+    def _write(self, batch: List[Tuple[float, Dict[str, Any]]]):
+        for timestamp, update in batch:
+            try:
+                line = json.dumps({"ts": timestamp, "update": update}, ensure_ascii=False)
+            except (TypeError, ValueError) as e:
+                logger.warning("無法錄製更新: %s", e)
+                continue
+            self._file.write(line + "\n")
+            self.recorded += 1
+        self._file.flush()
+
+    def close(self):
+        """寫入剩餘的更新並關閉檔案"""
+        self._writer.close()
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_recording(path: str) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """逐行讀取錄製檔案，產生 (時間戳, 更新JSON)"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 進程異常退出時最後一行可能不完整
+                logger.warning("略過損壞的錄製記錄")
+                continue
+            yield record["ts"], record["update"]
@@ -0,0 +1,168 @@
+"""
+TelegramClick熱重載模組
+監視CLI模組檔案並計算命令集差異
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import types
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import click
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CommandSetDiff:
+    """命令集差異"""
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    @property
+    def affected(self) -> List[str]:
+        """需要重建的命令（新增、刪除或變更）"""
+        return self.added + self.removed + self.changed
+
+
+def _hash_code(code: types.CodeType, digest) -> None:
+    """遞迴雜湊代碼對象（忽略記憶體位址等不穩定資訊）"""
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    digest.update(repr(code.co_varnames).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _hash_code(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+def _type_info(param_type: click.ParamType) -> str:
+    """參數類型的穩定描述：類別加上 to_info_dict（repr 含記憶體位址，每次載入都不同）"""
+    cls = type(param_type)
+    return repr((f"{cls.__module__}.{cls.__qualname__}", param_type.to_info_dict()))
+
+
+def _hash_default(default, digest) -> None:
+    """雜湊參數默認值；可調用的默認值按代碼雜湊"""
+    code = getattr(default, "__code__", None) if callable(default) else None
+    if code is not None:
+        _hash_code(code, digest)
+    else:
+        digest.update(repr(default).encode())
+
+
+def compute_command_fingerprint(command: click.Command) -> str:
+    """計算命令指紋，用於判斷重載後命令是否變更"""
+    digest = hashlib.sha1()
+    digest.update((command.help or "").encode())
+
+    callback = command.callback
+    code = getattr(callback, "__code__", None)
+    if code is not None:
+        _hash_code(code, digest)
+    elif callback is not None:
+        digest.update(repr(callback).encode())
+
+    for param in getattr(command, "params", []):
+        digest.update(repr((
+            type(param).__name__,
+            param.name,
+            tuple(param.opts),
+            _type_info(param.type),
+            param.required,
+            getattr(param, "help", None),
+            param.multiple,
+            param.nargs,
+            getattr(param, "is_flag", False),
+        )).encode())
+        _hash_default(param.default, digest)
+
+    return digest.hexdigest()
+
+
+def diff_command_sets(
+    old_fingerprints: Dict[str, str],
+    new_fingerprints: Dict[str, str],
+) -> CommandSetDiff:
+    """比較新舊命令指紋，產生差異"""
+    diff = CommandSetDiff()
+
+    for name, fingerprint in new_fingerprints.items():
+        if name not in old_fingerprints:
+            diff.added.append(name)
+        elif old_fingerprints[name] != fingerprint:
+            diff.changed.append(name)
+        else:
+            diff.unchanged.append(name)
+
+    for name in old_fingerprints:
+        if name not in new_fingerprints:
+            diff.removed.append(name)
+
+    return diff
+
+
+class CliModuleWatcher:
+    """以mtime輪詢監視CLI模組檔案，檔案變更時調用回調"""
+
+    def __init__(
+        self,
+        path: str,
+        on_change: Callable[[], Awaitable[None]],
+        interval: float = 1.0,
+    ):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._last_mtime: Optional[int] = self._stat_mtime()
+        self._task: Optional[asyncio.Task] = None
+
+    def _stat_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def check(self) -> bool:
+        """檢查檔案是否變更（同時更新已記錄的mtime）"""
+        mtime = self._stat_mtime()
+        if mtime is None or mtime == self._last_mtime:
+            return False
+        self._last_mtime = mtime
+        return True
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.check():
+                logger.info("偵測到CLI模組變更: %s", self.path)
+                try:
+                    await self.on_change()
+                except Exception as e:
+                    logger.error("熱重載失敗: %s", e)
+
+    def start(self) -> asyncio.Task:
+        """在目前事件循環中啟動監視任務"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+        return self._task
+
+    async def stop(self):
+        """停止監視任務"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,283 @@
+"""
+TelegramClick排程模組
+按固定間隔重複執行命令：排程保存在SQLite，事件循環中的單一計時任務以最小堆
+等待最早到期的排程，兩次執行之間不佔用任何資源
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MISFIRE_POLICIES = ("skip", "catchup")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_INTERVAL_PART = re.compile(r"(\d+(?:\.\d+)?)([smhd])")
+
+
+def parse_interval(text: str) -> float:
+    """解析 30s、5m、1h30m 等間隔，返回秒數；格式錯誤時拋出ValueError"""
+    text = text.strip().lower()
+    total = 0.0
+    position = 0
+    for match in _INTERVAL_PART.finditer(text):
+        if match.start() != position:
+            break
+        total += float(match.group(1)) * _UNITS[match.group(2)]
+        position = match.end()
+    if not text or position != len(text) or total <= 0:
+        raise ValueError(f"無效的間隔: {text}（例如 30s、5m、1h30m）")
+    return total
+
+
+def format_interval(seconds: float) -> str:
+    """格式化為 1h30m 形式"""
+    seconds = int(seconds)
+    parts = []
+    for unit, length in (("d", 86400), ("h", 3600), ("m", 60), ("s", 1)):
+        if seconds >= length:
+            parts.append(f"{seconds // length}{unit}")
+            seconds %= length
+    return "".join(parts) or "0s"
+
+
+@dataclass
+class Schedule:
+    """一個重複執行的命令"""
+    id: int
+    user_id: int
+    chat_id: int
+    command: str
+    values: Dict[str, str] = field(default_factory=dict)  # 參數名稱 -> 輸入文字，每次執行時重新驗證
+    interval: float = 60.0  # 執行間隔（秒）
+    next_run: float = 0.0  # 下次執行的時間戳
+    misfire: str = "skip"  # 錯過執行時的策略：skip 或 catchup
+    last_run: Optional[float] = None
+
+
+class ScheduleStore:
+    """SQLite排程存儲；path 為None時使用記憶體資料庫（重啟後不保留）"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS schedules ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, chat_id INTEGER NOT NULL, "
+            "command TEXT NOT NULL, params TEXT NOT NULL, interval REAL NOT NULL, "
+            "next_run REAL NOT NULL, misfire TEXT NOT NULL, last_run REAL)"
+        )
+        self._conn.commit()
+
+    def add(self, schedule: Schedule) -> Schedule:
+        """保存新排程並填入編號"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO schedules (user_id, chat_id, command, params, interval, next_run, misfire, last_run) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (schedule.user_id, schedule.chat_id, schedule.command,
+                 json.dumps(schedule.values, ensure_ascii=False), schedule.interval,
+                 schedule.next_run, schedule.misfire, schedule.last_run)
+            )
+            self._conn.commit()
+        schedule.id = cursor.lastrowid
+        return schedule
+
+    def update(self, schedule: Schedule):
+        """保存下次和上次執行時間"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE schedules SET next_run = ?, last_run = ? WHERE id = ?",
+                (schedule.next_run, schedule.last_run, schedule.id)
+            )
+            self._conn.commit()
+
+    def delete(self, schedule_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
+            self._conn.commit()
+
+    def load(self) -> List[Schedule]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, user_id, chat_id, command, params, interval, next_run, misfire, last_run "
+                "FROM schedules ORDER BY id"
+            ).fetchall()
+        return [
+            Schedule(row[0], row[1], row[2], row[3], json.loads(row[4]), row[5], row[6], row[7], row[8])
+            for row in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# 執行函數：(排程, 錯過的次數)
+ScheduleRunner = Callable[[Schedule, int], Awaitable[None]]
+
+
+class Scheduler:
+    """
+    排程器
+
+    最小堆保存 (下次執行時間, 排程編號)，計時任務只睡到堆頂到期，新增或取消排程時被喚醒重算；
+    取消的排程留在堆中，彈出時才丟棄。到期後超過 misfire_grace 秒才處理的執行視為錯過：
+    skip 策略不執行，catchup 策略補執行一次（多次錯過合併為一次）。下次執行時間按間隔
+    對齊原本的時間表，不會漂移；上一次執行尚未完成時本次不執行。
+    """
+
+    ERROR_RETRY_SECONDS = 5.0  # 計時任務出錯後重試的間隔
+
+    def __init__(self, store: ScheduleStore, runner: ScheduleRunner, misfire_grace: float = 60.0,
+                 clock: Callable[[], float] = time.time):
+        self.store = store
+        self.runner = runner
+        self.misfire_grace = misfire_grace
+        self.clock = clock
+        self.schedules: Dict[int, Schedule] = {schedule.id: schedule for schedule in store.load()}
+        self._heap: List[Tuple[float, int]] = [(s.next_run, s.id) for s in self.schedules.values()]
+        heapq.heapify(self._heap)
+        self._running: Dict[int, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.fired = 0
+        self.missed = 0
+
+    def add(self, user_id: int, chat_id: int, command: str, values: Dict[str, str],
+            interval: float, misfire: str = "skip") -> Schedule:
+        """新增排程，第一次執行在一個間隔之後"""
+        if misfire not in MISFIRE_POLICIES:
+            raise ValueError(f"不支援的錯過策略: {misfire}")
+        schedule = self.store.add(Schedule(
+            0, user_id, chat_id, command, dict(values), interval, self.clock() + interval, misfire
+        ))
+        self.schedules[schedule.id] = schedule
+        heapq.heappush(self._heap, (schedule.next_run, schedule.id))
+        self._wake()
+        return schedule
+
+    def remove(self, schedule_id: int) -> bool:
+        """取消排程；不存在時返回False"""
+        if self.schedules.pop(schedule_id, None) is None:
+            return False
+        self.store.delete(schedule_id)
+        self._wake()
+        return True
+
+    def for_user(self, user_id: int) -> List[Schedule]:
+        return [schedule for schedule in self.schedules.values() if schedule.user_id == user_id]
+
+    def next_due(self) -> Optional[float]:
+        """最早的到期時間；已取消的堆頂在這裡清除"""
+        while self._heap:
+            when, schedule_id = self._heap[0]
+            schedule = self.schedules.get(schedule_id)
+            if schedule is not None and schedule.next_run == when:
+                return when
+            heapq.heappop(self._heap)
+        return None
+
+    def due(self, now: float) -> List[Tuple[Schedule, int]]:
+        """彈出到期的排程並安排下一次執行，返回需要執行的 (排程, 錯過次數)"""
+        fired = []
+        while self.next_due() is not None and self._heap[0][0] <= now:
+            when, schedule_id = heapq.heappop(self._heap)
+            schedule = self.schedules[schedule_id]
+            late = now - when
+            periods = int(late // schedule.interval)
+            missed = periods + (1 if late > self.misfire_grace else 0)
+            busy = schedule_id in self._running
+            run = not busy and (late <= self.misfire_grace or schedule.misfire == "catchup")
+            if missed or busy:
+                self.missed += missed + (1 if busy else 0)
+                logger.info("排程 #%s 錯過 %s 次%s", schedule_id, missed, "（上次執行未完成）" if busy else "")
+
+            schedule.next_run = when + (periods + 1) * schedule.interval
+            if run:
+                schedule.last_run = now
+                fired.append((schedule, missed))
+            heapq.heappush(self._heap, (schedule.next_run, schedule_id))
+            try:
+                self.store.update(schedule)
+            except sqlite3.Error:
+                # 保存失敗時排程仍按記憶體中的時間表執行，只是重啟後可能重複或錯過一次
+                logger.exception("保存排程 #%s 失敗", schedule_id)
+        return fired
+
+    async def tick(self, now: Optional[float] = None) -> List[asyncio.Task]:
+        """執行所有到期的排程（每個一個任務），返回這些任務"""
+        tasks = []
+        for schedule, missed in self.due(self.clock() if now is None else now):
+            self.fired += 1
+            task = asyncio.ensure_future(self._fire(schedule, missed))
+            self._running[schedule.id] = task
+            tasks.append(task)
+        return tasks
+
+    async def _fire(self, schedule: Schedule, missed: int):
+        try:
+            await self.runner(schedule, missed)
+        except Exception:
+            logger.exception("排程 #%s 執行失敗", schedule.id)
+        finally:
+            self._running.pop(schedule.id, None)
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.tick()
+                when = self.next_due()
+                timeout = None if when is None else max(0.0, when - self.clock())
+            except Exception:
+                # 存儲錯誤等不應讓所有排程停止；稍後重試
+                logger.exception("排程計時任務出錯，%s 秒後重試", self.ERROR_RETRY_SECONDS)
+                timeout = self.ERROR_RETRY_SECONDS
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _on_task_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("排程計時任務已停止，排程不會再執行", exc_info=task.exception())
+
+    def start(self):
+        """在目前的事件循環中啟動計時任務"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._on_task_done)
+
+    async def stop(self):
+        """停止計時任務並等待執行中的排程完成"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        if self._running:
+            await asyncio.wait(list(self._running.values()))
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,120 @@
+"""
+TelegramClick命令搜尋模組
+命令名稱的前綴樹和說明文字的三元組索引，用於內聯模式（@bot 關鍵字）搜尋命令
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .diagnostics import CacheStats
+
+
+def trigrams(text: str) -> Set[str]:
+    """文字的三元組集合（不分大小寫，詞首尾以空格填充）"""
+    grams: Set[str] = set()
+    for word in text.casefold().split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class _TrieNode:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.terminal = False
+
+
+class CommandTrie:
+    """命令名稱的前綴樹"""
+
+    def __init__(self, names=()):
+        self._root = _TrieNode()
+        for name in names:
+            self.insert(name)
+
+    def insert(self, name: str):
+        node = self._root
+        for char in name.casefold():
+            node = node.children.setdefault(char, _TrieNode())
+        node.terminal = True
+
+    def _walk(self, node: _TrieNode, prefix: str) -> Iterator[str]:
+        if node.terminal:
+            yield prefix
+        for char in sorted(node.children):
+            yield from self._walk(node.children[char], prefix + char)
+
+    def with_prefix(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """以 prefix 開頭的名稱（按字母順序）"""
+        node = self._root
+        prefix = prefix.casefold()
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        results = []
+        for name in self._walk(node, prefix):
+            results.append(name)
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+
+class CommandIndex:
+    """
+    命令搜尋索引
+
+    名稱前綴匹配排在最前；其餘命令按查詢與「名稱 + 說明」的三元組重疊比例排序，
+    低於 min_score 的結果被丟棄。查詢結果按正規化的查詢字串做LRU快取。
+    """
+
+    def __init__(self, commands: Dict[str, str], min_score: float = 0.3, cache_size: int = 256,
+                 stats: Optional[CacheStats] = None):
+        self.min_score = min_score
+        self.cache_size = cache_size
+        self._names = {name.casefold(): name for name in commands}
+        self._trie = CommandTrie(commands)
+        self._postings: Dict[str, Set[str]] = {}
+        for name, help_text in commands.items():
+            for gram in trigrams(f"{name.replace('_', ' ').replace('-', ' ')} {help_text}"):
+                self._postings.setdefault(gram, set()).add(name)
+        self._cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self.stats = stats or CacheStats()
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """返回最多 limit 個命令名稱；快取保存完整結果，不同 limit 的查詢共用"""
+        key = " ".join(query.casefold().lstrip().lstrip("/").split())
+        cached = self._cache.get(key)
+        self.stats.record(cached is not None)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached[:limit]
+
+        results = self._search(key)
+        self._cache[key] = results
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return results[:limit]
+
+    def _search(self, query: str) -> List[str]:
+        if not query:
+            return [self._names[name] for name in self._trie.with_prefix("")]
+
+        first_word = query.split()[0]
+        results = [self._names[name] for name in self._trie.with_prefix(first_word)]
+
+        query_grams = trigrams(query)
+        scores: Dict[str, int] = {}
+        for gram in query_grams:
+            for name in self._postings.get(gram, ()):
+                scores[name] = scores.get(name, 0) + 1
+        seen = set(results)
+        ranked: List[Tuple[float, str]] = sorted(
+            (-count / len(query_grams), name)
+            for name, count in scores.items()
+            if name not in seen and count / len(query_grams) >= self.min_score
+        )
+        results.extend(name for _, name in ranked)
+        return results
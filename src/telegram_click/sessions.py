@@ -0,0 +1,160 @@
+"""
+TelegramClick會話後端模組
+保存可序列化的用戶會話狀態
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SESSION_BACKENDS = ("memory", "sqlite")
+
+
+class SessionBackend:
+    """會話後端基類：以字串鍵保存JSON可序列化的字典"""
+
+    # 是否跨進程持久化；非持久化後端不需要保存進行中會話的快照
+    persistent = False
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any]):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemorySessionBackend(SessionBackend):
+    """記憶體會話後端（預設）"""
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._data.get(key)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self._data[key] = value
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+
+class SqliteSessionBackend(SessionBackend):
+    """SQLite會話後端，Bot重啟後會話仍然保留"""
+
+    persistent = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sessions WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (key, value, updated_at) VALUES (?, ?, ?)",
+                (key, payload, time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class InvocationHistory:
+    """
+    每個用戶最近執行的命令（命令名稱和已收集的參數），保存在會話後端
+
+    記錄按時間倒序，最多 size 條；相同命令和參數的重複執行只移到最前並保留原編號，
+    舊結果訊息上的重新執行按鈕仍然有效。編號在0~65535間循環，可放入按鈕回調數據。
+    """
+
+    def __init__(self, backend: SessionBackend, size: int = 10):
+        self.backend = backend
+        self.size = size
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"history:{user_id}"
+
+    def _load(self, user_id: int) -> Dict[str, Any]:
+        return self.backend.get(self._key(user_id)) or {"next_id": 0, "entries": []}
+
+    def record(self, user_id: int, command: str, params: Dict[str, Any],
+               fingerprint: str = "") -> Optional[int]:
+        """記錄一次執行並返回記錄編號；停用或參數無法序列化時返回None"""
+        if self.size <= 0:
+            return None
+        try:
+            params = json.loads(json.dumps(params, ensure_ascii=False))
+        except (TypeError, ValueError):
+            return None
+
+        history = self._load(user_id)
+        entries = history["entries"]
+        for index, entry in enumerate(entries):
+            if entry["command"] == command and entry["params"] == params:
+                entry = entries.pop(index)
+                break
+        else:
+            entry = {"id": history["next_id"], "command": command, "params": params}
+            history["next_id"] = (history["next_id"] + 1) % 65536
+        entry["fingerprint"] = fingerprint
+        entry["ts"] = time.time()
+        history["entries"] = [entry] + entries[:self.size - 1]
+        self.backend.set(self._key(user_id), history)
+        return entry["id"]
+
+    def entries(self, user_id: int) -> List[Dict[str, Any]]:
+        """最近的記錄（新的在前）"""
+        if self.size <= 0:
+            return []
+        return self._load(user_id)["entries"]
+
+    def get(self, user_id: int, entry_id: int) -> Optional[Dict[str, Any]]:
+        """按編號取得記錄；已被淘汰時返回None"""
+        for entry in self.entries(user_id):
+            if entry["id"] == entry_id:
+                return entry
+        return None
+
+
+def create_session_backend(backend: str = "memory", path: Optional[str] = None) -> SessionBackend:
+    """根據名稱創建會話後端"""
+    if backend == "memory":
+        return MemorySessionBackend()
+    if backend == "sqlite":
+        return SqliteSessionBackend(path or "telegram_click_sessions.db")
+    raise ValueError(f"不支援的會話後端: {backend}")
@@ -0,0 +1,583 @@
+"""
+TelegramClick測試工具模組
+提供進程內的假Bot API與合成更新，用於基準測試和端到端測試
+"""
+
+import asyncio
+import json
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+from telegram.request import BaseRequest, RequestData
+
+FAKE_BOT_TOKEN = "123456:TEST-telegram-click"
+
+
+@dataclass
+class RecordedCall:
+    """記錄的Bot API調用"""
+    method: str
+    params: Dict[str, Any]
+    timestamp: float = field(default_factory=time.time)
+
+
+def _decode_param(value: Any) -> Any:
+    """解碼Bot API參數（表單欄位中的複雜值是JSON字串）"""
+    if isinstance(value, str) and value[:1] in ("{", "["):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+class FakeBotAPI:
+    """
+    Bot API的記憶體實現
+
+    只實現轉換器用到的方法，回傳與真實API結構相同的JSON結果。
+    可被進程內傳輸層（InProcessRequest）或HTTP伺服器（FakeBotAPIServer）共用。
+
+    Args:
+        latency: 每次調用的模擬延遲（秒），由傳輸層套用
+        rate_limit_every: 每N次非 getUpdates 調用返回一次429（0表示不注入）
+        retry_after: 注入429時的 retry_after 秒數
+        record: 是否記錄調用
+        strict: 編輯不存在的訊息時是否返回400；重放錄製的更新時應設為False
+    """
+
+    # 不計入限流的方法
+    UNTHROTTLED_METHODS = frozenset({"getUpdates", "getMe", "deleteWebhook", "setMyCommands"})
+
+    def __init__(
+        self,
+        bot_id: int = 123456,
+        username: str = "telegram_click_bot",
+        record: bool = True,
+        latency: float = 0.0,
+        rate_limit_every: int = 0,
+        retry_after: int = 1,
+        strict: bool = True,
+    ):
+        self.bot_user = {
+            "id": bot_id,
+            "is_bot": True,
+            "first_name": "TelegramClick",
+            "username": username,
+            "can_join_groups": True,
+            "can_read_all_group_messages": False,
+            "supports_inline_queries": True,
+        }
+        self.record = record
+        self.strict = strict
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.rate_limited = 0  # 已注入的429次數
+        self._throttle_counter = 0
+        self.calls: List[RecordedCall] = []
+        self.messages: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self.last_message: Dict[int, Dict[str, Any]] = {}  # chat_id -> Bot最後發送或編輯的訊息
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._updates: Deque[Dict[str, Any]] = deque()
+        self._updates_ready = threading.Condition(self._lock)
+        self._next_update_id = 1
+        self.files: Dict[str, Tuple[str, bytes]] = {}  # file_id -> (file_path, 內容)
+
+    # ------------------------------------------------------------------
+    # 檔案（getFile 和下載）
+    # ------------------------------------------------------------------
+    def add_file(self, content: bytes, file_name: str = "document.txt",
+                 mime_type: str = "text/plain") -> Dict[str, Any]:
+        """登記一個可下載的檔案，返回可放入訊息的 document 物件"""
+        with self._lock:
+            index = next(self._file_ids)
+            file_id = f"file-{index}"
+            self.files[file_id] = (f"documents/{file_id}", content)
+        return {
+            "file_id": file_id,
+            "file_unique_id": f"ufile-{index}",
+            "file_name": file_name,
+            "mime_type": mime_type,
+            "file_size": len(content),
+        }
+
+    def download(self, file_path: str) -> Optional[bytes]:
+        """按 getFile 返回的 file_path 取得檔案內容"""
+        for path, content in self.files.values():
+            if path == file_path:
+                return content
+        return None
+
+    # ------------------------------------------------------------------
+    # 更新佇列（getUpdates）
+    # ------------------------------------------------------------------
+    def push_update(self, update: Dict[str, Any]) -> Dict[str, Any]:
+        """將更新放入 getUpdates 佇列（自動分配 update_id）"""
+        with self._updates_ready:
+            update = dict(update, update_id=self._next_update_id)
+            self._next_update_id += 1
+            self._updates.append(update)
+            self._updates_ready.notify_all()
+        return update
+
+    def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset", 0) or 0)
+        timeout = min(float(params.get("timeout", 0) or 0), 5.0)
+        limit = int(params.get("limit", 100) or 100)
+
+        with self._updates_ready:
+            while self._updates and self._updates[0]["update_id"] < offset:
+                self._updates.popleft()
+            if not self._updates and timeout:
+                self._updates_ready.wait(timeout)
+            return list(itertools.islice(self._updates, limit))
+
+    # ------------------------------------------------------------------
+    # 訊息
+    # ------------------------------------------------------------------
+    def _new_message(self, chat_id: int, **content: Any) -> Dict[str, Any]:
+        with self._lock:
+            message_id = next(self._message_ids)
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            "from": self.bot_user,
+        }
+        message.update({key: value for key, value in content.items() if value is not None})
+        self.messages[(chat_id, message_id)] = message
+        self.last_message[chat_id] = message
+        return message
+
+    def _edit_message(self, params: Dict[str, Any], **changes: Any) -> Any:
+        if "inline_message_id" in params:
+            return True
+        key = (int(params["chat_id"]), int(params["message_id"]))
+        message = self.messages.get(key)
+        if message is None:
+            if self.strict:
+                raise LookupError("Bad Request: message to edit not found")
+            message = {
+                "message_id": key[1],
+                "date": int(time.time()),
+                "chat": {"id": key[0], "type": "private" if key[0] > 0 else "group"},
+                "from": self.bot_user,
+            }
+            self.messages[key] = message
+        for name, value in changes.items():
+            if value is None:
+                message.pop(name, None)
+            else:
+                message[name] = value
+        message["edit_date"] = int(time.time())
+        self.last_message[key[0]] = message
+        return message
+
+    # ------------------------------------------------------------------
+    # 調度
+    # ------------------------------------------------------------------
+    def handle(self, method: str, raw_params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """處理一次API調用，返回 (HTTP狀態碼, 回應JSON)"""
+        params = {key: _decode_param(value) for key, value in raw_params.items()}
+        if self.record and method != "getUpdates":
+            self.calls.append(RecordedCall(method, params))
+
+        if self.rate_limit_every and method not in self.UNTHROTTLED_METHODS:
+            with self._lock:
+                self._throttle_counter += 1
+                throttled = self._throttle_counter % self.rate_limit_every == 0
+            if throttled:
+                self.rate_limited += 1
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+
+        handler = getattr(self, f"_api_{method}", None)
+        if handler is None:
+            return 404, {"ok": False, "error_code": 404, "description": "Not Found: method not found"}
+
+        try:
+            return 200, {"ok": True, "result": handler(params)}
+        except (LookupError, KeyError, ValueError) as e:
+            return 400, {"ok": False, "error_code": 400, "description": str(e)}
+
+    def _api_getMe(self, params):
+        return self.bot_user
+
+    def _api_getUpdates(self, params):
+        return self._get_updates(params)
+
+    def _api_deleteWebhook(self, params):
+        return True
+
+    def _api_setMyCommands(self, params):
+        return True
+
+    def _api_deleteMessage(self, params):
+        self.messages.pop((int(params["chat_id"]), int(params["message_id"])), None)
+        return True
+
+    def _api_answerCallbackQuery(self, params):
+        return True
+
+    def _api_answerInlineQuery(self, params):
+        return True
+
+    def _api_getFile(self, params):
+        file_id = params["file_id"]
+        if file_id not in self.files:
+            raise LookupError("Bad Request: invalid file_id")
+        file_path, content = self.files[file_id]
+        return {
+            "file_id": file_id,
+            "file_unique_id": f"u{file_id}",
+            "file_size": len(content),
+            "file_path": file_path,
+        }
+
+    def _api_sendMessage(self, params):
+        return self._new_message(
+            int(params["chat_id"]),
+            text=params.get("text"),
+            reply_markup=params.get("reply_markup"),
+        )
+
+    def _api_editMessageText(self, params):
+        return self._edit_message(
+            params,
+            text=params.get("text"),
+            reply_markup=params.get("reply_markup"),
+        )
+
+    def _api_editMessageReplyMarkup(self, params):
+        return self._edit_message(params, reply_markup=params.get("reply_markup"))
+
+    def _api_sendDocument(self, params):
+        document = params.get("document")
+        file_name = params.get("file_name") or "document"
+        if isinstance(document, dict):
+            file_name = document.get("file_name", file_name)
+        if isinstance(document, dict) and "content" in document:
+            # 上傳的內容登記為檔案，可經 getFile 和 download 取回
+            sent = self.add_file(document["content"], file_name, "application/octet-stream")
+        else:
+            with self._lock:
+                index = next(self._file_ids)
+            sent = {
+                "file_id": f"doc-{index}",
+                "file_unique_id": f"udoc-{index}",
+                "file_name": file_name,
+            }
+        return self._new_message(
+            int(params["chat_id"]),
+            caption=params.get("caption"),
+            reply_markup=params.get("reply_markup"),
+            document=sent,
+        )
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+    def calls_to(self, method: str) -> List[RecordedCall]:
+        """取得某個方法的所有調用記錄"""
+        return [call for call in self.calls if call.method == method]
+
+    def inline_buttons(self, chat_id: int) -> List[Dict[str, Any]]:
+        """取得聊天中最後一則Bot訊息的所有內聯按鈕"""
+        message = self.last_message.get(chat_id) or {}
+        markup = message.get("reply_markup") or {}
+        return [button for row in markup.get("inline_keyboard", []) for button in row]
+
+    def button_data(self, chat_id: int, label: str) -> str:
+        """取得最後一則Bot訊息中文字以 label 開頭的按鈕的回調數據"""
+        for button in self.inline_buttons(chat_id):
+            if button["text"].startswith(label):
+                return button["callback_data"]
+        raise LookupError(f"找不到按鈕: {label}")
+
+
+class InProcessRequest(BaseRequest):
+    """
+    不經網路的請求實現：直接把序列化後的請求交給 FakeBotAPI
+
+    請求仍然經過 python-telegram-bot 完整的參數序列化和回應解析流程。
+    """
+
+    def __init__(self, api: FakeBotAPI):
+        self.api = api
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout: Any = None,
+        write_timeout: Any = None,
+        connect_timeout: Any = None,
+        pool_timeout: Any = None,
+    ) -> Tuple[int, bytes]:
+        if self.api.latency:
+            await asyncio.sleep(self.api.latency)
+
+        path = urlparse(url).path
+        if path.startswith("/file/bot"):
+            content = self.api.download(path.split("/", 3)[-1])
+            return (200, content) if content is not None else (404, b"Not Found")
+
+        api_method = path.rsplit("/", 1)[-1]
+        params: Dict[str, Any] = {}
+        if request_data is not None:
+            params.update(request_data.json_parameters)
+            for name, upload in request_data.multipart_data.items():
+                if not isinstance(upload, tuple):
+                    params[name] = name
+                elif isinstance(upload[1], bytes):
+                    params[name] = {"file_name": upload[0], "content": upload[1]}
+                else:
+                    params[name] = {"file_name": upload[0]}
+
+        code, response = self.api.handle(api_method, params)
+        return code, json.dumps(response).encode("utf-8")
+
+    async def stream(self, url: str, chunk_size: int) -> AsyncIterator[bytes]:
+        """分塊返回檔案內容（uploads.iter_download 的串流接口）"""
+        code, content = await self.do_request(url, "GET")
+        if code != 200:
+            raise OSError(f"下載文件失敗: HTTP {code}")
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+
+class _FakeBotAPIHandler(BaseHTTPRequestHandler):
+    """將 /bot<token>/<method> 請求轉交給 FakeBotAPI"""
+
+    server: "_FakeHTTPServer"
+    protocol_version = "HTTP/1.1"
+    # 標頭和內容分兩次寫入，不關閉Nagle會與延遲ACK疊加出約40ms的延遲
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+    def _read_params(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        content_type = self.headers.get("Content-Type", "")
+        params: Dict[str, Any] = dict(parse_qsl(urlparse(self.path).query))
+
+        if content_type.startswith("multipart/form-data"):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                file_name = part.get_filename()
+                if file_name:
+                    content = part.get_payload(decode=True)
+                    params[name] = {"file_name": file_name, "size": len(content), "content": content}
+                else:
+                    params[name] = part.get_content()
+        elif content_type.startswith("application/json"):
+            params.update(json.loads(body or b"{}"))
+        elif body:
+            params.update(parse_qsl(body.decode("utf-8"), keep_blank_values=True))
+        return params
+
+    def _respond(self, code: int, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_file(self, file_path: str):
+        content = self.server.api.download(file_path)
+        if content is None:
+            self._respond(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _dispatch(self):
+        path = urlparse(self.path).path
+        if path.startswith("/file/bot"):
+            self._send_file(path.split("/", 3)[-1])
+            return
+        parts = path.strip("/").split("/")
+        if len(parts) != 2 or not parts[0].startswith("bot"):
+            self._respond(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+            return
+
+        api = self.server.api
+        if api.latency:
+            time.sleep(api.latency)
+        code, payload = api.handle(parts[1], self._read_params())
+        self._respond(code, payload)
+
+    do_GET = _dispatch
+    do_POST = _dispatch
+
+
+class _FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], api: FakeBotAPI):
+        super().__init__(address, _FakeBotAPIHandler)
+        self.api = api
+
+
+class FakeBotAPIServer:
+    """
+    本地HTTP假Bot API伺服器（標準庫實現，在背景執行緒運行）
+
+    將轉換器的 base_url 指向 server.base_url，即可離線測試完整的HTTP I/O路徑。
+
+    Example:
+        >>> with FakeBotAPIServer(FakeBotAPI(latency=0.01)) as server:
+        >>>     bot = create_bot_from_cli_file(FAKE_BOT_TOKEN, "cli.py", base_url=server.base_url)
+    """
+
+    def __init__(self, api: Optional[FakeBotAPI] = None, host: str = "127.0.0.1", port: int = 0):
+        self.api = api or FakeBotAPI()
+        self.host = host
+        self.port = port
+        self._server: Optional[_FakeHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """python-telegram-bot 格式的 base_url（Token會被附加在後面）"""
+        return f"http://{self.host}:{self.port}/bot"
+
+    def start(self) -> "FakeBotAPIServer":
+        """在背景執行緒啟動伺服器"""
+        self._server = _FakeHTTPServer((self.host, self.port), self.api)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-bot-api", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止伺服器"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def serve_forever(self):
+        """在當前執行緒運行（命令列使用）"""
+        self._server = _FakeHTTPServer((self.host, self.port), self.api)
+        self.port = self._server.server_address[1]
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeBotAPIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any):
+        self.stop()
+
+
+class UpdateFactory:
+    """產生合成的Telegram更新（私聊，chat_id 等於 user_id）"""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+        self._callback_ids = itertools.count(1)
+
+    @staticmethod
+    def user(user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+    def _message(self, user_id: int, text: str, **extra: Any) -> Dict[str, Any]:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self.user(user_id),
+            "text": text,
+        }
+        message.update(extra)
+        return {"update_id": next(self._update_ids), "message": message}
+
+    def command(self, user_id: int, text: str) -> Dict[str, Any]:
+        """命令訊息，例如 '/greet' 或 '/start payload'"""
+        command_length = len(text.split()[0])
+        return self._message(
+            user_id, text,
+            entities=[{"type": "bot_command", "offset": 0, "length": command_length}]
+        )
+
+    def text(self, user_id: int, text: str) -> Dict[str, Any]:
+        """普通文字訊息"""
+        return self._message(user_id, text)
+
+    def document(self, user_id: int, document: Dict[str, Any], caption: Optional[str] = None) -> Dict[str, Any]:
+        """上傳文件（document 通常來自 FakeBotAPI.add_file）"""
+        update = self._message(user_id, "", document=document)
+        del update["message"]["text"]
+        if caption is not None:
+            update["message"]["caption"] = caption
+        return update
+
+    def callback(self, user_id: int, data: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """按下內聯按鈕"""
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._callback_ids)),
+                "from": self.user(user_id),
+                "chat_instance": str(user_id),
+                "message": message,
+                "data": data,
+            },
+        }
+
+    def inline_query(self, user_id: int, query: str) -> Dict[str, Any]:
+        """內聯查詢，例如在任意聊天輸入 '@bot dep'"""
+        return {
+            "update_id": next(self._update_ids),
+            "inline_query": {
+                "id": str(next(self._callback_ids)),
+                "from": self.user(user_id),
+                "query": query,
+                "offset": "",
+            },
+        }
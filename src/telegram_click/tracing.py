@@ -0,0 +1,190 @@
+"""
+TelegramClick追蹤模組
+以contextvars在處理流程中傳遞span，可插拔的匯出器用於分析每個階段的延遲
+"""
+
+import contextvars
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from .writer import BackgroundWriter
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "telegram_click_current_span", default=None
+)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """一個計時區段；同一更新內的span共用 trace_id"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration",
+                 "attributes", "error", "_started", "_token", "_tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else _new_id(128)
+        self.span_id = _new_id(64)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start = 0.0
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self._started = 0.0
+        self._token = None
+        self._tracer = tracer
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self._tracer.exporter.export(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration * 1000,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NullSpan:
+    """停用追蹤時使用的空span"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class SpanExporter:
+    """span匯出器基類"""
+
+    def export(self, span: Span):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class NoopSpanExporter(SpanExporter):
+    """丟棄所有span（預設）"""
+
+    def export(self, span: Span):
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """在記憶體中保存span，供測試使用"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def names(self) -> List[str]:
+        return [span.name for span in self.spans]
+
+
+class JsonlSpanExporter(SpanExporter):
+    """在背景執行緒把span逐行寫入JSONL檔案，不阻塞事件循環"""
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.exported = 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._writer = BackgroundWriter(self._write, "span-exporter", flush_interval=flush_interval)
+
+    def export(self, span: Span):
+        self._writer.put(span.to_dict())
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        for item in batch:
+            try:
+                line = json.dumps(item, ensure_ascii=False, default=str)
+            except (TypeError, ValueError) as e:
+                logger.warning("無法匯出span: %s", e)
+                continue
+            self._file.write(line + "\n")
+            self.exported += 1
+        self._file.flush()
+
+    def close(self):
+        self._writer.close()
+        if not self._file.closed:
+            self._file.close()
+
+
+class Tracer:
+    """
+    span工廠
+
+    使用 `with tracer.span("name", key=value):` 記錄一個階段；
+    在同一個asyncio任務（或以copy_context提交的執行緒）中嵌套的span會自動成為子span。
+    匯出器為 NoopSpanExporter 時返回共用的空span，開銷接近零。
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None):
+        self.exporter = exporter or NoopSpanExporter()
+        self.enabled = not isinstance(self.exporter, NoopSpanExporter)
+
+    def span(self, name: str, **attributes: Any):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attributes)
+
+    def close(self):
+        self.exporter.close()
+
+
+def current_span() -> Optional[Span]:
+    """返回當前上下文中的span"""
+    return _current_span.get()
+
+
+def read_spans(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行讀取JSONL span檔案"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning("略過損壞的span記錄")
@@ -2,11 +2,16 @@
 TelegramClick類型定義模組
 """
 
+import time
 import click
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, List, Any, Callable, Optional
-from telegram import Update
+from typing import Dict, List, Any, Callable, Optional, TYPE_CHECKING
+
+from .uploads import release_upload
+
+if TYPE_CHECKING:
+    from telegram import Update
 
 
 class ParameterType(Enum):
@@ -51,12 +56,59 @@ class TelegramClickConfig:
     custom_help: Dict[str, str] = field(default_factory=dict)  # 自定義幫助文字
     admin_users: List[int] = field(default_factory=list)  # 管理員用戶ID
     enable_logging: bool = True  # 是否啟用日誌
+    log_level: str = "INFO"  # 日誌級別
+    log_format: str = "text"  # 日誌格式：text 或 json
+    log_queue: bool = False  # 經由佇列在背景執行緒寫出日誌，不阻塞事件循環
+    log_debug_sample_rate: float = 1.0  # DEBUG日誌的取樣比例（按呼叫位置）
     max_message_length: int = 4000  # 最大訊息長度
+    max_upload_bytes: int = 20 * 1024 * 1024  # 上傳到檔案參數的文件大小上限（Bot API 最多下載20MB）
+    upload_spool_bytes: int = 1024 * 1024  # click.File 參數的上傳文件超過此大小時轉存磁碟
+    message_format: str = "html"  # 框架訊息的解析模式：html 或 markdown_v2
+    form_mode: bool = False  # 以一則持續編輯的表單訊息收集參數，減少發送的訊息數
+    optional_summary: bool = False  # 以一個摘要鍵盤一次設置所有可選參數
+    choice_page_size: int = 20  # 選擇參數鍵盤每頁的選項數
+    choice_columns: int = 2  # 選擇參數鍵盤的欄數
+    choice_filter: bool = True  # 選擇參數等待中時輸入文字按前綴篩選選項
+    callback_secret: Optional[str] = None  # 按鈕回調數據的簽名密鑰（預設由 bot_token 派生）
+    inline_search: bool = True  # 是否回應內聯查詢（@bot 關鍵字）搜尋命令；需在 BotFather 啟用 inline mode
+    inline_cache_time: int = 300  # Telegram 伺服器快取內聯查詢結果的秒數
+    hot_reload: bool = False  # 是否監視 cli_module_path 並熱重載
+    hot_reload_interval: float = 1.0  # 熱重載輪詢間隔（秒）
+    run_mode: str = "polling"  # 運行模式：polling 或 webhook
+    webhook_url: Optional[str] = None  # webhook模式的公開URL
+    webhook_listen: str = "0.0.0.0"  # webhook監聽地址
+    webhook_port: int = 8443  # webhook監聽端口
+    webhook_secret: Optional[str] = None  # webhook密鑰
+    executor_type: str = "inline"  # 命令執行器：inline 或 thread
+    executor_workers: Optional[int] = None  # 執行緒池大小
+    max_concurrent_updates: Optional[int] = None  # 同時處理的更新數量上限
+    max_concurrent_commands: Optional[int] = None  # 同時執行的命令數量上限
+    session_backend: str = "memory"  # 會話後端：memory 或 sqlite
+    session_path: Optional[str] = None  # sqlite會話後端的資料庫路徑
+    bulk_max_rows: int = 1000  # /bulk 批量文件的最大行數
+    bulk_concurrency: int = 8  # /bulk 同時執行的行數上限（max_concurrent_commands 仍然生效）
+    schedule_path: Optional[str] = None  # 排程的SQLite資料庫路徑，None 表示只保存在記憶體
+    schedule_min_interval: float = 60.0  # /schedule 允許的最短間隔（秒）
+    schedule_misfire_grace: float = 60.0  # 到期超過此秒數才執行視為錯過，按排程的策略略過或補執行
+    schedule_max_per_user: int = 20  # 每個用戶的排程數上限
+    history_size: int = 10  # 每個用戶保留的最近執行記錄數（重新執行按鈕和 /recent）；0 表示停用
+    base_url: Optional[str] = None  # Bot API地址（例如本地假伺服器），預設為官方API
+    base_file_url: Optional[str] = None  # 檔案下載地址
+    record_updates_path: Optional[str] = None  # 錄製所有更新到此壓縮JSONL檔案（.jsonl.gz）
+    enable_metrics: bool = False  # 是否收集指標（設置 metrics_port 時自動啟用）
+    metrics_host: str = "127.0.0.1"  # /metrics 端點監聽地址
+    metrics_port: Optional[int] = None  # /metrics 端點端口，None 表示不開啟HTTP端點
+    trace_path: Optional[str] = None  # 將追蹤span寫入此JSONL檔案
+    trace_exporter: Any = None  # 自定義span匯出器（優先於 trace_path）
+    audit_path: Optional[str] = None  # 審計日誌路徑，None 表示不記錄
+    audit_backend: str = "jsonl"  # 審計後端：jsonl 或 sqlite
+    audit_max_bytes: int = 10 * 1024 * 1024  # 審計日誌檔案超過此大小時輪替
+    audit_backup_count: int = 5  # 保留的輪替檔案數量
 
 
 class TelegramClickContext:
     """命令執行上下文"""
-    def __init__(self, update: Update, user_id: int, chat_id: int):
+    def __init__(self, update: "Update", user_id: int, chat_id: int):
         self.update = update
         self.user_id = user_id
         self.chat_id = chat_id
@@ -66,6 +118,18 @@ class TelegramClickContext:
         self.required_params: List[click.Parameter] = []
         self.command_name: str = ""
         self.waiting_for_input: bool = False
+        self.form_message_id: Optional[int] = None  # 表單模式下重複編輯的訊息
+        self.editing_param: Optional[str] = None  # 可選參數摘要中正在輸入的參數
+        self.choice_filter: Optional[str] = None  # 選擇參數鍵盤的篩選前綴
+        self.uploads: List[Any] = []  # 上傳文件的暫存檔案或目錄，會話結束時清理
+        self.bulk: bool = False  # /bulk 會話：等待上傳批量文件，而不是逐個收集參數
+        self.started_at: float = time.monotonic()  # 會話開始時間，用於統計參數收集耗時
+    
+    def release_uploads(self):
+        """清理上傳文件的暫存檔案"""
+        for resource in self.uploads:
+            release_upload(resource)
+        self.uploads.clear()
 
 
 @dataclass
@@ -75,3 +139,5 @@ class ConversionResult:
     message: str = ""
     data: Any = None
     error: Optional[Exception] = None
+    elapsed: float = 0.0  # 執行耗時（秒）
+    queue_wait: float = 0.0  # 在執行器排隊等待的時間（秒）
@@ -0,0 +1,137 @@
+"""
+TelegramClick上傳模組
+把用戶上傳的文件交給 click.File / click.Path 參數：File 參數得到暫存檔案對象，
+Path 參數得到暫存目錄中的路徑；會話結束時清理
+"""
+
+import asyncio
+import io
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, AsyncIterator, BinaryIO, Tuple
+
+import click
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Bot API 的 getFile 只能下載不超過20MB的檔案
+BOT_API_DOWNLOAD_LIMIT = 20 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """上傳的檔案超過大小上限"""
+
+
+def accepts_upload(param: click.Parameter) -> bool:
+    """參數是否接受上傳的文件：讀取模式的 click.File，或允許檔案的 click.Path"""
+    param_type = param.type
+    if isinstance(param_type, click.File):
+        return "r" in param_type.mode
+    if isinstance(param_type, click.Path):
+        return param_type.file_okay
+    return False
+
+
+def safe_file_name(file_name: str) -> str:
+    """去掉路徑部分，避免上傳的檔名跳出暫存目錄"""
+    name = os.path.basename((file_name or "").replace("\\", "/")).strip()
+    return name if name not in ("", ".", "..") else "upload"
+
+
+async def iter_download(telegram_file: Any, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    逐塊讀取 getFile 返回的文件
+
+    本地Bot API伺服器的檔案直接分塊讀取；Bot 使用 HTTPXRequest 時以 httpx 的串流回應讀取；
+    請求對象提供 stream(url, chunk_size) 時使用它（例如 testing.InProcessRequest）。
+    其他請求實現沒有串流接口，只能經由 retrieve 一次取得整個內容。
+    """
+    file_path = telegram_file.file_path
+    if file_path and os.path.isabs(file_path) and os.path.isfile(file_path):
+        with open(file_path, "rb") as f:
+            while chunk := await asyncio.to_thread(f.read, chunk_size):
+                yield chunk
+        return
+
+    url = telegram_file._get_encoded_url()
+    request = telegram_file.get_bot().request
+    client = getattr(request, "_client", None)
+    if isinstance(client, httpx.AsyncClient):
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise OSError(f"下載文件失敗: HTTP {response.status_code}")
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+    elif hasattr(request, "stream"):
+        async for chunk in request.stream(url, chunk_size):
+            yield chunk
+    else:
+        yield await request.retrieve(url)
+
+
+async def _download_to(telegram_file: Any, out: BinaryIO, file_name: str, max_bytes: int):
+    """把文件逐塊寫入 out，讀到的內容超過 max_bytes 時立即停止並拋出 UploadTooLarge"""
+    received = 0
+    chunks = iter_download(telegram_file)
+    try:
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > max_bytes:
+                raise UploadTooLarge(file_name)
+            out.write(chunk)
+    finally:
+        # 提前中止時立即關閉串流回應，不等生成器被回收
+        await chunks.aclose()
+
+
+async def receive_upload(telegram_file: Any, param: click.Parameter, file_name: str,
+                         max_bytes: int, spool_bytes: int) -> Tuple[Any, Any]:
+    """
+    下載文件並轉換為參數值，返回 (參數值, 待清理的資源)
+
+    內容經 iter_download 逐塊寫入，記憶體中最多只有一塊；讀到的內容超過 max_bytes 時
+    中止下載並拋出 UploadTooLarge（file_size 可能缺少或不準確）。
+    click.File 寫入 SpooledTemporaryFile：不超過 spool_bytes 時留在記憶體，超過後轉存磁碟；
+    文字模式以 TextIOWrapper 按參數的編碼解碼。click.Path 寫入獨立的暫存目錄並保留原檔名，
+    再以參數類型驗證（path_type 等照常生效）。
+    """
+    param_type = param.type
+    if isinstance(param_type, click.File):
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+        try:
+            await _download_to(telegram_file, spool, file_name, max_bytes)
+            spool.seek(0)
+        except BaseException:
+            spool.close()
+            raise
+        if "b" in param_type.mode:
+            return spool, spool
+        text = io.TextIOWrapper(spool, encoding=param_type.encoding or "utf-8",
+                                errors=param_type.errors or "strict")
+        return text, text
+
+    directory = tempfile.mkdtemp(prefix="telegram-click-")
+    try:
+        path = os.path.join(directory, safe_file_name(file_name))
+        with open(path, "wb") as out:
+            await _download_to(telegram_file, out, file_name, max_bytes)
+        value = param_type.convert(path, param, None)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return value, directory
+
+
+def release_upload(resource: Any):
+    """清理 receive_upload 返回的資源（關閉檔案或刪除暫存目錄）"""
+    if isinstance(resource, str):
+        shutil.rmtree(resource, ignore_errors=True)
+        return
+    try:
+        resource.close()
+    except OSError as e:
+        logger.warning("關閉上傳的暫存檔案失敗: %s", e)
@@ -2,30 +2,61 @@
 TelegramClick工具函數模組
 """
 
+import asyncio
+import contextvars
 import inspect
 import logging
 import importlib.util
 import contextlib
+import sys
+import time
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Any, Optional, Dict, List
-from io import StringIO
+from typing import Any, Optional, Dict, List, Tuple
+from io import StringIO, TextIOBase
 import click
 
 from .types import ParameterType, TelegramParameter, ConversionResult
+from .markup import Renderer, escape_markdown_v2, get_renderer, truncate_escaped
+from .validation import compile_validator
+
+try:
+    from click._utils import UNSET as _CLICK_UNSET  # click >= 8.3
+except ImportError:
+    _CLICK_UNSET = object()
 
 # 設置日誌
 logger = logging.getLogger(__name__)
 
 
-def setup_logging(enable: bool = True, level: str = "INFO"):
-    """設置日誌配置"""
+def setup_logging(
+    enable: bool = True,
+    level: str = "INFO",
+    log_format: str = "text",
+    use_queue: bool = False,
+    debug_sample_rate: float = 1.0
+):
+    """
+    設置日誌配置
+    
+    預設與 logging.basicConfig 相同；要求JSON格式、佇列寫出或除錯取樣時安裝日誌管線。
+    兩者都只在根日誌器尚未配置處理器時生效。
+    """
     if not enable:
         return
     
-    logging.basicConfig(
-        level=getattr(logging, level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    if log_format == "text" and not use_queue and debug_sample_rate >= 1:
+        logging.basicConfig(
+            level=getattr(logging, level.upper()),
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        return
+    
+    from . import logpipeline
+    root = logging.getLogger()
+    if root.handlers and (logpipeline._pipeline is None or logpipeline._pipeline.handler not in root.handlers):
+        return
+    logpipeline.configure_logging(level, log_format, use_queue, debug_sample_rate)
 
 
 def load_module_from_path(module_path: str) -> Any:
@@ -40,7 +71,7 @@ def load_module_from_path(module_path: str) -> Any:
         spec.loader.exec_module(module)
         return module
     except Exception as e:
-        logger.error(f"載入模組失敗: {e}")
+        logger.error("載入模組失敗: %s", e)
         raise
 
 
@@ -82,39 +113,19 @@ def convert_click_param_to_telegram(click_param: click.Parameter) -> Optional[Te
 
 
 def validate_and_convert_parameter_value(text: str, param: click.Parameter) -> ConversionResult:
-    """驗證和轉換參數值"""
-    try:
-        param_type = param.type
-        
-        if param_type is click.INT:
-            value = int(text)
-        elif param_type is click.FLOAT:
-            value = float(text)
-        elif isinstance(param_type, click.Choice):
-            if text not in param_type.choices:
-                return ConversionResult(
-                    success=False,
-                    message=f"必須選擇: {', '.join(param_type.choices)}"
-                )
-            value = text
-        elif param_type is click.BOOL:
-            value = text.lower() in ('true', '1', 'yes', 'on', '是', 'y')
-        else:
-            value = text
-        
-        return ConversionResult(success=True, data=value)
-        
-    except ValueError as e:
-        error_msg = "請輸入有效的數字" if param.type in (click.INT, click.FLOAT) else str(e)
-        return ConversionResult(
-            success=False, 
-            message=error_msg,
-            error=e
-        )
+    """驗證和轉換參數值（每次調用都重新編譯；框架內按參數快取編譯後的驗證函數）"""
+    return compile_validator(param)(text)
+
 
+def format_output_message(result: Any, max_length: int = 4000,
+                          renderer: Optional[Renderer] = None) -> str:
+    """
+    格式化輸出訊息
 
-def format_output_message(result: Any, max_length: int = 4000) -> str:
-    """格式化輸出訊息"""
+    輸出按 renderer 的解析模式轉義後放入程式碼區塊，含反引號等字符的輸出不會破壞訊息；
+    截斷以轉義後的長度計算。
+    """
+    renderer = renderer or get_renderer()
     if result is None:
         return "✅ 命令執行完成"
     
@@ -124,10 +135,14 @@ def format_output_message(result: Any, max_length: int = 4000) -> str:
     if not output:
         return "✅ 命令執行完成"
     
-    if len(output) > max_length:
-        output = output[:max_length-50] + "\n\n... (輸出過長，已截斷)"
+    header = f"✅ {renderer.bold('執行結果：')}\n"
+    budget = max_length - len(header) - renderer.pre_overhead
+    escaped = renderer.escape_code(output)
+    if len(escaped) > budget:
+        notice = renderer.escape_code("\n\n... (輸出過長，已截斷)")
+        escaped = truncate_escaped(output, max(budget - len(notice), 0), renderer.escape_code) + notice
     
-    return f"✅ **執行結果：**\n```\n{output}\n```"
+    return header + renderer.pre(escaped, escaped=True)
 
 
 def extract_commands_from_click_group(group: click.Group) -> Dict[str, click.Command]:
@@ -136,7 +151,7 @@ def extract_commands_from_click_group(group: click.Group) -> Dict[str, click.Com
     
     for name, command in group.commands.items():
         commands[name] = command
-        logger.debug(f"提取命令: {name}")
+        logger.debug("提取命令: %s", name)
     
     return commands
 
@@ -152,11 +167,11 @@ def find_click_objects_in_module(module: Any) -> Dict[str, click.Command]:
             # 如果是群組，提取其中的命令
             group_commands = extract_commands_from_click_group(attr)
             commands.update(group_commands)
-            logger.debug(f"找到Click群組: {attr_name}，包含 {len(group_commands)} 個命令")
+            logger.debug("找到Click群組: %s，包含 %s 個命令", attr_name, len(group_commands))
             
         elif isinstance(attr, click.Command):
             commands[attr_name] = attr
-            logger.debug(f"找到Click命令: {attr_name}")
+            logger.debug("找到Click命令: %s", attr_name)
     
     return commands
 
@@ -168,6 +183,11 @@ def is_user_authorized(user_id: int, admin_users: List[int]) -> bool:
     return user_id in admin_users
 
 
+def is_user_admin(user_id: int, admin_users: List[int]) -> bool:
+    """檢查用戶是否可使用管理命令（必須明確列在管理員列表中）"""
+    return bool(admin_users) and user_id in admin_users
+
+
 def should_include_command(name: str, whitelist: List[str], blacklist: List[str]) -> bool:
     """檢查是否應該包含這個命令"""
     if blacklist and name in blacklist:
@@ -179,24 +199,102 @@ def should_include_command(name: str, whitelist: List[str], blacklist: List[str]
     return True
 
 
-async def safe_call_function(func: Any, params: Dict[str, Any]) -> ConversionResult:
-    """安全地調用函數（支援同步和異步），並捕獲標準輸出"""
+class _CaptureRouter(TextIOBase):
+    """
+    依執行上下文路由寫入的輸出串流
+    
+    contextlib.redirect_stdout 會替換全域的 sys.stdout，在執行緒池中並發
+    執行命令時會互相污染輸出。此串流只在當前上下文設置了捕獲緩衝時寫入
+    緩衝，否則寫入原始串流。
+    """
+    
+    def __init__(self, fallback, buffer_var: contextvars.ContextVar):
+        self._fallback = fallback
+        self._buffer_var = buffer_var
+    
+    def write(self, text: str) -> int:
+        buffer = self._buffer_var.get()
+        if buffer is None:
+            return self._fallback.write(text)
+        return buffer.write(text)
+    
+    def flush(self):
+        if self._buffer_var.get() is None:
+            self._fallback.flush()
+    
+    def writable(self) -> bool:
+        return True
+    
+    def isatty(self) -> bool:
+        return self._buffer_var.get() is None and self._fallback.isatty()
+    
+    def fileno(self) -> int:
+        return self._fallback.fileno()
+    
+    @property
+    def encoding(self):
+        return getattr(self._fallback, "encoding", "utf-8")
+
+
+_stdout_buffer: contextvars.ContextVar = contextvars.ContextVar("telegram_click_stdout", default=None)
+_stderr_buffer: contextvars.ContextVar = contextvars.ContextVar("telegram_click_stderr", default=None)
+
+
+def _install_capture_routers():
+    """確保 sys.stdout/sys.stderr 是捕獲路由器（可重複調用）"""
+    if not isinstance(sys.stdout, _CaptureRouter):
+        sys.stdout = _CaptureRouter(sys.stdout, _stdout_buffer)
+    if not isinstance(sys.stderr, _CaptureRouter):
+        sys.stderr = _CaptureRouter(sys.stderr, _stderr_buffer)
+
+
+def _call_with_capture(func: Any, params: Dict[str, Any]) -> Tuple[Any, str, str]:
+    """在當前上下文中調用同步函數並捕獲輸出"""
+    stdout_capture = StringIO()
+    stderr_capture = StringIO()
+    stdout_token = _stdout_buffer.set(stdout_capture)
+    stderr_token = _stderr_buffer.set(stderr_capture)
     try:
-        # 使用 StringIO 捕獲標準輸出和錯誤輸出
-        stdout_capture = StringIO()
-        stderr_capture = StringIO()
-        
-        with contextlib.redirect_stdout(stdout_capture), \
-             contextlib.redirect_stderr(stderr_capture):
+        result = func(**params)
+    finally:
+        _stdout_buffer.reset(stdout_token)
+        _stderr_buffer.reset(stderr_token)
+    return result, stdout_capture.getvalue(), stderr_capture.getvalue()
+
+
+async def safe_call_function(
+    func: Any,
+    params: Dict[str, Any],
+    executor: Optional[Executor] = None
+) -> ConversionResult:
+    """
+    安全地調用函數（支援同步和異步），並捕獲標準輸出
+    
+    提供 executor 時，同步函數會在該執行器中執行，不阻塞事件循環。
+    """
+    started = time.perf_counter()
+    try:
+        if inspect.iscoroutinefunction(func):
+            # 異步函數在事件循環中運行，使用原有的重定向方式
+            stdout_capture = StringIO()
+            stderr_capture = StringIO()
             
-            if inspect.iscoroutinefunction(func):
+            with contextlib.redirect_stdout(stdout_capture), \
+                 contextlib.redirect_stderr(stderr_capture):
                 result = await func(**params)
+            
+            stdout_output = stdout_capture.getvalue()
+            stderr_output = stderr_capture.getvalue()
+        else:
+            _install_capture_routers()
+            if executor is None:
+                result, stdout_output, stderr_output = _call_with_capture(func, params)
             else:
-                result = func(**params)
-        
-        # 獲取捕獲的輸出
-        stdout_output = stdout_capture.getvalue()
-        stderr_output = stderr_capture.getvalue()
+                loop = asyncio.get_running_loop()
+                context = contextvars.copy_context()
+                result, stdout_output, stderr_output = await loop.run_in_executor(
+                    executor, context.run, _call_with_capture, func, params
+                )
         
         # 合併輸出和返回值
         combined_output = ""
@@ -215,25 +313,22 @@ async def safe_call_function(func: Any, params: Dict[str, Any]) -> ConversionRes
             # 沒有標準輸出時，直接返回原始結果
             final_result = result
         
-        return ConversionResult(success=True, data=final_result)
+        return ConversionResult(
+            success=True,
+            data=final_result,
+            elapsed=time.perf_counter() - started
+        )
         
     except Exception as e:
-        logger.error(f"函數調用失敗: {e}")
+        logger.error("函數調用失敗: %s", e)
         return ConversionResult(
             success=False,
             message=f"執行錯誤：{str(e)}",
-            error=e
+            error=e,
+            elapsed=time.perf_counter() - started
         )
 
 
-def escape_markdown_v2(text: str) -> str:
-    """轉義MarkdownV2特殊字符"""
-    escape_chars = r'_*[]()~`>#+-=|{}.!'
-    for char in escape_chars:
-        text = text.replace(char, f'\\{char}')
-    return text
-
-
 def truncate_text(text: str, max_length: int = 100) -> str:
     """截斷文字並添加省略號"""
     if len(text) <= max_length:
@@ -241,6 +336,16 @@ def truncate_text(text: str, max_length: int = 100) -> str:
     return text[:max_length-3] + "..."
 
 
+def get_parameter_default(command: click.Command, param: click.Parameter) -> Any:
+    """參數的默認值（可調用的默認值會被調用）；沒有默認值時返回None"""
+    try:
+        value = param.get_default(click.Context(command))
+    except Exception as e:
+        logger.debug("無法取得參數 %s 的默認值: %s", param.name, e)
+        return None
+    return None if value is _CLICK_UNSET else value
+
+
 def get_parameter_display_name(param: click.Parameter) -> str:
     """獲取參數的顯示名稱"""
     if isinstance(param, click.Option):
@@ -250,14 +355,16 @@ def get_parameter_display_name(param: click.Parameter) -> str:
     return "未知參數"
 
 
-def format_command_help(command: click.Command, custom_help: Dict[str, str]) -> str:
+def format_command_help(command: click.Command, custom_help: Dict[str, str],
+                        renderer: Optional[Renderer] = None) -> str:
     """格式化命令幫助文字"""
+    renderer = renderer or get_renderer()
     command_name = command.name
     
     # 使用自定義幫助或原始幫助
     description = custom_help.get(command_name, command.help or "無描述")
     
-    help_text = f"🔸 `/{command_name}` - {description}\n"
+    help_text = f"🔸 {renderer.code('/' + command_name)} - {renderer.escape(description)}\n"
     
     # 顯示參數資訊
     if hasattr(command, 'params') and command.params:
@@ -266,6 +373,6 @@ def format_command_help(command: click.Command, custom_help: Dict[str, str]) ->
             if isinstance(param, click.Option):
                 required = "✳️" if param.required else "🔸"
                 param_help = param.help or "無說明"
-                help_text += f"   {required} `--{param.name}`: {param_help}\n"
+                help_text += f"   {required} {renderer.code('--' + param.name)}: {renderer.escape(param_help)}\n"
     
     return help_text
@@ -0,0 +1,182 @@
+"""
+TelegramClick參數驗證模組
+每個參數編譯一次驗證函數：按參數類型選好轉換路徑，輸入時以 Click 的 ParamType 轉換
+並執行參數回調，無效的輸入在收集時就被拒絕，而不是在命令執行時失敗
+"""
+
+import io
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import click
+
+from .types import ConversionResult
+
+logger = logging.getLogger(__name__)
+
+# 驗證函數：(輸入文字, 已收集的參數) -> 轉換結果
+Validator = Callable[..., ConversionResult]
+
+TRUE_WORDS = frozenset({"true", "1", "yes", "on", "是", "y"})
+FALSE_WORDS = frozenset({"false", "0", "no", "off", "否", "n"})
+BATCH_HINT = "可一次輸入多個值，以換行、逗號或空格分隔"
+
+
+def _convert_bool(text: str, param_type: click.ParamType, param: click.Parameter) -> Any:
+    word = text.strip().lower()
+    if word in TRUE_WORDS:
+        return True
+    if word in FALSE_WORDS:
+        return False
+    raise click.BadParameter("請輸入 是/否（true/false）", param=param)
+
+
+def _convert_choice(text: str, param_type: click.ParamType, param: click.Parameter) -> Any:
+    try:
+        return param_type.convert(text, param, None)
+    except click.BadParameter:
+        choices = ", ".join(str(choice) for choice in param_type.choices)
+        raise click.BadParameter(f"必須選擇: {choices}", param=param) from None
+
+
+def _convert_number(text: str, param_type: click.ParamType, param: click.Parameter) -> Any:
+    try:
+        return param_type.convert(text.strip(), param, None)
+    except click.BadParameter:
+        raise click.BadParameter("請輸入有效的數字", param=param) from None
+
+
+def _convert_with_type(text: str, param_type: click.ParamType, param: click.Parameter) -> Any:
+    return param_type.convert(text, param, None)
+
+
+def _keep_text(text: str, param_type: click.ParamType, param: click.Parameter) -> Any:
+    return text
+
+
+def _pasted_file(text: str, param_type: click.ParamType, param: click.Parameter) -> Any:
+    """讀取模式的檔案參數：貼上的文字就是檔案內容（上傳文件見 uploads 模組）"""
+    if "b" in param_type.mode:
+        return io.BytesIO(text.encode(param_type.encoding or "utf-8"))
+    return io.StringIO(text)
+
+
+Converter = Callable[[str, click.ParamType, click.Parameter], Any]
+
+
+def _select_converter(param_type: click.ParamType) -> Converter:
+    """按參數類型選擇轉換函數（只在編譯時判斷一次）"""
+    if isinstance(param_type, click.types.BoolParamType):
+        return _convert_bool
+    if isinstance(param_type, click.Choice):
+        return _convert_choice
+    if param_type is click.INT or param_type is click.FLOAT:
+        return _convert_number
+    if isinstance(param_type, click.File):
+        # 不以輸入的文字作為路徑在伺服器上打開檔案
+        return _pasted_file if "r" in param_type.mode else _keep_text
+    if param_type is click.STRING:
+        return _keep_text
+    return _convert_with_type
+
+
+def accepts_batch(param: click.Parameter) -> bool:
+    """參數是否接受多個值（multiple=True 或 nargs != 1）"""
+    return bool(getattr(param, "multiple", False)) or param.nargs != 1
+
+
+def split_batch(text: str) -> List[str]:
+    """按換行分隔；沒有換行時按逗號；都沒有時按空白"""
+    if "\n" in text:
+        parts = text.splitlines()
+    elif "," in text:
+        parts = text.split(",")
+    else:
+        parts = text.split()
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _compile_batch(param: click.Parameter) -> Callable[[str], Any]:
+    """
+    multiple/nargs 參數：一則訊息中的所有值一次轉換，錯誤一起回報
+
+    nargs > 1 的每組值按位置使用 click.Tuple 的各個類型；multiple 且 nargs > 1 時每行一組。
+    """
+    nargs = param.nargs
+    multiple = bool(getattr(param, "multiple", False))
+    if isinstance(param.type, click.Tuple):
+        item_types = list(param.type.types)
+    else:
+        item_types = [param.type] * max(nargs, 1)
+    converters = [(_select_converter(item_type), item_type) for item_type in item_types]
+
+    def convert_group(items: List[str], errors: List[str], label: str = "") -> Tuple:
+        if nargs > 1 and len(items) != nargs:
+            errors.append(f"{label}需要 {nargs} 個值，收到 {len(items)} 個")
+            return ()
+        values = []
+        for position, item in enumerate(items):
+            convert, item_type = converters[position % len(converters)]
+            try:
+                values.append(convert(item, item_type, param))
+            except click.BadParameter as e:
+                errors.append(f"{label}第 {position + 1} 項「{item}」：{e.message}")
+        return tuple(values)
+
+    def convert(text: str) -> Any:
+        errors: List[str] = []
+        if multiple and nargs > 1:
+            rows = [line for line in text.splitlines() if line.strip()]
+            value = tuple(
+                convert_group(split_batch(row.replace(",", " ")), errors, f"第 {index + 1} 行")
+                for index, row in enumerate(rows)
+            )
+        else:
+            value = convert_group(split_batch(text), errors)
+        if not value and not errors:
+            errors.append("至少需要一個值")
+        if errors:
+            raise click.BadParameter("\n".join(errors), param=param)
+        return value
+
+    return convert
+
+
+def compile_validator(param: click.Parameter, command: Optional[click.Command] = None) -> Validator:
+    """
+    編譯參數的驗證函數
+
+    轉換使用參數類型的 convert（IntRange 範圍、Path 存在性、DateTime、UUID、自定義類型等），
+    multiple/nargs 參數接受一則訊息中的多個值並轉換為元組。之後執行參數回調；
+    回調中 ctx.params 為已收集的參數。expose_value=False 的參數
+    （例如 --version）的回調是動作而不是驗證，不會執行。
+    """
+    if accepts_batch(param):
+        convert = _compile_batch(param)
+    else:
+        convert_one, param_type = _select_converter(param.type), param.type
+
+        def convert(text: str) -> Any:
+            return convert_one(text, param_type, param)
+
+    callback = param.callback if param.expose_value else None
+    command = command or click.Command(param.name or "command")
+
+    def validate(text: str, params: Optional[Dict[str, Any]] = None) -> ConversionResult:
+        try:
+            value = convert(text)
+            if callback is not None:
+                ctx = click.Context(command)
+                ctx.params.update(params or {})
+                value = callback(ctx, param, value)
+        except click.BadParameter as e:
+            return ConversionResult(success=False, message=e.message, error=e)
+        except (click.UsageError, ValueError, TypeError) as e:
+            return ConversionResult(success=False, message=str(e), error=e)
+        except Exception as e:
+            # 自定義類型或回調的程式錯誤：記錄完整堆疊，不把內部細節回覆給用戶
+            logger.exception("驗證參數 %s 時出錯", param.name)
+            return ConversionResult(success=False, message="無效的值", error=e)
+        return ConversionResult(success=True, data=value)
+
+    return validate
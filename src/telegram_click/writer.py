@@ -0,0 +1,84 @@
+"""
+TelegramClick背景寫入模組
+審計日誌、更新錄製和span匯出共用的背景寫入執行緒：佇列、批次提交和關閉時寫完剩餘項目
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """
+    在背景執行緒批次寫入的佇列
+
+    put() 只把項目放入佇列，不阻塞調用者；背景執行緒每收集 batch_size 個項目或
+    等待 flush_interval 秒後，以一次 write_batch 調用寫入（group commit）。
+    close() 寫完佇列中剩餘的項目後才返回。write_batch 只在背景執行緒中調用。
+    """
+
+    def __init__(self, write_batch: Callable[[List[Any]], None], name: str,
+                 batch_size: int = 100, flush_interval: float = 1.0):
+        self.write_batch = write_batch
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, item: Any):
+        """放入一個待寫入的項目（非阻塞）"""
+        self._queue.put(item)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = []
+            flushed: Optional[threading.Event] = None
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    flushed = item
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self.write_batch(batch)
+                except Exception as e:
+                    logger.error("%s 寫入 %s 個項目失敗: %s", self.name, len(batch), e)
+            if flushed is not None:
+                flushed.set()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待佇列中已有的項目寫入（阻塞）"""
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """寫入佇列中剩餘的項目並結束背景執行緒"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
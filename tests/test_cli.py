@@ -9,7 +9,9 @@ from pathlib import Path
 from click.testing import CliRunner
 from unittest.mock import patch, Mock
 
-from telegram_click.cli import main, create, wrap, script, info
+from telegram_click.cli import (
+    main, create, wrap, script, info, serve, bench, bench_escape, deep_link, replay, traces
+)
 
 
 class TestCLICommands:
@@ -268,6 +270,270 @@ class TestInfoCommand:
         assert "GitHub" in result.output
 
 
+class TestServeCommand:
+    """測試serve命令"""
+    
+    def setup_method(self):
+        self.runner = CliRunner()
+    
+    def _write_cli(self):
+        with open('my_cli.py', 'w') as f:
+            f.write('import click\n@click.group()\ndef cli(): pass')
+    
+    def test_serve_requires_token(self):
+        """測試缺少Token時失敗"""
+        with self.runner.isolated_filesystem():
+            self._write_cli()
+            result = self.runner.invoke(serve, ['my_cli.py'], env={'BOT_TOKEN': ''})
+            assert result.exit_code == 1
+            assert "Bot Token" in result.output
+    
+    def test_serve_webhook_requires_url(self):
+        """測試webhook模式需要URL"""
+        with self.runner.isolated_filesystem():
+            self._write_cli()
+            result = self.runner.invoke(serve, ['my_cli.py', '--token', '1:abc', '--mode', 'webhook'])
+            assert result.exit_code == 1
+            assert "--webhook-url" in result.output
+    
+    def test_serve_passes_runtime_flags(self):
+        """測試運行參數傳遞給轉換器配置"""
+        with self.runner.isolated_filesystem():
+            self._write_cli()
+            with patch('telegram_click.factory.create_bot_from_cli_file') as mock_create:
+                result = self.runner.invoke(
+                    serve,
+                    ['my_cli.py', '--executor', 'thread', '--workers', '8',
+                     '--max-concurrent-commands', '4', '--admin-users', '1,2',
+                     '--log-format', 'json', '--log-queue', '--log-debug-sample', '0.1',
+                     '--form-mode', '--optional-summary', '--schedule-db', 'schedules.db'],
+                    env={'BOT_TOKEN': '1:abc', 'TELEGRAM_CLICK_SESSION_BACKEND': 'sqlite',
+                         'TELEGRAM_CLICK_CALLBACK_SECRET': 's3cret'}
+                )
+            
+            assert result.exit_code == 0, result.output
+            kwargs = mock_create.call_args.kwargs
+            assert kwargs['bot_token'] == '1:abc'
+            assert kwargs['executor_type'] == 'thread'
+            assert kwargs['executor_workers'] == 8
+            assert kwargs['max_concurrent_commands'] == 4
+            assert kwargs['session_backend'] == 'sqlite'
+            assert kwargs['admin_users'] == [1, 2]
+            assert kwargs['log_format'] == 'json'
+            assert kwargs['log_queue'] is True
+            assert kwargs['log_debug_sample_rate'] == 0.1
+            assert kwargs['form_mode'] is True
+            assert kwargs['optional_summary'] is True
+            assert kwargs['schedule_path'] == 'schedules.db'
+            assert kwargs['callback_secret'] == 's3cret'
+            mock_create.return_value.run.assert_called_once()
+
+
+class TestBenchCommand:
+    """測試bench命令"""
+    
+    CLI_SOURCE = '''
+import click
+
+@click.group()
+def cli():
+    pass
+
+@cli.command()
+@click.option('--name', required=True)
+@click.option('--age', type=int, required=True)
+@click.option('--env', type=click.Choice(['dev', 'prod']), required=True)
+@click.option('--note', help='備註')
+def greet(name, age, env, note):
+    return f"Hello {name} {age} {env} {note}"
+
+@cli.command()
+def ping():
+    print("pong")
+'''
+    
+    def setup_method(self):
+        self.runner = CliRunner()
+    
+    def test_bench_runs_full_conversations(self):
+        """測試基準測試完成所有命令對話"""
+        import json
+        
+        with self.runner.isolated_filesystem():
+            Path('bench_cli.py').write_text(self.CLI_SOURCE, encoding='utf-8')
+            result = self.runner.invoke(bench, [
+                'bench_cli.py', '--users', '3', '--iterations', '4',
+                '--mix', 'greet=3,ping=1', '--synthetic-commands', '5', '--json'
+            ])
+        
+        assert result.exit_code == 0, result.output
+        report = json.loads(result.output)
+        assert report['commands'] == 12
+        assert report['errors'] == 0
+        assert report['updates'] > report['commands']
+        assert set(report['per_command']) <= {'greet', 'ping'}
+        assert report['command_latency']['p99_ms'] >= report['command_latency']['p50_ms']
+    
+    def test_bench_hyphenated_command(self):
+        """測試含破折號的命令以Telegram命令名發送，並且真正執行"""
+        import asyncio
+        from telegram_click import create_bot_from_cli_file
+        from telegram_click.bench import run_benchmark
+        from telegram_click.testing import FAKE_BOT_TOKEN, FakeBotAPI
+        
+        source = self.CLI_SOURCE + """
+@cli.command('text-process')
+@click.option('--text', required=True)
+def text_process(text):
+    return text.upper()
+"""
+        with self.runner.isolated_filesystem():
+            Path('bench_cli.py').write_text(source, encoding='utf-8')
+            converter = create_bot_from_cli_file(FAKE_BOT_TOKEN, 'bench_cli.py', enable_logging=False)
+            api = FakeBotAPI()
+            report = asyncio.run(run_benchmark(
+                converter, users=2, iterations=2, mix={'text-process': 1}, values={'text': 'hi'}, api=api
+            ))
+        
+        assert report.commands == 4
+        assert report.errors == 0
+        assert sum("HI" in str(call.params.get("text")) for call in api.calls_to("sendMessage")) == 4
+    
+    def test_bench_counts_unexecuted_commands_as_errors(self):
+        """測試沒有建立會話、沒有執行的命令（例如用戶無權限）算作錯誤"""
+        import asyncio
+        from telegram_click import create_bot_from_cli_file
+        from telegram_click.bench import run_benchmark
+        from telegram_click.testing import FAKE_BOT_TOKEN
+        
+        with self.runner.isolated_filesystem():
+            Path('bench_cli.py').write_text(self.CLI_SOURCE, encoding='utf-8')
+            converter = create_bot_from_cli_file(
+                FAKE_BOT_TOKEN, 'bench_cli.py', enable_logging=False, admin_users=[1]
+            )
+            report = asyncio.run(run_benchmark(converter, users=1, iterations=3, mix={'ping': 1}))
+        
+        assert report.commands == 3
+        assert report.errors == 3
+    
+    def test_deep_link(self):
+        """測試產生預填參數的深度連結"""
+        with self.runner.isolated_filesystem():
+            Path('bench_cli.py').write_text(self.CLI_SOURCE, encoding='utf-8')
+            result = self.runner.invoke(deep_link, [
+                'bench_cli.py', 'greet', '--bot-username', 'my_bot', '--token', '123:abc',
+                '--param', 'name=Ann,env=prod'
+            ])
+            missing = self.runner.invoke(deep_link, [
+                'bench_cli.py', 'greet', '--bot-username', 'my_bot', '--token', '123:abc',
+                '--param', 'colour=red'
+            ])
+        
+        assert result.exit_code == 0, result.output
+        assert result.output.startswith("https://t.me/my_bot?start=")
+        assert len(result.output.strip().rsplit('=', 1)[1]) <= 64
+        assert missing.exit_code == 1
+        assert "colour" in missing.output
+    
+    def test_bench_unknown_command(self):
+        """測試未知命令"""
+        with self.runner.isolated_filesystem():
+            Path('bench_cli.py').write_text(self.CLI_SOURCE, encoding='utf-8')
+            result = self.runner.invoke(bench, ['bench_cli.py', '--mix', 'missing=1'])
+        
+        assert result.exit_code == 1
+        assert "未知命令" in result.output
+    
+    def test_bench_escape(self):
+        """測試轉義基準測試列出各實作"""
+        result = self.runner.invoke(bench_escape, ['--size', '500', '--iterations', '10'])
+        
+        assert result.exit_code == 0, result.output
+        for name in ("legacy_replace", "markdown_v2", "html"):
+            assert name in result.output
+
+
+class TestReplayCommand:
+    """測試更新錄製與replay命令"""
+    
+    def setup_method(self):
+        self.runner = CliRunner()
+    
+    def test_record_and_replay(self):
+        """測試錄製基準測試產生的更新後重放"""
+        import asyncio
+        import json
+        from telegram_click import create_bot_from_cli_file
+        from telegram_click.bench import run_benchmark
+        from telegram_click.recording import read_recording
+        from telegram_click.testing import FAKE_BOT_TOKEN
+        
+        with self.runner.isolated_filesystem():
+            Path('bench_cli.py').write_text(TestBenchCommand.CLI_SOURCE, encoding='utf-8')
+            converter = create_bot_from_cli_file(
+                FAKE_BOT_TOKEN, 'bench_cli.py', enable_logging=False,
+                record_updates_path='updates.jsonl.gz'
+            )
+            bench_report = asyncio.run(run_benchmark(converter, users=2, iterations=3))
+            converter.recorder.close()
+            
+            records = list(read_recording('updates.jsonl.gz'))
+            assert len(records) == bench_report.updates
+            assert all(ts > 0 for ts, _ in records)
+            
+            result = self.runner.invoke(
+                replay, ['bench_cli.py', 'updates.jsonl.gz', '--speed', 'max', '--json']
+            )
+        
+        assert result.exit_code == 0, result.output
+        report = json.loads(result.output)
+        assert report['speed'] == 'max'
+        assert report['updates'] == bench_report.updates
+        assert report['users'] == 2
+        assert sum(report['histogram'].values()) == report['updates']
+    
+    def test_replay_invalid_speed(self):
+        """測試無效的速度"""
+        with self.runner.isolated_filesystem():
+            Path('bench_cli.py').write_text(TestBenchCommand.CLI_SOURCE, encoding='utf-8')
+            Path('empty.jsonl.gz').write_bytes(b'')
+            result = self.runner.invoke(replay, ['bench_cli.py', 'empty.jsonl.gz', '--speed', 'fast'])
+        
+        assert result.exit_code != 0
+        assert "無效的速度" in result.output
+
+
+class TestTracesCommand:
+    """測試追蹤span彙總"""
+    
+    def setup_method(self):
+        self.runner = CliRunner()
+    
+    def test_traces_summary(self):
+        """測試基準測試產生的span可按階段彙總"""
+        import asyncio
+        import json
+        from telegram_click import create_bot_from_cli_file
+        from telegram_click.bench import run_benchmark
+        from telegram_click.testing import FAKE_BOT_TOKEN
+        
+        with self.runner.isolated_filesystem():
+            Path('bench_cli.py').write_text(TestBenchCommand.CLI_SOURCE, encoding='utf-8')
+            converter = create_bot_from_cli_file(
+                FAKE_BOT_TOKEN, 'bench_cli.py', enable_logging=False, trace_path='spans.jsonl'
+            )
+            bench_report = asyncio.run(run_benchmark(converter, users=2, iterations=2))
+            converter.tracer.close()
+            
+            result = self.runner.invoke(traces, ['spans.jsonl', '--json'])
+        
+        assert result.exit_code == 0, result.output
+        summary = json.loads(result.output)
+        assert summary['handle_command']['count'] == bench_report.commands
+        assert summary['execute']['count'] == bench_report.commands
+        assert {'authorize', 'executor', 'send', 'collect_parameter'} <= set(summary)
+
+
 class TestTemplateGeneration:
     """測試模板生成功能"""
     
@@ -15,10 +15,55 @@ from telegram_click import (
     create_bot_from_click_group,
     telegram_bot
 )
-from telegram_click.types import ParameterType
+from telegram_click.types import ParameterType, TelegramClickContext
 from telegram_click.utils import convert_click_param_to_telegram
 
 
+class BotHarness:
+    """
+    以假Bot API在進程內運行轉換器
+    
+    進入時建立並初始化Application，退出時關閉它並執行轉換器的關閉清理；
+    api 記錄所有Bot API調用，退出後仍可用於斷言。
+    """
+    
+    def __init__(self, converter, api=None):
+        from telegram_click.testing import FakeBotAPI, UpdateFactory
+        
+        self.converter = converter
+        self.api = api if api is not None else FakeBotAPI()
+        self.updates = UpdateFactory()
+        self.app = None
+    
+    async def __aenter__(self):
+        from telegram_click.bench import build_bench_bot
+        
+        self.app = self.converter.build_application(bot=build_bench_bot(self.api))
+        await self.app.initialize()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.app.shutdown()
+        await self.converter._post_shutdown(self.app)
+    
+    async def feed(self, data):
+        await self.app.process_update(Update.de_json(data, self.app.bot))
+    
+    async def command(self, user_id, text):
+        await self.feed(self.updates.command(user_id, text))
+    
+    async def text(self, user_id, text):
+        await self.feed(self.updates.text(user_id, text))
+    
+    async def press(self, user_id, label):
+        """按下Bot最後一則訊息上以 label 開頭的按鈕"""
+        api = self.api
+        await self.feed(self.updates.callback(user_id, api.button_data(user_id, label), api.last_message[user_id]))
+    
+    async def upload(self, user_id, content, file_name):
+        await self.feed(self.updates.document(user_id, self.api.add_file(content, file_name)))
+
+
 class TestClickToTelegramConverter:
     """測試核心轉換器"""
     
@@ -284,6 +329,17 @@ class TestDecorators:
 
         info = test_cli.get_bot_info()
         assert info['admin_users'] == [123]
+    
+    def test_decorator_defers_converter(self):
+        """測試裝飾器延遲創建轉換器"""
+        @telegram_bot("test_token")
+        @click.group()
+        def test_cli():
+            pass
+
+        assert not test_cli.telegram_bot.is_built
+        assert isinstance(test_cli.telegram_bot.converter, ClickToTelegramConverter)
+        assert test_cli.telegram_bot.is_built
 
 
 class TestUtilityFunctions:
@@ -316,5 +372,1571 @@ class TestUtilityFunctions:
         assert is_user_authorized(789, [123, 456]) == False
 
 
+class TestHotReload:
+    """測試CLI模組熱重載"""
+    
+    CLI_SOURCE = '''
+import click
+
+@click.group()
+def cli():
+    pass
+
+@cli.command()
+@click.option('--name', required=True)
+def greet(name):
+    return "Hello " + name
+
+@cli.command()
+def status():
+    return "OK"
+'''
+    
+    @pytest.fixture
+    def cli_file(self, tmp_path):
+        path = tmp_path / "reload_cli.py"
+        path.write_text(self.CLI_SOURCE, encoding="utf-8")
+        return path
+    
+    def _make_converter(self, cli_file):
+        config = TelegramClickConfig(
+            bot_token="test_token",
+            cli_module_path=str(cli_file),
+            enable_logging=False
+        )
+        converter = ClickToTelegramConverter(config)
+        converter._discover_click_commands()
+        return converter
+    
+    @pytest.mark.asyncio
+    async def test_reload_without_changes(self, cli_file):
+        """測試無變更時不重建處理器，但換用新載入的命令對象"""
+        converter = self._make_converter(cli_file)
+        greet = converter.click_commands["greet"]
+        
+        diff = await converter.reload_cli_module()
+        
+        assert not diff.has_changes
+        assert sorted(diff.unchanged) == ["greet", "status"]
+        assert converter.click_commands["greet"] is not greet
+        assert converter.click_commands["greet"].params[0].name == "name"
+    
+    @pytest.mark.asyncio
+    async def test_reload_unchanged_path_and_file_params(self, tmp_path):
+        """測試 Path、File、Tuple 參數和可調用默認值在重載後指紋不變"""
+        path = tmp_path / "reload_cli.py"
+        path.write_text(
+            "import click\n\n"
+            "@click.group()\n"
+            "def cli():\n"
+            "    pass\n\n"
+            "@cli.command()\n"
+            "@click.option('--target', type=click.Path(), default=lambda: '/tmp')\n"
+            "@click.option('--log', type=click.File('w'))\n"
+            "@click.option('--size', type=click.Tuple([int, int]))\n"
+            "def backup(target, log, size):\n"
+            "    return target\n",
+            encoding="utf-8",
+        )
+        converter = self._make_converter(path)
+        fingerprint = converter.command_fingerprints["backup"]
+        
+        diff = await converter.reload_cli_module()
+        
+        assert not diff.has_changes
+        assert diff.unchanged == ["backup"]
+        assert converter.command_fingerprints["backup"] == fingerprint
+    
+    @pytest.mark.asyncio
+    async def test_reload_picks_up_helper_and_constant_changes(self, cli_file):
+        """測試只修改輔助函數或模組常數時，重載後執行新的代碼"""
+        source = self.CLI_SOURCE + '''
+LIMIT = 1
+
+def version():
+    return "v1"
+
+@cli.command()
+def info():
+    return version() + str(LIMIT)
+'''
+        cli_file.write_text(source, encoding="utf-8")
+        converter = self._make_converter(cli_file)
+        assert converter.click_commands["info"].callback() == "v11"
+        
+        cli_file.write_text(source.replace('"v1"', '"v2"').replace("LIMIT = 1", "LIMIT = 2"), encoding="utf-8")
+        diff = await converter.reload_cli_module()
+        
+        assert "info" in diff.unchanged
+        assert converter.click_commands["info"].callback() == "v22"
+    
+    @pytest.mark.asyncio
+    async def test_reload_diff_and_sessions(self, cli_file):
+        """測試增量更新，僅結束已變更命令的會話"""
+        converter = self._make_converter(cli_file)
+        status = converter.click_commands["status"]
+        converter._help_cache = {"greet": "old", "status": "cached"}
+        
+        greet_ctx = Mock(command_name="greet")
+        greet_ctx.update.effective_chat.send_message = AsyncMock()
+        status_ctx = Mock(command_name="status")
+        converter.user_contexts = {1: greet_ctx, 2: status_ctx}
+        
+        cli_file.write_text(
+            self.CLI_SOURCE.replace('"Hello "', '"Hi "') + '''
+@cli.command()
+def ping():
+    return "pong"
+''',
+            encoding="utf-8"
+        )
+        diff = await converter.reload_cli_module()
+        
+        assert diff.changed == ["greet"]
+        assert diff.added == ["ping"]
+        assert diff.unchanged == ["status"]
+        assert converter.click_commands["status"] is not status
+        assert "ping" in converter.click_commands
+        assert converter._help_cache == {"status": "cached"}
+        assert list(converter.user_contexts) == [2]
+        greet_ctx.update.effective_chat.send_message.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_reload_refreshes_hidden_params(self, cli_file):
+        """測試隱藏參數集合按命令快取，重載後重新計算"""
+        converter = self._make_converter(cli_file)
+        hidden = converter._hidden_param_names("greet")
+        assert hidden == frozenset()
+        assert converter._hidden_param_names("greet") is hidden
+        assert converter._hidden_param_names("missing") == frozenset()
+
+        cli_file.write_text(
+            self.CLI_SOURCE.replace("required=True)", "required=True, hide_input=True)"),
+            encoding="utf-8"
+        )
+        await converter.reload_cli_module()
+
+        assert converter._hidden_param_names("greet") == frozenset({"name"})
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+class TestLazyImport:
+    """測試導入開銷回歸"""
+    
+    def test_cli_mode_does_not_import_telegram(self):
+        """CLI模式調用不應載入 python-telegram-bot"""
+        import subprocess
+        import sys
+        
+        code = (
+            "import sys, click\n"
+            "from telegram_click import telegram_bot\n"
+            "@telegram_bot('test_token')\n"
+            "@click.group()\n"
+            "def cli():\n"
+            "    pass\n"
+            "@cli.command()\n"
+            "@click.option('--name', required=True)\n"
+            "def greet(name):\n"
+            "    click.echo('Hello ' + name)\n"
+            "cli(['greet', '--name', 'x'], standalone_mode=False)\n"
+            "assert 'telegram' not in sys.modules, 'telegram imported'\n"
+            "assert 'telegram_click.framework' not in sys.modules\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        
+        assert result.returncode == 0, result.stderr
+        assert "Hello x" in result.stdout
+    
+    def test_lazy_exports(self):
+        """測試延遲匯出的名稱可正常存取"""
+        import telegram_click
+        
+        for name in telegram_click.__all__:
+            assert getattr(telegram_click, name) is not None
+        
+        with pytest.raises(AttributeError):
+            telegram_click.not_an_export
+
+
+class TestRuntime:
+    """測試執行器與會話後端"""
+    
+    @pytest.mark.asyncio
+    async def test_thread_executor_captures_output_per_call(self):
+        """測試執行緒池並發執行時輸出互不干擾"""
+        from telegram_click.executor import CommandExecutor
+        
+        def work(n):
+            click.echo(f"out {n}")
+            return n
+        
+        executor = CommandExecutor("thread", max_workers=4, max_concurrency=2)
+        try:
+            results = await asyncio.gather(
+                *[executor.run(work, {"n": i}) for i in range(6)]
+            )
+        finally:
+            executor.shutdown(wait=True)
+        
+        for i, result in enumerate(results):
+            assert result.success
+            assert result.data == f"out {i}\n{i}"
+        assert executor.completed == 6
+        assert executor.active == 0
+    
+    @pytest.mark.asyncio
+    async def test_sqlite_session_restored(self, tmp_path):
+        """測試會話在新轉換器實例中恢復"""
+        @click.group()
+        def cli():
+            pass
+
+        @cli.command()
+        @click.option('--name', required=True)
+        @click.option('--age', type=int, required=True)
+        def greet(name, age):
+            return f"{name} {age}"
+
+        def make_converter():
+            converter = create_bot_from_click_group(
+                "test_token", cli, enable_logging=False,
+                session_backend="sqlite", session_path=str(tmp_path / "s.db")
+            )
+            converter._discover_click_commands()
+            return converter
+        
+        first = make_converter()
+        update = Mock()
+        update.effective_chat.send_message = AsyncMock()
+        first.user_contexts[1] = TelegramClickContext(update, 1, 10)
+        first.user_contexts[1].command_name = "greet"
+        await first._start_parameter_collection(1)
+        first.user_contexts[1].collected_params["name"] = "Ann"
+        first.user_contexts[1].current_param_index = 1
+        first._save_session(1)
+        first.sessions.close()
+        
+        second = make_converter()
+        restored = second._get_user_context(1, update)
+        
+        assert restored.command_name == "greet"
+        assert restored.collected_params == {"name": "Ann"}
+        assert restored.required_params[restored.current_param_index].name == "age"
+        
+        second._end_session(1)
+        assert second.sessions.get("session:1") is None
+        
+        # 之後的值無法序列化時刪除舊快照，重啟後不會恢復到過時的狀態
+        first = make_converter()
+        first.user_contexts[1] = restored
+        first._save_session(1)
+        assert first.sessions.get("session:1") is not None
+        restored.collected_params["upload"] = object()
+        first._save_session(1)
+        assert first.sessions.get("session:1") is None
+
+
+class TestFakeBotAPIServer:
+    """測試本地假Bot API伺服器（完整HTTP路徑）"""
+    
+    @pytest.fixture
+    def cli(self):
+        @click.group()
+        def cli():
+            pass
+
+        @cli.command()
+        @click.option('--name', required=True)
+        def greet(name):
+            return f"Hello {name}"
+
+        return cli
+    
+    @pytest.mark.asyncio
+    async def test_polling_round_trip(self, cli):
+        """測試經由getUpdates輪詢完成一次命令對話"""
+        from telegram_click.testing import (
+            FAKE_BOT_TOKEN, FakeBotAPI, FakeBotAPIServer, UpdateFactory
+        )
+        
+        api = FakeBotAPI(latency=0.001)
+        updates = UpdateFactory()
+        
+        with FakeBotAPIServer(api) as server:
+            converter = create_bot_from_click_group(
+                FAKE_BOT_TOKEN, cli, enable_logging=False, base_url=server.base_url
+            )
+            app = converter.build_application()
+            await app.initialize()
+            await app.start()
+            await app.updater.start_polling(poll_interval=0, timeout=1)
+            try:
+                api.push_update(updates.command(7, "/greet"))
+                api.push_update(updates.text(7, "Ann"))
+                for _ in range(200):
+                    if any("Hello Ann" in c.params.get("text", "") for c in api.calls_to("sendMessage")):
+                        break
+                    await asyncio.sleep(0.02)
+            finally:
+                await app.updater.stop()
+                await app.stop()
+                await app.shutdown()
+        
+        texts = [call.params["text"] for call in api.calls_to("sendMessage")]
+        assert any("name" in text for text in texts)
+        assert any("Hello Ann" in text for text in texts)
+        assert 7 not in converter.user_contexts
+    
+    @pytest.mark.asyncio
+    async def test_rate_limit_injection(self):
+        """測試429注入會轉換為RetryAfter"""
+        from telegram.error import RetryAfter
+        from telegram.ext import ExtBot
+        from telegram_click.testing import FAKE_BOT_TOKEN, FakeBotAPI, FakeBotAPIServer
+        
+        api = FakeBotAPI(rate_limit_every=2, retry_after=3)
+        
+        with FakeBotAPIServer(api) as server:
+            async with ExtBot(FAKE_BOT_TOKEN, base_url=server.base_url) as bot:
+                await bot.send_message(chat_id=1, text="first")
+                with pytest.raises(RetryAfter):
+                    await bot.send_message(chat_id=1, text="second")
+        
+        assert api.rate_limited == 1
+        assert [c.params["text"] for c in api.calls_to("sendMessage")] == ["first", "second"]
+    
+    @pytest.mark.asyncio
+    async def test_file_download(self):
+        """測試經由HTTP下載 getFile 返回的檔案"""
+        from telegram.ext import ExtBot
+        from telegram_click.testing import FAKE_BOT_TOKEN, FakeBotAPI, FakeBotAPIServer
+        
+        api = FakeBotAPI()
+        document = api.add_file(b"payload", "data.bin")
+        
+        with FakeBotAPIServer(api) as server:
+            base_file_url = server.base_url.replace("/bot", "/file/bot")
+            async with ExtBot(FAKE_BOT_TOKEN, base_url=server.base_url, base_file_url=base_file_url) as bot:
+                telegram_file = await bot.get_file(document["file_id"])
+                assert bytes(await telegram_file.download_as_bytearray()) == b"payload"
+    
+    def test_file_ids_unique_across_threads(self):
+        """測試多執行緒登記檔案和發送文件時 file_id 不重複"""
+        from concurrent.futures import ThreadPoolExecutor
+        from telegram_click.testing import FakeBotAPI
+        
+        api = FakeBotAPI()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            documents = list(pool.map(lambda i: api.add_file(str(i).encode()), range(200)))
+        assert len({d["file_id"] for d in documents}) == 200
+        assert len(api.files) == 200
+        
+        sent = [api.handle("sendDocument", {"chat_id": 1, "document": "attach://x"})[1]["result"]["document"]
+                for _ in range(2)]
+        ids = {d["file_id"] for d in documents + sent} | {d["file_unique_id"] for d in sent}
+        assert len(ids) == 204
+
+
+class TestMetrics:
+    """測試指標收集與 /metrics 端點"""
+
+    @pytest.fixture
+    def cli(self):
+        @click.group()
+        def cli():
+            pass
+
+        @cli.command()
+        @click.option('--name', required=True)
+        def greet(name):
+            return f"Hello {name}"
+
+        @cli.command()
+        def boom():
+            raise RuntimeError("boom")
+
+        return cli
+
+    @pytest.mark.asyncio
+    async def test_command_metrics_exported(self, cli):
+        """測試命令執行後指標可從HTTP端點讀取"""
+        import urllib.request
+
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, metrics_port=0
+        )
+        async with BotHarness(converter) as bot:
+            await converter._post_init(bot.app)
+            await bot.command(7, "/greet")
+            await bot.text(7, "Ann")
+            await bot.command(7, "/boom")
+
+            url = f"http://127.0.0.1:{converter._metrics_server.port}/metrics"
+            body = await asyncio.to_thread(
+                lambda: urllib.request.urlopen(url, timeout=5).read().decode()
+            )
+
+        assert 'telegram_click_command_invocations_total{command="greet"} 1.0' in body
+        assert 'telegram_click_command_errors_total{command="boom"} 1.0' in body
+        assert 'telegram_click_command_duration_seconds_count{command="greet"} 1' in body
+        assert 'telegram_click_send_duration_seconds_count{method="send_message"}' in body
+        assert "telegram_click_active_sessions 0" in body
+        assert converter._metrics_server is None
+
+    def test_metrics_disabled_by_default(self, cli):
+        """測試預設不收集指標"""
+        converter = create_bot_from_click_group("test_token", cli, enable_logging=False)
+
+        assert not converter.metrics.enabled
+        assert converter.metrics.render() == ""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """測試直方圖輸出累計桶"""
+        from telegram_click.metrics import MetricsRegistry
+
+        registry = MetricsRegistry(namespace="")
+        histogram = registry.histogram("latency", "延遲", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+
+        text = registry.render()
+        assert 'latency_bucket{le="0.1"} 1' in text
+        assert 'latency_bucket{le="1.0"} 2' in text
+        assert 'latency_bucket{le="+Inf"} 3' in text
+        assert "latency_count 3" in text
+
+
+class TestTracing:
+    """測試處理流程的追蹤span"""
+
+    @pytest.mark.asyncio
+    async def test_spans_share_trace_within_update(self):
+        """測試同一更新內的span共用trace並正確嵌套"""
+        from telegram_click.tracing import InMemorySpanExporter
+
+        @click.group()
+        def cli():
+            pass
+
+        @cli.command()
+        @click.option('--name', required=True)
+        def greet(name):
+            return f"Hello {name}"
+
+        exporter = InMemorySpanExporter()
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, trace_exporter=exporter
+        )
+        async with BotHarness(converter) as bot:
+            await bot.command(7, "/greet")
+            await bot.text(7, "Ann")
+
+        spans = {span.name: span for span in exporter.spans}
+        assert {"handle_command", "authorize", "collect_parameter", "handle_text",
+                "validate", "execute", "executor", "format_output", "send"} <= set(spans)
+
+        root = spans["handle_text"]
+        assert root.parent_id is None
+        assert spans["execute"].trace_id == root.trace_id
+        assert spans["executor"].parent_id == spans["execute"].span_id
+        assert spans["executor"].attributes["success"] is True
+        assert spans["handle_command"].trace_id != root.trace_id
+
+    def test_tracing_disabled_by_default(self):
+        """測試預設使用空span"""
+        from telegram_click.tracing import NULL_SPAN, Tracer
+
+        assert Tracer().span("x") is NULL_SPAN
+
+    def test_jsonl_exporter_drains_on_close(self, tmp_path):
+        """測試JSONL匯出器關閉時寫完佇列中的span，不等待 flush_interval"""
+        from telegram_click.tracing import JsonlSpanExporter, Tracer, read_spans
+
+        path = str(tmp_path / "spans.jsonl")
+        tracer = Tracer(JsonlSpanExporter(path, flush_interval=60))
+        for i in range(5):
+            with tracer.span("step", index=i):
+                pass
+        with tracer.span("last") as span:
+            span.set_attribute("payload", {1, 2})
+        tracer.close()
+
+        spans = list(read_spans(path))
+        assert [span["attributes"].get("index") for span in spans[:5]] == [0, 1, 2, 3, 4]
+        assert spans[5]["attributes"]["payload"] == "{1, 2}"
+        assert tracer.exporter.exported == len(spans) == 6
+
+
+class TestAdminCommands:
+    """測試管理命令"""
+
+    @pytest.fixture
+    def cli(self):
+        @click.group()
+        def cli():
+            pass
+
+        @cli.command()
+        @click.option('--name', required=True)
+        def greet(name):
+            return f"Hello {name}"
+
+        return cli
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode, suffix", [("cprofile", "pstats"), ("sample", "folded")])
+    async def test_profile_next_invocation(self, cli, mode, suffix):
+        """測試/profile分析下一次執行並發送分析檔案"""
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, admin_users=[7]
+        )
+        async with BotHarness(converter) as bot:
+            await bot.command(7, f"/profile greet {mode}")
+            for name in ("Ann", "Bob"):
+                await bot.command(7, "/greet")
+                await bot.text(7, name)
+
+        api = bot.api
+        texts = [call.params["text"] for call in api.calls_to("sendMessage")]
+        assert any("Hello Ann" in text for text in texts)
+        assert sum("分析結果" in text for text in texts) == 1
+        documents = api.calls_to("sendDocument")
+        assert len(documents) == 1
+        assert documents[0].params["document"]["file_name"] == f"greet_profile.{suffix}"
+
+    @pytest.mark.asyncio
+    async def test_profile_requires_explicit_admin(self, cli):
+        """測試未設置管理員列表時管理命令被拒絕"""
+        converter = create_bot_from_click_group("test_token", cli, enable_logging=False)
+        async with BotHarness(converter) as bot:
+            await bot.command(7, "/profile greet")
+
+        assert "僅限管理員" in bot.api.last_message[7]["text"]
+        assert converter._profile_requests == {}
+
+    @pytest.mark.asyncio
+    async def test_stats_report_and_tracemalloc_switch(self, cli):
+        """測試/stats報告與記憶體追蹤開關"""
+        import tracemalloc
+
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, admin_users=[7]
+        )
+        async with BotHarness(converter) as bot:
+            api = bot.api
+            for text in ("/help", "/help", "/stats", "/stats mem start"):
+                await bot.command(7, text)
+            assert tracemalloc.is_tracing()
+            texts = [call.params["text"] for call in api.calls_to("sendMessage")]
+            report = texts[2]
+            assert "運行時間" in report
+            assert "進行中會話: 0" in report
+            assert "快取 help: 命中率 50.0%（1/2）" in report
+            assert "tracemalloc: 未啟用" in report
+
+            try:
+                await bot.command(7, "/stats")
+                assert "增長最多的分配位置" in api.last_message[7]["text"]
+            finally:
+                await bot.command(7, "/stats mem stop")
+            assert not tracemalloc.is_tracing()
+            assert "已停止" in api.last_message[7]["text"]
+
+
+class TestLogPipeline:
+    """測試日誌管線"""
+
+    def test_json_records_written_by_listener(self):
+        """測試佇列模式輸出JSON記錄並保留 extra 欄位"""
+        import io
+        import json
+        import logging
+        from telegram_click.logpipeline import configure_logging
+
+        stream = io.StringIO()
+        logger = logging.getLogger("telegram_click.test_pipeline")
+        logger.propagate = False
+        pipeline = configure_logging(
+            "DEBUG", "json", use_queue=True, logger=logger, stream=stream
+        )
+        try:
+            logger.info("執行命令 %s", "greet", extra={"user_id": 7})
+        finally:
+            pipeline.close()
+
+        record = json.loads(stream.getvalue().strip())
+        assert record["message"] == "執行命令 greet"
+        assert record["level"] == "INFO"
+        assert record["user_id"] == 7
+        assert not logger.handlers
+
+    def test_debug_sampling_per_call_site(self):
+        """測試DEBUG記錄按呼叫位置取樣，其他級別不受影響"""
+        import io
+        import logging
+        from telegram_click.logpipeline import configure_logging
+
+        stream = io.StringIO()
+        logger = logging.getLogger("telegram_click.test_sampling")
+        logger.propagate = False
+        pipeline = configure_logging("DEBUG", "text", debug_sample_rate=0.1, logger=logger, stream=stream)
+        try:
+            for i in range(25):
+                logger.debug("debug %d", i)
+                logger.info("info %d", i)
+        finally:
+            pipeline.close()
+
+        lines = stream.getvalue().splitlines()
+        assert sum("DEBUG" in line for line in lines) == 3
+        assert sum("INFO" in line for line in lines) == 25
+
+
+class TestAuditLog:
+    """測試審計日誌"""
+
+    def test_group_commit_and_rotation(self, tmp_path):
+        """測試批次提交、輪替後仍可查詢"""
+        from telegram_click.audit import AuditLogger, JsonlAuditSink
+
+        path = str(tmp_path / "audit.jsonl")
+        audit = AuditLogger(JsonlAuditSink(path, max_bytes=2000, backup_count=2), batch_size=10)
+        for i in range(25):
+            audit.log({"user_id": i % 2, "command": "greet", "params": {"i": i}, "success": True})
+        audit.flush()
+
+        assert (tmp_path / "audit.jsonl.1").exists()
+        records = audit.query(user_id=1, limit=3)
+        assert [r["params"]["i"] for r in records] == [23, 21, 19]
+        audit.close()
+        assert audit.written == 25
+        assert audit.batches < 25
+
+    def test_sqlite_sink_query(self, tmp_path):
+        """測試SQLite後端按命令查詢"""
+        from telegram_click.audit import AuditLogger, SqliteAuditSink
+
+        audit = AuditLogger(SqliteAuditSink(str(tmp_path / "audit.db")))
+        audit.log({"user_id": 1, "command": "deploy", "params": {}, "success": False})
+        audit.log({"user_id": 1, "command": "greet", "params": {}, "success": True})
+        records = audit.query(command="deploy")
+        audit.close()
+
+        assert len(records) == 1
+        assert records[0]["success"] is False
+
+    @pytest.mark.asyncio
+    async def test_execution_audited_and_queryable(self, tmp_path):
+        """測試命令執行被記錄，hide_input參數被遮蔽，管理員可查詢"""
+        @click.group()
+        def cli():
+            pass
+
+        @cli.command()
+        @click.option('--name', required=True)
+        @click.option('--token', required=True, hide_input=True)
+        def login(name, token):
+            return f"Hi {name}"
+
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, admin_users=[7],
+            audit_path=str(tmp_path / "audit.jsonl")
+        )
+        async with BotHarness(converter) as bot:
+            await bot.command(7, "/login")
+            await bot.text(7, "Ann")
+            await bot.text(7, "s3cret")
+            await bot.command(7, "/audit command=login")
+
+        text = bot.api.last_message[7]["text"]
+        assert "/login name=Ann token=***" in text
+        assert "s3cret" not in (tmp_path / "audit.jsonl").read_text(encoding="utf-8")
+
+
+class TestMessageRendering:
+    """測試框架訊息的解析模式與轉義"""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("message_format, parse_mode, expected", [
+        ("html", "HTML", "<pre>`rm -rf` &lt;tmp&gt;</pre>"),
+        ("markdown_v2", "MarkdownV2", "```\n\\`rm -rf\\` <tmp>\n```"),
+    ])
+    async def test_output_with_markup_characters(self, message_format, parse_mode, expected):
+        """測試含反引號的輸出以所選解析模式安全發送"""
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        def raw():
+            """輸出 *原始* 文字"""
+            return "`rm -rf` <tmp>"
+        
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, message_format=message_format
+        )
+        async with BotHarness(converter) as bot:
+            for text in ("/raw", "/help"):
+                await bot.command(7, text)
+        
+        output, help_message = bot.api.calls_to("sendMessage")
+        assert output.params["parse_mode"] == parse_mode
+        assert expected in output.params["text"]
+        assert help_message.params["parse_mode"] == parse_mode
+    
+    def test_unknown_message_format(self):
+        """測試不支援的訊息格式"""
+        @click.group()
+        def cli():
+            pass
+        
+        with pytest.raises(ValueError):
+            create_bot_from_click_group("test_token", cli, enable_logging=False, message_format="bbcode")
+
+
+class TestFormMode:
+    """測試以單一表單訊息收集參數"""
+    
+    @staticmethod
+    async def _converse(form_mode):
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.option('--name', required=True)
+        @click.option('--age', type=int, required=True)
+        @click.option('--env', type=click.Choice(['dev', 'prod']), required=True)
+        @click.option('--note', help='備註')
+        def greet(name, age, env, note):
+            return f"Hello {name} {age} {env} {note}"
+        
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, form_mode=form_mode
+        )
+        async with BotHarness(converter) as bot:
+            await bot.command(7, "/greet")
+            await bot.text(7, "Ann")
+            await bot.text(7, "abc")  # 無效數字
+            await bot.text(7, "30")
+            await bot.press(7, "prod")
+            form = dict(bot.api.last_message[7])
+            await bot.press(7, "⏭️")
+        return bot.api, form
+    
+    @pytest.mark.asyncio
+    async def test_single_message_edited(self):
+        """測試表單模式只發送一則提示訊息並持續編輯"""
+        classic, _ = await self._converse(form_mode=False)
+        api, form = await self._converse(form_mode=True)
+        
+        sent = api.calls_to("sendMessage")
+        edits = api.calls_to("editMessageText")
+        # 表單、數字錯誤提示、執行結果
+        assert len(sent) == 3
+        assert {int(call.params["message_id"]) for call in edits} == {form["message_id"]}
+        assert "✅ name = Ann" in form["text"]
+        assert "✅ env = prod" in form["text"]
+        assert "note" in form["text"]
+        assert "Hello Ann 30 prod None" in api.last_message[7]["text"]
+        
+        def outgoing(fake):
+            return [call for call in fake.calls if call.method not in ("getMe", "answerCallbackQuery")]
+        
+        assert len(outgoing(api)) < len(outgoing(classic))
+
+
+class TestOptionalSummary:
+    """測試可選參數摘要鍵盤"""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("form_mode", [False, True])
+    async def test_toggle_cycle_edit_and_run(self, form_mode):
+        """測試就地切換布林、輪換選項、輸入文字後一次執行"""
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.option('--name', required=True)
+        @click.option('--age', type=int)
+        @click.option('--city', default='台北')
+        @click.option('--env', type=click.Choice(['dev', 'prod']), default='dev')
+        @click.option('--details', is_flag=True)
+        def profile(name, age, city, env, details):
+            return f"{name}|{age}|{city}|{env}|{details}"
+        
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, optional_summary=True, form_mode=form_mode
+        )
+        async with BotHarness(converter) as bot:
+            api = bot.api
+            await bot.command(7, "/profile")
+            await bot.text(7, "Ann")
+            labels = [button["text"] for button in api.inline_buttons(7)]
+            assert labels == ["✏️ age: —", "✏️ city: 台北", "🔁 env: dev", "⬜ details", "▶️ 執行"]
+            
+            await bot.press(7, "⬜ details")
+            await bot.press(7, "🔁 env")
+            await bot.press(7, "✏️ age")
+            await bot.text(7, "abc")
+            await bot.text(7, "30")
+            labels = [button["text"] for button in api.inline_buttons(7)]
+            assert labels == ["✏️ age: 30", "✏️ city: 台北", "🔁 env: prod", "☑️ details", "▶️ 執行"]
+            
+            await bot.press(7, "▶️")
+        
+        assert "Ann|30|台北|prod|True" in api.last_message[7]["text"]
+        assert 7 not in converter.user_contexts
+
+    
+    @pytest.mark.asyncio
+    async def test_per_parameter_prompt_uses_resolved_default(self):
+        """測試逐個詢問時的默認值按鈕與摘要鍵盤一致：沒有默認值不顯示，可調用的默認值被調用"""
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.option('--name', required=True)
+        @click.option('--age', type=int)
+        @click.option('--city', default=lambda: '台北')
+        def profile(name, age, city):
+            return f"{name}|{age}|{city}"
+        
+        converter = create_bot_from_click_group("test_token", cli, enable_logging=False)
+        async with BotHarness(converter) as bot:
+            api = bot.api
+            await bot.command(7, "/profile")
+            await bot.text(7, "Ann")
+            assert [b["text"] for b in api.inline_buttons(7)] == ["✏️ 輸入自定義值", "⏭️ 跳過"]
+            await bot.press(7, "⏭️")
+            assert "📋 使用默認值 (台北)" in [b["text"] for b in api.inline_buttons(7)]
+            await bot.press(7, "📋")
+        
+        assert "Ann|None|台北" in api.last_message[7]["text"]
+
+
+class TestCallbackCodec:
+    """測試回調數據編解碼"""
+    
+    def test_round_trip_and_rejection(self):
+        """測試編解碼、偽造和過期token被拒絕"""
+        import base64
+        from telegram_click.callbacks import CallbackCodec, CallbackOp, CallbackToken, TOKEN_LENGTH
+        
+        codec = CallbackCodec(b"secret")
+        data = codec.encode(CallbackOp.CHOICE, 3, 250, scope="deploy:abc")
+        
+        assert len(data) == TOKEN_LENGTH
+        assert codec.decode(data, scope="deploy:abc") == CallbackToken(CallbackOp.CHOICE, 3, 250)
+        # 命令指紋改變（熱重載）或其他密鑰
+        assert codec.decode(data, scope="deploy:def") is None
+        assert CallbackCodec(b"other").decode(data, scope="deploy:abc") is None
+        # 竄改選項索引
+        raw = bytearray(base64.urlsafe_b64decode(data))
+        raw[4] ^= 1
+        assert codec.decode(base64.urlsafe_b64encode(bytes(raw)).decode(), scope="deploy:abc") is None
+        assert codec.decode("param:env:prod", scope="deploy:abc") is None
+        assert codec.decode("!" * TOKEN_LENGTH, scope="deploy:abc") is None
+        with pytest.raises(ValueError):
+            codec.encode(CallbackOp.CHOICE, 256, 0)
+    
+    @pytest.mark.asyncio
+    async def test_long_choices_and_stale_buttons(self):
+        """測試超長選項仍在64位元組內，舊訊息上的按鈕被拒絕"""
+        services = [f"{'very-long-service-name-' * 4}{i}" for i in range(3)]
+        
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.option('--target-service-with-a-long-name', type=click.Choice(services), required=True)
+        @click.option('--region', type=click.Choice(['eu', 'us']), required=True)
+        def restart(target_service_with_a_long_name, region):
+            return f"{target_service_with_a_long_name[-1]} {region}"
+        
+        converter = create_bot_from_click_group("test_token", cli, enable_logging=False)
+        async with BotHarness(converter) as bot:
+            api, updates = bot.api, bot.updates
+            await bot.command(7, "/restart")
+            first = dict(api.last_message[7])
+            assert all(len(b["callback_data"].encode()) <= 64 for b in api.inline_buttons(7))
+            stale = api.button_data(7, services[0])
+            await bot.feed(updates.callback(7, api.button_data(7, services[2]), first))
+            
+            await bot.feed(updates.callback(7, stale, first))
+            assert "過期" in api.last_message[7]["text"]
+            await bot.feed(updates.callback(7, "param:region:eu", first))
+            assert converter.user_contexts[7].current_param_index == 1
+            
+            await bot.command(7, "/restart")
+            await bot.press(7, services[1])
+            await bot.press(7, "us")
+        
+        assert "1 us" in api.last_message[7]["text"]
+
+
+class TestChoiceKeyboard:
+    """測試選擇參數的分頁鍵盤"""
+    
+    def test_prefix_index(self):
+        """測試前綴索引不分大小寫並保持原順序"""
+        from telegram_click.keyboards import PrefixIndex
+        
+        index = PrefixIndex(["beta", "Alpha", "alpine", "gamma", "al"])
+        assert index.search("AL") == [1, 2, 4]
+        assert index.search("alp") == [1, 2]
+        assert index.search("z") == []
+        assert index.search("") == [0, 1, 2, 3, 4]
+    
+    @pytest.mark.asyncio
+    async def test_pagination_cache_and_filter(self):
+        """測試翻頁編輯原訊息、頁面快取和輸入篩選"""
+        services = [f"svc-{i:03d}" for i in range(200)]
+        
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.option('--service', type=click.Choice(services), required=True)
+        def restart(service):
+            return f"restarted {service}"
+        
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, choice_page_size=12, choice_columns=3
+        )
+        async with BotHarness(converter) as bot:
+            api = bot.api
+            await bot.command(7, "/restart")
+            prompt = api.last_message[7]
+            rows = prompt["reply_markup"]["inline_keyboard"]
+            assert [len(row) for row in rows] == [3, 3, 3, 3, 3]
+            assert rows[-1][1]["text"] == "1/17"
+            
+            await bot.press(7, "▶️")
+            assert int(api.calls_to("editMessageText")[-1].params["message_id"]) == prompt["message_id"]
+            assert api.inline_buttons(7)[0]["text"] == "svc-012"
+            
+            await bot.text(7, "SVC-19")
+            assert [b["text"] for b in api.inline_buttons(7)][:10] == [f"svc-19{i}" for i in range(10)]
+            assert "篩選" in api.last_message[7]["text"]
+            await bot.text(7, "svc-199")
+            
+            await bot.command(8, "/restart")
+        
+        assert "restarted svc-199" in api.last_message[7]["text"]
+        stats = converter.cache_stats["choice_keyboard"]
+        assert stats.hits == 1 and stats.misses == 2
+
+
+class TestCommandSearch:
+    """測試內聯模式的命令搜尋"""
+    
+    def test_trie_and_trigram_ranking(self):
+        """測試名稱前綴優先，其次按說明文字的三元組相似度排序"""
+        from telegram_click.search import CommandIndex, CommandTrie
+        
+        trie = CommandTrie(["deploy", "deploy_service", "delete", "status"])
+        assert trie.with_prefix("dep") == ["deploy", "deploy_service"]
+        assert trie.with_prefix("DE", limit=1) == ["delete"]
+        assert trie.with_prefix("x") == []
+        
+        index = CommandIndex({
+            "deploy": "部署應用到伺服器",
+            "rollback": "Revert the last deployment",
+            "status": "Show cluster status",
+        })
+        assert index.search("/dep") == ["deploy", "rollback"]
+        assert index.search("cluster") == ["status"]
+        assert index.search("zzz") == []
+        assert index.search("") == ["deploy", "rollback", "status"]
+        
+        assert index.search(" DEP ") == ["deploy", "rollback"]
+        assert index.stats.hits == 1 and index.stats.misses == 4
+    
+    def test_cached_search_respects_larger_limit(self):
+        """測試快取命中時較大的 limit 仍返回完整結果"""
+        from telegram_click.search import CommandIndex
+        
+        index = CommandIndex({f"deploy{i}": "" for i in range(5)})
+        assert index.search("dep", limit=2) == ["deploy0", "deploy1"]
+        assert index.search("dep", limit=4) == ["deploy0", "deploy1", "deploy2", "deploy3"]
+        assert index.stats.hits == 1 and index.stats.misses == 1
+    
+    @pytest.mark.asyncio
+    async def test_inline_query(self):
+        """測試內聯查詢返回命令，選中後送出命令文字；未授權用戶得到空結果"""
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command('deploy-service')
+        def deploy_service():
+            """部署服務\n\n詳細說明"""
+        
+        @cli.command()
+        def status():
+            """Show deployment status"""
+        
+        converter = create_bot_from_click_group("test_token", cli, enable_logging=False, admin_users=[7])
+        async with BotHarness(converter) as bot:
+            await bot.feed(bot.updates.inline_query(7, "dep"))
+            await bot.feed(bot.updates.inline_query(8, "dep"))
+        
+        allowed, denied = bot.api.calls_to("answerInlineQuery")
+        results = allowed.params["results"]
+        assert [r["title"] for r in results] == ["/deploy_service", "/status"]
+        assert results[0]["description"] == "部署服務"
+        assert results[0]["input_message_content"]["message_text"] == "/deploy_service"
+        assert denied.params["results"] == []
+        assert allowed.params["is_personal"] == "true"
+
+
+class TestRecentInvocations:
+    """測試最近執行記錄和重新執行"""
+    
+    def test_history_bounded_and_deduplicated(self):
+        """測試記錄數有上限，重複執行移到最前並保留編號"""
+        from telegram_click.sessions import InvocationHistory, MemorySessionBackend
+        
+        history = InvocationHistory(MemorySessionBackend(), size=3)
+        first = history.record(1, "logs", {"app": "api"})
+        for app in ("web", "db", "cache"):
+            history.record(1, "logs", {"app": app})
+        assert [e["params"]["app"] for e in history.entries(1)] == ["cache", "db", "web"]
+        assert history.get(1, first) is None
+        
+        web = history.entries(1)[2]["id"]
+        assert history.record(1, "logs", {"app": "web"}) == web
+        assert [e["params"]["app"] for e in history.entries(1)] == ["web", "cache", "db"]
+        assert history.entries(2) == []
+        assert history.record(1, "logs", {"file": object()}) is None
+        assert InvocationHistory(MemorySessionBackend(), size=0).record(1, "logs", {}) is None
+    
+    @pytest.mark.asyncio
+    async def test_rerun_button_and_recent_menu(self):
+        """測試結果上的重新執行按鈕和 /recent 選單不需要再輸入參數"""
+        calls = []
+        
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.option('--app', required=True)
+        @click.option('--level', type=click.Choice(['info', 'error']), required=True)
+        def logs(app, level):
+            calls.append((app, level))
+            return f"{app} {level}"
+        
+        @cli.command()
+        @click.option('--password', required=True, hide_input=True)
+        def login(password):
+            return "ok"
+        
+        converter = create_bot_from_click_group("test_token", cli, enable_logging=False)
+        async with BotHarness(converter) as bot:
+            api, updates = bot.api, bot.updates
+            await bot.command(7, "/logs")
+            await bot.text(7, "api")
+            await bot.press(7, "error")
+            result = dict(api.last_message[7])
+            sent = len(api.calls_to("sendMessage"))
+            
+            await bot.feed(updates.callback(7, api.button_data(7, "🔁"), result))
+            assert len(api.calls_to("sendMessage")) == sent + 1
+            await bot.feed(updates.callback(8, api.button_data(7, "🔁"), result))
+            alert = api.calls_to("answerCallbackQuery")[-1].params
+            assert "過期" in alert["text"] and str(alert["show_alert"]).lower() == "true"
+            # 太舊的訊息以 date=0 送達（無法存取），不能回覆到它
+            await bot.feed(updates.callback(7, api.button_data(7, "🔁"), dict(result, date=0)))
+            assert "無法存取" in api.calls_to("answerCallbackQuery")[-1].params["text"]
+            assert len(api.calls_to("sendMessage")) == sent + 1
+            
+            await bot.command(7, "/login")
+            await bot.text(7, "secret")
+            assert api.inline_buttons(7) == []
+            
+            await bot.command(7, "/recent")
+            assert [b["text"] for b in api.inline_buttons(7)] == ["🔁 /logs app=api level=error"]
+            await bot.press(7, "🔁")
+        
+        assert calls == [("api", "error")] * 3
+    
+    @pytest.mark.asyncio
+    async def test_rerun_restores_tuples(self):
+        """測試重新執行時 multiple 和 nargs 參數仍然是元組（記錄經過JSON往返）"""
+        received = []
+        
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.option('--size', nargs=2, type=int, required=True)
+        @click.option('--pair', nargs=2, multiple=True, required=True)
+        def backup(size, pair):
+            received.append((size, pair))
+        
+        converter = create_bot_from_click_group("test_token", cli, enable_logging=False)
+        async with BotHarness(converter) as bot:
+            await bot.command(7, "/backup")
+            await bot.text(7, "10 20")
+            await bot.text(7, "a b\nc d")
+            await bot.press(7, "🔁")
+        
+        assert received[0] == ((10, 20), (("a", "b"), ("c", "d")))
+        assert received[1] == received[0]
+
+
+class TestDeepLinks:
+    """測試預填參數的深度連結"""
+    
+    def test_codec_round_trip_and_signature(self):
+        """測試編碼長度限制、壓縮和簽名驗證"""
+        from telegram_click.deeplinks import DEEP_LINK_LIMIT, DeepLink, DeepLinkCodec
+        
+        codec = DeepLinkCodec(b"secret")
+        scope = {"logs": "logs:app,level"}.get
+        link = DeepLink("logs", {0: "api", 1: "error"})
+        payload = codec.encode(link, "logs:app,level")
+        assert len(payload) <= DEEP_LINK_LIMIT
+        assert all(c.isalnum() or c in "-_" for c in payload)
+        assert codec.decode(payload, scope) == link
+        
+        repetitive = DeepLink("logs", {0: "a" * 60})
+        assert codec.decode(codec.encode(repetitive, "logs:app,level"), scope) == repetitive
+        
+        assert codec.decode(payload, {"logs": "logs:level,app"}.get) is None
+        assert DeepLinkCodec(b"other").decode(payload, scope) is None
+        assert codec.decode(payload[:-2] + ("AA" if payload[-2:] != "AA" else "BB"), scope) is None
+        assert codec.decode("!!!", scope) is None
+        with pytest.raises(ValueError):
+            codec.encode(DeepLink("logs", {0: "".join(str(i) for i in range(40))}), "")
+    
+    @pytest.mark.asyncio
+    async def test_start_with_payload(self):
+        """測試連結只詢問未預填的參數，全部預填時直接執行"""
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.option('--app', required=True)
+        @click.option('--level', type=click.Choice(['info', 'error']), required=True)
+        @click.option('--lines', type=int, default=10)
+        def logs(app, level, lines):
+            return f"{app} {level} {lines}"
+        
+        converter = create_bot_from_click_group("test_token", cli, enable_logging=False)
+        async with BotHarness(converter) as bot:
+            api = bot.api
+            link = converter.create_deep_link("logs", app="api", lines=50)
+            assert link.startswith(f"https://t.me/{bot.app.bot.username}?start=")
+            await bot.command(7, f"/start {link.rsplit('=', 1)[1]}")
+            assert "level" in api.last_message[7]["text"]
+            await bot.press(7, "error")
+            assert "api error 50" in api.last_message[7]["text"]
+            
+            full = converter.deep_link_payload("logs", app="web", level="info", lines=5)
+            await bot.command(7, f"/start {full}")
+            assert "web info 5" in api.last_message[7]["text"]
+            
+            invalid = converter.deep_link_payload("logs", app="web", lines="many")
+            await bot.command(7, f"/start {invalid}")
+            assert "lines" in api.last_message[7]["text"]
+            await bot.command(7, "/start bogus")
+            assert "連結無效" in api.last_message[7]["text"]
+            
+            with pytest.raises(ValueError):
+                converter.deep_link_payload("logs", missing=1)
+
+
+class TestBatchInput:
+    """測試多值參數在一則訊息中輸入"""
+    
+    @pytest.mark.asyncio
+    async def test_multiple_and_nargs(self):
+        """測試 multiple 和 nargs 參數以一則訊息收集為元組"""
+        received = []
+        
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.option('--size', nargs=2, type=int, required=True)
+        @click.option('--exclude', multiple=True, help='排除的檔案模式')
+        def backup(size, exclude):
+            received.append((size, exclude))
+        
+        converter = create_bot_from_click_group("test_token", cli, enable_logging=False)
+        async with BotHarness(converter) as bot:
+            await bot.command(7, "/backup")
+            assert "多個值" in bot.api.last_message[7]["text"]
+            await bot.text(7, "10")
+            assert "需要 2 個值" in bot.api.last_message[7]["text"]
+            await bot.text(7, "10 20")
+            await bot.press(7, "✏️")
+            await bot.text(7, "*.log\n*.tmp")
+        
+        assert received == [((10, 20), ("*.log", "*.tmp"))]
+
+
+class TestFileUploads:
+    """測試上傳文件到 click.File / click.Path 參數"""
+    
+    @pytest.mark.asyncio
+    async def test_upload_file_and_path(self):
+        """測試文件交給File和Path參數，執行後暫存檔案被清理"""
+        import os
+        
+        seen = {}
+        
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.option('--config', type=click.File('r'), required=True)
+        @click.option('--archive', type=click.Path(exists=True, dir_okay=False), required=True)
+        @click.option('--name', required=True)
+        def deploy(config, archive, name):
+            seen["config"] = config.read()
+            seen["archive"] = archive
+            with open(archive, "rb") as f:
+                seen["archive_bytes"] = f.read()
+            return "deployed"
+        
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, max_upload_bytes=1024, upload_spool_bytes=8
+        )
+        async with BotHarness(converter) as bot:
+            api = bot.api
+            await bot.command(7, "/deploy")
+            assert "上傳文件" in api.last_message[7]["text"]
+            await bot.upload(7, b"x" * 2048, "big.bin")
+            assert "過大" in api.last_message[7]["text"]
+            await bot.upload(7, "env: prod\n".encode(), "app.yaml")
+            await bot.upload(7, b"\x00PK", "../../release.zip")
+            await bot.upload(7, b"hi", "note.txt")
+            assert "不接受文件" in api.last_message[7]["text"]
+            await bot.text(7, "web")
+        
+        assert "deployed" in api.last_message[7]["text"]
+        assert seen["config"] == "env: prod\n"
+        assert seen["archive_bytes"] == b"\x00PK"
+        assert os.path.basename(seen["archive"]) == "release.zip"
+        assert not os.path.exists(os.path.dirname(seen["archive"]))
+        # 過大的文件按 file_size 在下載前就被拒絕
+        assert len(api.calls_to("getFile")) == 2
+
+
+    @pytest.mark.asyncio
+    async def test_download_streamed_and_capped(self):
+        """測試下載逐塊寫入暫存檔案，超過上限時在讀完之前中止"""
+        from types import SimpleNamespace
+        from telegram_click.uploads import DOWNLOAD_CHUNK_SIZE, UploadTooLarge, receive_upload
+        
+        served = []
+        
+        class StreamingRequest:
+            async def stream(self, url, chunk_size):
+                for _ in range(10):
+                    served.append(chunk_size)
+                    yield b"x" * chunk_size
+        
+        telegram_file = SimpleNamespace(
+            file_path="documents/file-1",
+            _get_encoded_url=lambda: "https://api.telegram.org/file/bot/documents/file-1",
+            get_bot=lambda: SimpleNamespace(request=StreamingRequest()),
+        )
+        config = click.Option(['--config'], type=click.File('rb'))
+        value, resource = await receive_upload(telegram_file, config, "a.bin", 10 * DOWNLOAD_CHUNK_SIZE, 1024)
+        assert len(value.read()) == 10 * DOWNLOAD_CHUNK_SIZE
+        assert value._rolled
+        resource.close()
+        
+        served.clear()
+        archive = click.Option(['--archive'], type=click.Path())
+        with pytest.raises(UploadTooLarge):
+            await receive_upload(telegram_file, archive, "a.bin", 2 * DOWNLOAD_CHUNK_SIZE + 1, 1024)
+        assert len(served) == 3
+
+
+class TestBulkExecution:
+    """測試以CSV/JSONL文件批量執行命令"""
+    
+    @pytest.mark.asyncio
+    async def test_bulk_sync_rows_overlap(self):
+        """測試inline執行器下同步命令的各行在執行緒中並行，批量執行期間Bot仍然回應"""
+        import threading
+        import time
+        
+        lock = threading.Lock()
+        running = {"now": 0, "peak": 0}
+        
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.argument('url')
+        def healthcheck(url):
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            time.sleep(0.05)
+            with lock:
+                running["now"] -= 1
+            return f"{url} ok"
+        
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, bulk_concurrency=3, admin_users=[7]
+        )
+        assert converter.config.executor_type == "inline"
+        
+        content = "url\n" + "".join(f"http://h{i}\n" for i in range(6))
+        async with BotHarness(converter) as bot:
+            await bot.command(7, "/bulk healthcheck")
+            started = time.perf_counter()
+            await bot.upload(7, content.encode(), "targets.csv")
+            await bot.command(7, "/help")
+            assert time.perf_counter() - started < 0.1
+            await asyncio.gather(*converter._bulk_tasks)
+            elapsed = time.perf_counter() - started
+        
+        assert running["peak"] == 3
+        assert elapsed < 6 * 0.05
+        assert "成功 6" in bot.api.calls_to("sendMessage")[-1].params["text"]
+    
+    def test_parse_rows(self):
+        """測試CSV和JSONL的解析、行號和錯誤"""
+        from telegram_click.bulk import BulkFileError, parse_rows, unknown_columns
+        
+        rows = parse_rows("\ufeffurl,retries\nhttp://a,2\n\nhttp://b,\n".encode(), "targets.csv", 10)
+        assert [(row.line, row.values) for row in rows] == [
+            (2, {"url": "http://a", "retries": "2"}), (4, {"url": "http://b"})
+        ]
+        
+        rows = parse_rows(b'{"url": "http://a", "tags": ["x", "y"], "verbose": true, "note": null}\n', "t", 10)
+        assert rows[0].values == {"url": "http://a", "tags": "x\ny", "verbose": "true"}
+        assert unknown_columns(rows, ["url", "verbose"]) == ["tags"]
+        
+        for content, message in [(b"url\n1\n2\n3\n", "最多"), (b"url\n", "沒有數據"),
+                                 (b"url\na,b\n", "多於標題"), (b"{bad\n", "JSON")]:
+            with pytest.raises(BulkFileError, match=message):
+                parse_rows(content, "t", 2)
+    
+    @pytest.mark.asyncio
+    async def test_bulk_upload(self):
+        """測試逐行驗證、並發上限、摘要和結果文件"""
+        import csv
+        import io
+        
+        running = {"now": 0, "peak": 0}
+        
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.argument('url')
+        @click.option('--retries', type=click.IntRange(0, 5), default=1)
+        @click.option('--token', default="", hide_input=True)
+        async def healthcheck(url, retries, token):
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            if "down" in url:
+                raise RuntimeError("unreachable")
+            return f"{url} ok x{retries}"
+        
+        converter = create_bot_from_click_group(
+            "test_token", cli, enable_logging=False, bulk_concurrency=2, history_size=0, admin_users=[7]
+        )
+        
+        content = "url,retries,token\n" + "".join(f"http://h{i},3,s3cret\n" for i in range(5))
+        content += "http://down,,\n,2,\nhttp://x,9,\n"
+        async with BotHarness(converter) as bot:
+            api = bot.api
+            await bot.command(8, "/bulk healthcheck")
+            assert "僅限管理員" in api.last_message[8]["text"]
+            await bot.command(7, "/bulk healthcheck")
+            assert "url（必需）" in api.last_message[7]["text"]
+            await bot.upload(7, b"url,colour\nhttp://a,red\n", "bad.csv")
+            assert "未知的欄位: colour" in api.last_message[7]["text"]
+            await bot.upload(7, content.encode(), "targets.csv")
+            await asyncio.gather(*converter._bulk_tasks)
+        
+        assert 7 not in converter.user_contexts
+        assert running["peak"] == 2
+        summary = api.calls_to("sendMessage")[-1].params["text"]
+        assert "成功 5" in summary and "執行失敗 1" in summary and "驗證失敗 2" in summary
+        assert "第 8 行：url：缺少必需參數" in summary
+        
+        sent = api.calls_to("sendDocument")[-1].params["document"]
+        assert sent["file_name"] == "healthcheck-results.csv"
+        results = list(csv.DictReader(io.StringIO(sent["content"].decode("utf-8-sig"))))
+        assert [row["status"] for row in results] == ["ok"] * 5 + ["failed", "invalid", "invalid"]
+        assert results[0]["output"].strip() == "http://h0 ok x3"
+        assert results[0]["token"] == "***"
+        assert results[5]["line"] == "7" and "unreachable" in results[5]["error"]
+
+
+class TestScheduler:
+    """測試排程的時間表、錯過策略、持久化和執行"""
+    
+    def test_due_and_misfire_policies(self, tmp_path):
+        """測試到期判斷、錯過時略過或補執行、時間表對齊和重啟後恢復"""
+        from telegram_click.scheduler import Scheduler, ScheduleStore, format_interval, parse_interval
+        
+        assert parse_interval("1h30m") == 5400 and parse_interval("90s") == 90
+        assert format_interval(5400) == "1h30m"
+        with pytest.raises(ValueError):
+            parse_interval("5 minutes")
+        
+        path = str(tmp_path / "schedules.db")
+        now = [1000.0]
+        
+        async def runner(schedule, missed):
+            pass
+        
+        scheduler = Scheduler(ScheduleStore(path), runner, misfire_grace=10, clock=lambda: now[0])
+        skip = scheduler.add(1, 1, "monitor", {"target": "db"}, 60)
+        catchup = scheduler.add(1, 1, "healthcheck", {}, 60, "catchup")
+        assert scheduler.next_due() == 1060
+        assert scheduler.due(1059) == []
+        assert scheduler.due(1062) == [(skip, 0), (catchup, 0)]
+        assert skip.next_run == 1120
+        
+        # 停機 5 分鐘：略過策略不執行，補執行策略執行一次並報告錯過次數
+        assert scheduler.due(1420) == [(catchup, 6)]
+        assert skip.next_run == catchup.next_run == 1480
+        
+        assert scheduler.remove(catchup.id) and not scheduler.remove(catchup.id)
+        assert scheduler.next_due() == 1480
+        scheduler.close()
+        
+        restored = Scheduler(ScheduleStore(path), runner, clock=lambda: now[0])
+        assert list(restored.schedules) == [skip.id]
+        assert restored.schedules[skip.id].values == {"target": "db"}
+        assert restored.next_due() == 1480
+        restored.close()
+    
+    @pytest.mark.asyncio
+    async def test_timer_task(self):
+        """測試計時任務按間隔執行，執行中的排程不重疊"""
+        from telegram_click.scheduler import Scheduler, ScheduleStore
+        
+        runs = []
+        
+        async def runner(schedule, missed):
+            runs.append(schedule.id)
+            await asyncio.sleep(0.03)
+        
+        scheduler = Scheduler(ScheduleStore(), runner, misfire_grace=1)
+        scheduler.start()
+        fast = scheduler.add(1, 1, "fast", {}, 0.02)
+        await asyncio.sleep(0.15)
+        await scheduler.stop()
+        scheduler.close()
+        
+        assert 2 <= runs.count(fast.id) <= 5
+        assert scheduler.missed > 0
+    
+    @pytest.mark.asyncio
+    async def test_timer_task_survives_errors(self, caplog):
+        """測試存儲或計時出錯時記錄日誌並繼續執行排程"""
+        import sqlite3
+        from telegram_click.scheduler import Scheduler, ScheduleStore
+        
+        runs = []
+        
+        async def runner(schedule, missed):
+            runs.append(schedule.id)
+        
+        store = ScheduleStore()
+        scheduler = Scheduler(store, runner, misfire_grace=1)
+        scheduler.ERROR_RETRY_SECONDS = 0.01
+        
+        def broken_update(schedule):
+            raise sqlite3.OperationalError("database is locked")
+        
+        store.update = broken_update
+        due = scheduler.due
+        failures = [RuntimeError("boom")]
+        
+        def flaky_due(now):
+            if failures:
+                raise failures.pop()
+            return due(now)
+        
+        scheduler.due = flaky_due
+        scheduler.start()
+        scheduler.add(1, 1, "fast", {}, 0.02)
+        await asyncio.sleep(0.12)
+        assert not scheduler._task.done()
+        await scheduler.stop()
+        scheduler.close()
+        
+        assert len(runs) >= 2
+        assert "排程計時任務出錯" in caplog.text
+        assert "保存排程" in caplog.text
+    
+    @pytest.mark.asyncio
+    async def test_schedule_commands(self):
+        """測試 /schedule、/schedules、/unschedule 和排程執行結果推送到聊天"""
+        import time
+        
+        @click.group()
+        def cli():
+            pass
+        
+        @cli.command()
+        @click.argument('url')
+        @click.option('--retries', type=click.IntRange(0, 5), default=1)
+        def healthcheck(url, retries):
+            return f"{url} ok x{retries}"
+        
+        converter = create_bot_from_click_group("test_token", cli, enable_logging=False, admin_users=[7])
+        async with BotHarness(converter) as bot:
+            api = bot.api
+            await bot.command(8, "/schedule healthcheck every 5m url=http://a")
+            assert "僅限管理員" in api.last_message[8]["text"]
+            await bot.command(7, "/schedule healthcheck every 10s url=http://a")
+            assert "不能小於 1m" in api.last_message[7]["text"]
+            await bot.command(7, "/schedule healthcheck every 5m retries=9 url=http://a")
+            assert "retries" in api.last_message[7]["text"]
+            await bot.command(7, "/schedule healthcheck every 5m colour=red")
+            assert "無法識別" in api.last_message[7]["text"]
+            await bot.command(7, '/schedule healthcheck every 5m catchup url="http://a b" retries=3')
+            assert "已新增排程" in api.last_message[7]["text"]
+            
+            (schedule,) = converter.scheduler.for_user(7)
+            assert schedule.values == {"url": "http://a b", "retries": "3"}
+            assert schedule.misfire == "catchup"
+            
+            await bot.command(7, "/schedules")
+            assert f"#{schedule.id} /healthcheck" in api.last_message[7]["text"]
+            
+            tasks = await converter.scheduler.tick(now=time.time() + 301)
+            await asyncio.gather(*tasks)
+            assert "http://a b ok x3" in api.last_message[7]["text"]
+            
+            await bot.command(8, f"/unschedule {schedule.id}")
+            assert "僅限管理員" in api.last_message[8]["text"]
+            await bot.command(7, f"/unschedule {schedule.id + 1}")
+            assert "找不到" in api.last_message[7]["text"]
+            await bot.command(7, f"/unschedule {schedule.id}")
+            assert converter.scheduler.for_user(7) == []
@@ -22,6 +22,7 @@ from telegram_click.utils import (
     format_command_help
 )
 from telegram_click.types import ParameterType
+from telegram_click.markup import escape_html, get_renderer
 
 
 class TestModuleLoading:
@@ -123,6 +124,116 @@ class TestParameterValidation:
         result = validate_and_convert_parameter_value("hello world", param)
         assert result.success == True
         assert result.data == "hello world"
+    
+    def test_validate_click_param_types(self, tmp_path):
+        """測試範圍、路徑、日期、UUID 和自定義類型在輸入時轉換"""
+        import datetime
+        import uuid
+        
+        port = click.Option(['--port'], type=click.IntRange(1, 65535))
+        assert validate_and_convert_parameter_value("8080", port).data == 8080
+        result = validate_and_convert_parameter_value("70000", port)
+        assert not result.success and "65535" in result.message
+        
+        path = click.Option(['--path'], type=click.Path(exists=True))
+        assert validate_and_convert_parameter_value(str(tmp_path), path).success
+        assert not validate_and_convert_parameter_value(str(tmp_path / "missing"), path).success
+        
+        when = click.Option(['--when'], type=click.DateTime())
+        assert validate_and_convert_parameter_value("2024-05-01", when).data == datetime.datetime(2024, 5, 1)
+        assert not validate_and_convert_parameter_value("May first", when).success
+        
+        ident = click.Option(['--id'], type=click.UUID)
+        assert isinstance(validate_and_convert_parameter_value(str(uuid.uuid4()), ident).data, uuid.UUID)
+        
+        class Hex(click.ParamType):
+            name = "hex"
+            
+            def convert(self, value, param, ctx):
+                try:
+                    return int(value, 16)
+                except ValueError:
+                    self.fail(f"{value} 不是十六進位數")
+        
+        hex_param = click.Option(['--mask'], type=Hex())
+        assert validate_and_convert_parameter_value("ff", hex_param).data == 255
+        assert "十六進位" in validate_and_convert_parameter_value("zz", hex_param).message
+        
+        flag = click.Option(['--force'], is_flag=True)
+        assert validate_and_convert_parameter_value("否", flag).data is False
+        assert not validate_and_convert_parameter_value("maybe", flag).success
+    
+    def test_validate_batch_parameters(self):
+        """測試 multiple/nargs 參數一次輸入多個值並轉換為元組"""
+        exclude = click.Option(['--exclude'], multiple=True)
+        assert validate_and_convert_parameter_value("*.log\n*.tmp\nbuild dir", exclude).data == \
+            ("*.log", "*.tmp", "build dir")
+        assert validate_and_convert_parameter_value("*.log, *.tmp", exclude).data == ("*.log", "*.tmp")
+        assert validate_and_convert_parameter_value("*.log *.tmp", exclude).data == ("*.log", "*.tmp")
+        
+        ports = click.Option(['--port'], type=click.IntRange(1, 100), multiple=True)
+        result = validate_and_convert_parameter_value("1 x 200 3", ports)
+        assert not result.success
+        assert "第 2 項「x」" in result.message and "第 3 項「200」" in result.message
+        
+        size = click.Option(['--size'], nargs=2, type=int)
+        assert validate_and_convert_parameter_value("800, 600", size).data == (800, 600)
+        assert "需要 2 個值" in validate_and_convert_parameter_value("800", size).message
+        
+        pairs = click.Option(['--env'], type=(str, int), multiple=True)
+        assert validate_and_convert_parameter_value("a 1\nb, 2", pairs).data == (("a", 1), ("b", 2))
+        assert "第 2 行" in validate_and_convert_parameter_value("a 1\nb x", pairs).message
+        
+        files = click.Argument(['files'], nargs=-1)
+        assert validate_and_convert_parameter_value("a.txt b.txt", files).data == ("a.txt", "b.txt")
+    
+    def test_validate_pasted_file_content(self):
+        """測試讀取模式的檔案參數把貼上的文字當作檔案內容"""
+        text_file = click.Option(['--config'], type=click.File('r'))
+        assert validate_and_convert_parameter_value("a: 1", text_file).data.read() == "a: 1"
+        
+        binary_file = click.Option(['--blob'], type=click.File('rb'))
+        assert validate_and_convert_parameter_value("abc", binary_file).data.read() == b"abc"
+        
+        output = click.Option(['--output'], type=click.File('w'))
+        assert validate_and_convert_parameter_value("out.txt", output).data == "out.txt"
+    
+    def test_compiled_validator_runs_callback(self):
+        """測試參數回調在輸入時執行，並能讀取已收集的參數"""
+        from telegram_click.validation import compile_validator
+        
+        def check_end(ctx, param, value):
+            if value < ctx.params["start"]:
+                raise click.BadParameter("結束必須大於開始")
+            return value
+        
+        @click.command()
+        @click.option('--start', type=int)
+        @click.option('--end', type=int, callback=check_end)
+        @click.version_option("1.0")
+        def span(start, end, version=None):
+            pass
+        
+        end, version = span.params[1], span.params[2]
+        validate = compile_validator(end, span)
+        assert validate("5", {"start": 1}).data == 5
+        result = validate("0", {"start": 1})
+        assert not result.success and result.message == "結束必須大於開始"
+        assert compile_validator(version, span)("true").data is True
+    
+    def test_compiled_validator_catches_callback_bugs(self, caplog):
+        """測試回調拋出非預期的例外時返回通用錯誤並記錄日誌"""
+        from telegram_click.validation import compile_validator
+        
+        def buggy(ctx, param, value):
+            return ctx.params["missing"]
+        
+        option = click.Option(['--end'], type=int, callback=buggy)
+        with caplog.at_level("ERROR", logger="telegram_click.validation"):
+            result = compile_validator(option)("5")
+        assert not result.success and result.message == "無效的值"
+        assert isinstance(result.error, KeyError)
+        assert "驗證參數 end 時出錯" in caplog.text
 
 
 class TestOutputFormatting:
@@ -151,6 +262,23 @@ class TestOutputFormatting:
         text = "Hello World"
         result = format_output_message(text, max_length=5)
         assert "截斷" in result
+    
+    @pytest.mark.parametrize("name", ["html", "markdown_v2"])
+    def test_format_output_message_escapes_code(self, name):
+        """測試含反引號和標記字符的輸出被轉義"""
+        renderer = get_renderer(name)
+        result = format_output_message("a `b` <c> & \\d", renderer=renderer)
+        if name == "html":
+            assert "<pre>a `b` &lt;c&gt; &amp; \\d</pre>" in result
+        else:
+            assert "```\na \\`b\\` <c> & \\\\d\n```" in result
+    
+    @pytest.mark.parametrize("name", ["html", "markdown_v2"])
+    def test_format_output_message_truncates_escaped_length(self, name):
+        """測試截斷以轉義後的長度計算"""
+        result = format_output_message("<`>" * 3000, max_length=500, renderer=get_renderer(name))
+        assert len(result) <= 500
+        assert "截斷" in result
 
 
 class TestClickExtraction:
@@ -252,6 +380,18 @@ class TestTextUtilities:
         assert "\\(" in escaped
         assert "\\)" in escaped
     
+    def test_escape_markdown_v2_matches_replace_loop(self):
+        """測試與舊版 replace 迴圈結果一致，並額外轉義反斜線"""
+        from telegram_click.bench import legacy_escape_markdown_v2, sample_escape_payload
+        
+        text = sample_escape_payload(2000) + "_*[]()~`>#+-=|{}.!"
+        assert escape_markdown_v2(text) == legacy_escape_markdown_v2(text)
+        assert escape_markdown_v2("a\\b.") == "a\\\\b\\."
+    
+    def test_escape_html(self):
+        """測試HTML轉義"""
+        assert escape_html('<a href="x">&</a>') == "&lt;a href=&quot;x&quot;&gt;&amp;&lt;/a&gt;"
+    
     def test_truncate_text_short(self):
         """測試短文字不截斷"""
         text = "Hello"
@@ -321,6 +461,19 @@ class TestCommandHelp:
         assert "用戶年齡" in help_text
         assert "✳️" in help_text  # 必需參數標記
         assert "🔸" in help_text  # 可選參數標記
+    
+    def test_format_command_help_markdown_v2(self):
+        """測試MarkdownV2模式下描述被轉義"""
+        @click.command()
+        def test_cmd():
+            """清理 *.tmp (最多 10 個)"""
+            pass
+        
+        test_cmd.name = "clean_up"
+        help_text = format_command_help(test_cmd, {}, get_renderer("markdown_v2"))
+        
+        assert "`/clean_up`" in help_text
+        assert "清理 \\*\\.tmp \\(最多 10 個\\)" in help_text
 
 
 class TestAsyncFunctions: